@@ -12,5 +12,16 @@ export PLAYWRIGHT_BROWSERS_PATH=/opt/render/project/src/browsers
 mkdir -p $PLAYWRIGHT_BROWSERS_PATH
 python -m playwright install chromium
 
+# Build the offline postal code gazetteer, so postal codes are placed without a network call.
+# Not fatal: without it, addresses are geocoded by Nominatim only
+GEONAMES_DIR=$(mktemp -d)
+if curl -fsSL -o "$GEONAMES_DIR/CA_full.csv.zip" https://download.geonames.org/export/zip/CA_full.csv.zip \
+    && python -m zipfile -e "$GEONAMES_DIR/CA_full.csv.zip" "$GEONAMES_DIR"; then
+    python manage.py build_postal_gazetteer "$GEONAMES_DIR/CA_full.txt"
+else
+    echo "Couldn't download GeoNames postal codes; skipping the offline gazetteer"
+fi
+rm -rf "$GEONAMES_DIR"
+
 # Run migrations
 python manage.py migrate
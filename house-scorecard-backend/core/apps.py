@@ -12,6 +12,9 @@ class CoreConfig(AppConfig):
         Called when the Django app is ready.
         Perform startup validations here.
         """
+        # Register signal handlers (collection versioning) in every process
+        from . import signals  # noqa: F401
+
         # Only run validations once during startup, not during migrations
         import os
         import sys
@@ -0,0 +1,135 @@
+# core/filters.py
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from rest_framework.exceptions import ValidationError
+
+from .models import Property
+
+# Query parameter -> (model field, lookup). Same vocabulary as SearchAndFilter.jsx
+RANGE_FILTERS = {
+    'minPrice': ('price', 'gte'),
+    'maxPrice': ('price', 'lte'),
+    'minScore': ('score', 'gte'),
+    'maxScore': ('score', 'lte'),
+    'minBeds': ('beds', 'gte'),
+    'maxBeds': ('beds', 'lte'),
+    'minBaths': ('baths', 'gte'),
+    'maxBaths': ('baths', 'lte'),
+    'minSqft': ('sqft', 'gte'),
+    'maxSqft': ('sqft', 'lte'),
+}
+
+# Integer columns would silently truncate fractional bounds, so round them inward
+INTEGER_FIELDS = {'score', 'beds', 'sqft'}
+
+# sortBy value -> (ordering key, descending, nulls_last). Nulls sort as the lowest
+# value, like the `?? -1` / `?? 0` fallbacks the Properties page used to apply.
+SORT_OPTIONS = {
+    'score_desc': ('score', True, True),
+    'score_asc': ('score', False, False),
+    'price_desc': ('price', True, True),
+    'price_asc': ('price', False, False),
+    'address_asc': ('address_sort', False, True),
+    'address_desc': ('address_sort', True, True),
+}
+
+DEFAULT_SORT = ('created_at', True, True)
+
+UNSET_STATUS = 'unset'
+
+TRUE_VALUES = {'true', '1', 'yes'}
+FALSE_VALUES = {'false', '0', 'no'}
+
+
+def _parse_number(param, raw_value):
+    try:
+        value = Decimal(raw_value)
+    except InvalidOperation:
+        raise ValidationError({param: ['Enter a number.']})
+    if not value.is_finite():
+        raise ValidationError({param: ['Enter a number.']})
+    return value
+
+
+def _parse_bool(param, raw_value):
+    lowered = raw_value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValidationError({param: ['Must be true or false.']})
+
+
+def _get_statuses(params):
+    statuses = []
+    for value in params.getlist('statuses'):
+        statuses.extend(status.strip() for status in value.split(',') if status.strip())
+    valid = {choice for choice, _ in Property.STATUS_CHOICES} | {UNSET_STATUS}
+    invalid = [status for status in statuses if status not in valid]
+    if invalid:
+        raise ValidationError({'statuses': [f'Unknown status: {", ".join(invalid)}']})
+    return statuses
+
+
+def filter_properties(queryset, params):
+    """
+    Apply SearchAndFilter-style query parameters to a Property queryset.
+
+    Supports search, min/max price, score, beds, baths and sqft, statuses
+    (comma-separated, `unset` for no status), mustHavesMet and
+    dealBreakersPresent. Empty parameters are ignored, matching the client.
+    """
+    search = params.get('search', '').strip()
+    if search:
+        queryset = queryset.filter(Q(address__icontains=search) | Q(notes__icontains=search))
+
+    for param, (field, lookup) in RANGE_FILTERS.items():
+        raw_value = params.get(param, '').strip()
+        if raw_value:
+            value = _parse_number(param, raw_value)
+            if field in INTEGER_FIELDS:
+                value = math.ceil(value) if lookup == 'gte' else math.floor(value)
+            queryset = queryset.filter(**{f'{field}__{lookup}': value})
+
+    statuses = _get_statuses(params)
+    if statuses:
+        status_filter = Q(status__in=[s for s in statuses if s != UNSET_STATUS])
+        if UNSET_STATUS in statuses:
+            status_filter |= Q(status__isnull=True) | Q(status='')
+        queryset = queryset.filter(status_filter)
+
+    must_haves_met = params.get('mustHavesMet', '').strip()
+    if must_haves_met:
+        queryset = queryset.filter(must_haves_met=_parse_bool('mustHavesMet', must_haves_met))
+
+    deal_breakers_present = params.get('dealBreakersPresent', '').strip()
+    if deal_breakers_present:
+        queryset = queryset.filter(
+            deal_breakers_present=_parse_bool('dealBreakersPresent', deal_breakers_present)
+        )
+
+    return queryset
+
+
+def get_sort(params):
+    """Return the (ordering key, descending, nulls_last) tuple for `sortBy`."""
+    sort_by = params.get('sortBy', '').strip()
+    if not sort_by:
+        return DEFAULT_SORT
+    if sort_by not in SORT_OPTIONS:
+        raise ValidationError({'sortBy': [f'Must be one of: {", ".join(SORT_OPTIONS)}']})
+    return SORT_OPTIONS[sort_by]
+
+
+def sort_properties(queryset, sort):
+    """Order a Property queryset by a `get_sort` tuple, breaking ties on id."""
+    key, descending, nulls_last = sort
+    if key == 'address_sort':
+        queryset = queryset.annotate(address_sort=Lower('address'))
+    nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+    if descending:
+        return queryset.order_by(F(key).desc(**nulls), F('pk').desc())
+    return queryset.order_by(F(key).asc(**nulls), F('pk').asc())
@@ -0,0 +1,75 @@
+# core/management/commands/build_postal_gazetteer.py
+import csv
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.gazetteer import POSTAL_CODE_PATTERN, write_gazetteer
+
+# Columns of a GeoNames postal code dump (https://download.geonames.org/export/zip/)
+GEONAMES_COUNTRY_COLUMN = 0
+GEONAMES_POSTAL_CODE_COLUMN = 1
+GEONAMES_LATITUDE_COLUMN = 9
+GEONAMES_LONGITUDE_COLUMN = 10
+
+
+def read_geonames_rows(path):
+    """(postal code, latitude, longitude) for each Canadian row of a GeoNames dump."""
+    with open(path, newline='', encoding='utf-8') as source:
+        for row in csv.reader(source, delimiter='\t', quoting=csv.QUOTE_NONE):
+            if len(row) <= GEONAMES_LONGITUDE_COLUMN or row[GEONAMES_COUNTRY_COLUMN] != 'CA':
+                continue
+            code = row[GEONAMES_POSTAL_CODE_COLUMN].upper().replace(' ', '')
+            match = POSTAL_CODE_PATTERN.fullmatch(code)
+            if not match:
+                continue
+            try:
+                latitude = float(row[GEONAMES_LATITUDE_COLUMN])
+                longitude = float(row[GEONAMES_LONGITUDE_COLUMN])
+            except ValueError:
+                continue
+            yield code, latitude, longitude
+
+
+def fsa_centroids(entries):
+    """Mean position of each FSA's postal codes, for FSAs the source has no row of their own for."""
+    sums = {}
+    fsas = set()
+    for code, latitude, longitude in entries:
+        if len(code) == 3:
+            fsas.add(code)
+            continue
+        total = sums.setdefault(code[:3], [0.0, 0.0, 0])
+        total[0] += latitude
+        total[1] += longitude
+        total[2] += 1
+    return [
+        (fsa, latitude / count, longitude / count)
+        for fsa, (latitude, longitude, count) in sums.items()
+        if fsa not in fsas
+    ]
+
+
+class Command(BaseCommand):
+    help = "Build the offline postal code gazetteer from GeoNames postal code dumps (CA.txt or CA_full.txt)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help="GeoNames postal code files to read")
+        parser.add_argument('--output', default=settings.POSTAL_GAZETTEER_PATH, help="Gazetteer file to write")
+
+    def handle(self, *args, **options):
+        entries = []
+        for path in options['sources']:
+            try:
+                entries.extend(read_geonames_rows(path))
+            except OSError as e:
+                raise CommandError(f"Can't read {path}: {e}")
+        if not entries:
+            raise CommandError("No Canadian postal codes found in the sources")
+
+        entries.extend(fsa_centroids(entries))
+        os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+        count = write_gazetteer(options['output'], entries)
+        size_kb = os.path.getsize(options['output']) / 1024
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} postal codes and FSAs to {options['output']} ({size_kb:.0f} KB)"))
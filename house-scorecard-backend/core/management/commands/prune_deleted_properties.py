@@ -0,0 +1,14 @@
+# core/management/commands/prune_deleted_properties.py
+from django.core.management.base import BaseCommand
+
+from core.sync import prune_deletion_log
+
+
+class Command(BaseCommand):
+    help = "Delete property tombstones older than the delta sync retention window"
+
+    def handle(self, *args, **options):
+        deleted_count, cutoff = prune_deletion_log()
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {deleted_count} property tombstones deleted before {cutoff:%Y-%m-%d %H:%M}"
+        ))
@@ -0,0 +1,26 @@
+# core/management/commands/rescore_properties.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.rescoring import rescore_properties
+
+
+class Command(BaseCommand):
+    help = "Recalculate property scores and criteria flags from their ratings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rescore this username's properties")
+
+    def handle(self, *args, **options):
+        owners = User.objects.filter(properties__isnull=False).distinct().order_by('pk')
+        if options['user']:
+            owners = owners.filter(username=options['user'])
+            if not owners.exists():
+                raise CommandError(f"No properties found for user '{options['user']}'")
+
+        total = 0
+        for owner in owners:
+            updated = rescore_properties(owner.pk)
+            total += updated
+            self.stdout.write(f"{owner.username}: {updated} properties updated")
+        self.stdout.write(self.style.SUCCESS(f"Rescored properties, {total} updated"))
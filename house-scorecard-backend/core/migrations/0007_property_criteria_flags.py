@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def backfill_criteria_flags(apps, schema_editor):
+    Property = apps.get_model('core', 'Property')
+    Criterion = apps.get_model('core', 'Criterion')
+    Rating = apps.get_model('core', 'Rating')
+
+    yes_rating = Rating.objects.filter(
+        property=OuterRef(OuterRef('pk')), criterion=OuterRef('pk'), value='yes'
+    )
+    unmet_must_haves = Criterion.objects.filter(
+        owner=OuterRef('owner'), type='mustHave'
+    ).filter(~Exists(yes_rating))
+    deal_breaker_hits = Rating.objects.filter(
+        property=OuterRef('pk'), criterion__owner=OuterRef('owner'),
+        criterion__type='dealBreaker', value='yes'
+    )
+    Property.objects.update(
+        must_haves_met=~Exists(unmet_must_haves),
+        deal_breakers_present=Exists(deal_breaker_hits),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_extend_buyer_recommendation_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='deal_breakers_present',
+            field=models.BooleanField(default=False, help_text='Any deal breaker criterion is rated yes'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='must_haves_met',
+            field=models.BooleanField(default=True, help_text='Every must-have criterion is rated yes'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', '-created_at'], name='property_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'score'], name='property_owner_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'price'], name='property_owner_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'status'], name='property_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'must_haves_met', 'deal_breakers_present'], name='property_owner_flags_idx'),
+        ),
+        migrations.RunPython(backfill_criteria_flags, migrations.RunPython.noop),
+    ]
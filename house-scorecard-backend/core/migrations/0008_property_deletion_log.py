@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_property_criteria_flags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'updated_at'], name='property_owner_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedproperty',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deleted_properties', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='deletedproperty',
+            index=models.Index(fields=['owner', 'deleted_at'], name='deleted_owner_deleted_at_idx'),
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:50
+
+import math
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Frozen copy of services.scoring as of this migration, so later changes to
+# the service can't change what it does
+SCORE_AGGREGATE_FIELDS = (
+    'score_weighted_sum',
+    'score_total_weight',
+    'deal_breaker_hits',
+    'unmet_must_haves',
+    'unconfirmed_must_haves',
+)
+
+
+def normalize_rating(rating_type, value):
+    if rating_type == 'yesNo':
+        return 10 if value == 'yes' else 0
+    if rating_type not in ('stars', 'scale10'):
+        return 0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    if rating_type == 'stars':  # 1-5 stars
+        return (number - 1) * 2.5
+    return number  # 1-10 scale
+
+
+def typed_rating_values(rating_type, value):
+    normalized_value = normalize_rating(rating_type, value) if value is not None else None
+    bool_value = {'yes': True, 'no': False}.get(value)
+    return normalized_value, bool_value
+
+
+def rating_contribution(criterion, normalized_value, bool_value):
+    contribution = dict.fromkeys(SCORE_AGGREGATE_FIELDS, 0)
+    if criterion.type == 'dealBreaker':
+        contribution['deal_breaker_hits'] = int(bool_value is True)
+    elif criterion.type == 'mustHave':
+        contribution['unmet_must_haves'] = int(bool_value is False)
+        contribution['unconfirmed_must_haves'] = int(bool_value is not True)
+    elif criterion.type == 'niceToHave' and normalized_value is not None:
+        contribution['score_weighted_sum'] = normalized_value * criterion.weight
+        contribution['score_total_weight'] = criterion.weight
+    return contribution
+
+
+def score_from_aggregates(score_weighted_sum, score_total_weight, deal_breaker_hits,
+                          unmet_must_haves, unconfirmed_must_haves):
+    if deal_breaker_hits or unmet_must_haves:
+        return 0
+    if score_total_weight == 0:
+        return 100 if unconfirmed_must_haves == 0 else 0
+    return math.floor(score_weighted_sum * 10 / score_total_weight + 0.5)
+
+
+def backfill_score_aggregates(apps, schema_editor):
+    Property = apps.get_model('core', 'Property')
+    Rating = apps.get_model('core', 'Rating')
+
+    totals = defaultdict(lambda: dict.fromkeys(SCORE_AGGREGATE_FIELDS, 0))
+    for rating in Rating.objects.select_related('criterion').iterator():
+        typed_values = typed_rating_values(rating.criterion.rating_type, rating.value)
+        for field, amount in rating_contribution(rating.criterion, *typed_values).items():
+            totals[rating.property_id][field] += amount
+
+    properties = list(Property.objects.filter(pk__in=totals))
+    for property_obj in properties:
+        aggregates = totals[property_obj.pk]
+        for field, amount in aggregates.items():
+            setattr(property_obj, field, amount)
+        property_obj.score = score_from_aggregates(**aggregates)
+    Property.objects.bulk_update(properties, [*SCORE_AGGREGATE_FIELDS, 'score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_property_deletion_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='deal_breaker_hits',
+            field=models.PositiveIntegerField(default=0, help_text='Deal breakers rated yes'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='score_total_weight',
+            field=models.PositiveIntegerField(default=0, help_text='Total weight of rated nice-to-haves'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='score_weighted_sum',
+            field=models.FloatField(default=0, help_text='Sum of normalized nice-to-have ratings times their weight'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='unconfirmed_must_haves',
+            field=models.PositiveIntegerField(default=0, help_text='Rated must-haves not rated yes'),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='unmet_must_haves',
+            field=models.PositiveIntegerField(default=0, help_text='Must-haves rated no'),
+        ),
+        migrations.RunPython(backfill_score_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:00
+
+import math
+
+from django.db import migrations, models
+
+
+# Frozen copy of services.scoring as of this migration, so later changes to
+# the service can't change what it does
+def normalize_rating(rating_type, value):
+    if rating_type == 'yesNo':
+        return 10 if value == 'yes' else 0
+    if rating_type not in ('stars', 'scale10'):
+        return 0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    if rating_type == 'stars':  # 1-5 stars
+        return (number - 1) * 2.5
+    return number  # 1-10 scale
+
+
+def typed_rating_values(rating_type, value):
+    normalized_value = normalize_rating(rating_type, value) if value is not None else None
+    bool_value = {'yes': True, 'no': False}.get(value)
+    return normalized_value, bool_value
+
+
+def backfill_typed_values(apps, schema_editor):
+    Rating = apps.get_model('core', 'Rating')
+
+    batch = []
+    for rating in Rating.objects.select_related('criterion').iterator(chunk_size=2000):
+        rating.normalized_value, rating.bool_value = typed_rating_values(rating.criterion.rating_type, rating.value)
+        batch.append(rating)
+        if len(batch) >= 2000:
+            Rating.objects.bulk_update(batch, ['normalized_value', 'bool_value'])
+            batch = []
+    Rating.objects.bulk_update(batch, ['normalized_value', 'bool_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_property_score_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='bool_value',
+            field=models.BooleanField(blank=True, help_text="True for 'yes', False for 'no'", null=True),
+        ),
+        migrations.AddField(
+            model_name='rating',
+            name='normalized_value',
+            field=models.FloatField(blank=True, help_text="Value on a 0-10 scale for the criterion's rating type", null=True),
+        ),
+        migrations.RunPython(backfill_typed_values, migrations.RunPython.noop),
+    ]
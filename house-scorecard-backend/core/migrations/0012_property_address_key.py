@@ -0,0 +1,77 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:33
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of services.addresses as of this migration, so later changes to
+# the service can't change what it does
+WHITESPACE_PATTERN = re.compile(r'\s+')
+RUN_ON_CITY_PATTERN = re.compile(r'([A-Z]{2,}|AVENUE|STREET|ROAD|DRIVE|LANE|WAY|COURT|PLACE)([A-Z][a-z]+)')
+RUN_ON_WORD_PATTERN = re.compile(r'([A-Za-z])([A-Z][a-z])')
+KEY_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+ADDRESS_KEY_MAX_LENGTH = 255
+
+
+def clean_address(address):
+    if not address:
+        return None
+    address = WHITESPACE_PATTERN.sub(' ', address.strip())
+    address = RUN_ON_CITY_PATTERN.sub(r'\1 \2', address)
+    address = RUN_ON_WORD_PATTERN.sub(r'\1 \2', address)
+    return WHITESPACE_PATTERN.sub(' ', address.strip())
+
+
+def rewrite_unit_prefix(address):
+    address = ' '.join(address.split())
+    if address.startswith('#'):
+        parts = address.split(' ', 2)
+        if len(parts) >= 3:
+            unit, street_num, rest = parts[0][1:], parts[1], parts[2]
+            address = f"{street_num} {rest}, Unit {unit}"
+    return address
+
+
+def address_key(address):
+    # Split run-together words before casefolding, which made keys depend
+    # on case; 0019 recomputes them
+    if not address:
+        return ''
+    key = clean_address(rewrite_unit_prefix(address)) or ''
+    key = KEY_PUNCTUATION_PATTERN.sub(' ', key.casefold())
+    return ' '.join(key.split())[:ADDRESS_KEY_MAX_LENGTH]
+
+
+def backfill_address_keys(apps, schema_editor):
+    Property = apps.get_model('core', 'Property')
+
+    batch = []
+    for prop in Property.objects.only('id', 'address').iterator(chunk_size=2000):
+        prop.address_key = address_key(prop.address)
+        batch.append(prop)
+        if len(batch) >= 2000:
+            Property.objects.bulk_update(batch, ['address_key'])
+            batch = []
+    Property.objects.bulk_update(batch, ['address_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_import_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='address_key',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Canonical address for duplicate matching (see services/addresses.py)', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'address_key'], name='property_owner_address_key_idx'),
+        ),
+        migrations.RunPython(backfill_address_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+def mark_geocoded_properties(apps, schema_editor):
+    Property = apps.get_model('core', 'Property')
+    # Properties without coordinates stay pending: earlier failures weren't recorded
+    Property.objects.filter(latitude__isnull=False, longitude__isnull=False).update(geocode_status='ok')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_geocode_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geocode_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ok', 'OK'), ('failed', 'Failed')], default='pending', help_text="Whether the address has been geocoded; failed means the geocoder couldn't find it", max_length=10),
+        ),
+        migrations.RunPython(mark_geocoded_properties, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_property_geocode_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geocodecache',
+            name='precision',
+            field=models.CharField(choices=[('fsa', 'Postal area (FSA)'), ('postal_code', 'Postal code'), ('address', 'Address')], default='address', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='geocode_precision',
+            field=models.CharField(blank=True, choices=[('fsa', 'Postal area (FSA)'), ('postal_code', 'Postal code'), ('address', 'Address')], default='', help_text='What the coordinates locate; blank if they were set by hand', max_length=20),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_geocode_precision'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['owner', 'latitude', 'longitude'], name='property_owner_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_property_location_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='criterion',
+            name='ideal_distance_km',
+            field=models.FloatField(default=1, help_text='Distance at or under which a property gets the best rating'),
+        ),
+        migrations.AddField(
+            model_name='criterion',
+            name='max_distance_km',
+            field=models.FloatField(default=20, help_text='Distance from which a property gets the worst rating'),
+        ),
+        migrations.CreateModel(
+            name='PointOfInterest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('work', 'Work'), ('school', 'School'), ('family', 'Family'), ('other', 'Other')], default='other', max_length=20)),
+                ('address', models.CharField(blank=True, default='', max_length=255)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_of_interest', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='criterion',
+            name='point_of_interest',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='criteria', to='core.pointofinterest'),
+        ),
+        migrations.CreateModel(
+            name='PropertyDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('point_of_interest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distances', to='core.pointofinterest')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distances', to='core.property')),
+            ],
+            options={
+                'unique_together': {('property', 'point_of_interest')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+import re
+
+from django.db import migrations
+
+# Frozen copy of services.addresses.address_key as of this migration, so
+# later changes to the service can't change what it does
+KEY_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+ADDRESS_KEY_MAX_LENGTH = 255
+
+
+def rewrite_unit_prefix(address):
+    address = ' '.join(address.split())
+    if address.startswith('#'):
+        parts = address.split(' ', 2)
+        if len(parts) >= 3:
+            unit, street_num, rest = parts[0][1:], parts[1], parts[2]
+            address = f"{street_num} {rest}, Unit {unit}"
+    return address
+
+
+def address_key(address):
+    if not address:
+        return ''
+    key = KEY_PUNCTUATION_PATTERN.sub(' ', rewrite_unit_prefix(address).casefold())
+    return ' '.join(key.split())[:ADDRESS_KEY_MAX_LENGTH]
+
+
+def recompute_address_keys(apps, schema_editor):
+    """Keys no longer split run-together words, which made them depend on case."""
+    Property = apps.get_model('core', 'Property')
+
+    batch = []
+    for prop in Property.objects.only('id', 'address', 'address_key').iterator(chunk_size=2000):
+        key = address_key(prop.address)
+        if key != prop.address_key:
+            prop.address_key = key
+            batch.append(prop)
+        if len(batch) >= 2000:
+            Property.objects.bulk_update(batch, ['address_key'])
+            batch = []
+    Property.objects.bulk_update(batch, ['address_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_points_of_interest'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_address_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_recompute_address_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointofinterest',
+            name='geocode_precision',
+            field=models.CharField(blank=True, choices=[('fsa', 'Postal area (FSA)'), ('postal_code', 'Postal code'), ('address', 'Address')], default='', help_text='What the coordinates locate; blank if they were set by hand', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='pointofinterest',
+            name='geocode_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ok', 'OK'), ('failed', 'Failed')], default='ok', help_text='Pending while the address awaits a network geocoder', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='pointofinterest',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pointofinterest',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 
 class Property(models.Model):
     """Represents a property being evaluated."""
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='properties')
     address = models.CharField(max_length=255)
+    address_key = models.CharField(max_length=255, blank=True, default='', editable=False, help_text="Canonical address for duplicate matching (see services/addresses.py)")
     listing_url = models.URLField(max_length=1024, blank=True, null=True)
     price = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
     beds = models.PositiveSmallIntegerField(blank=True, null=True)
@@ -13,8 +14,26 @@ class Property(models.Model):
     notes = models.TextField(blank=True, default='')
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    GEOCODE_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ok', 'OK'),
+        ('failed', 'Failed'),
+    ]
+    geocode_status = models.CharField(max_length=10, choices=GEOCODE_STATUS_CHOICES, default='pending', help_text="Whether the address has been geocoded; failed means the geocoder couldn't find it")
+    GEOCODE_PRECISION_CHOICES = [
+        ('fsa', 'Postal area (FSA)'),
+        ('postal_code', 'Postal code'),
+        ('address', 'Address'),
+    ]
+    # Positions no more precise than a postal code stay pending until a network geocoder refines them
+    APPROXIMATE_PRECISIONS = ('fsa', 'postal_code')
+    geocode_precision = models.CharField(max_length=20, choices=GEOCODE_PRECISION_CHOICES, blank=True, default='', help_text="What the coordinates locate; blank if they were set by hand")
     image_urls = models.JSONField(default=list, blank=True)
     score = models.IntegerField(blank=True, null=True)
+
+    # Criteria flags derived from ratings, precomputed so they can be filtered in SQL
+    must_haves_met = models.BooleanField(default=True, help_text="Every must-have criterion is rated yes")
+    deal_breakers_present = models.BooleanField(default=False, help_text="Any deal breaker criterion is rated yes")
     
     # Status tracking fields
     STATUS_CHOICES = [
@@ -39,60 +58,64 @@ class Property(models.Model):
     ai_confidence_score = models.FloatField(blank=True, null=True, help_text="AI analysis confidence (0-1)")
     ai_analysis_summary = models.TextField(blank=True, help_text="AI analysis summary")
     ai_analysis_date = models.DateTimeField(blank=True, null=True, help_text="When AI analysis was performed")
+
+    # Score aggregates, adjusted in place by every rating write (see services/scoring.py)
+    score_weighted_sum = models.FloatField(default=0, help_text="Sum of normalized nice-to-have ratings times their weight")
+    score_total_weight = models.PositiveIntegerField(default=0, help_text="Total weight of rated nice-to-haves")
+    deal_breaker_hits = models.PositiveIntegerField(default=0, help_text="Deal breakers rated yes")
+    unmet_must_haves = models.PositiveIntegerField(default=0, help_text="Must-haves rated no")
+    unconfirmed_must_haves = models.PositiveIntegerField(default=0, help_text="Rated must-haves not rated yes")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def calculate_score(self):
         """
-        Calculates the property's score based on its associated Rating objects.
+        Recalculates the property's score from scratch from its Rating objects.
         The score is normalized to a 0-100 scale.
+
+        Rating writes keep the score up to date incrementally through the stored
+        aggregates; this full recompute rebuilds them and is the reference the
+        incremental path is verified against.
         """
-        ratings = self.ratings.all()
-        
-        total_weight = 0
-        weighted_score_sum = 0
+        from .services.scoring import (
+            SCORE_AGGREGATE_FIELDS, rating_contribution, score_from_aggregates, typed_rating_values,
+        )
+
+        ratings = list(self.ratings.select_related('criterion'))
+        self.refresh_criteria_flags(ratings)
 
-        # --- Handle Deal Breakers and Must-Haves First ---
+        totals = dict.fromkeys(SCORE_AGGREGATE_FIELDS, 0)
         for rating in ratings:
-            if rating.criterion.type == 'dealBreaker' and rating.value == 'yes':
-                self.score = 0
-                return
-            if rating.criterion.type == 'mustHave' and rating.value == 'no':
-                self.score = 0
-                return
+            # Typed values are derived afresh, so stale stored ones can't hide here
+            typed_values = typed_rating_values(rating.criterion.rating_type, rating.value)
+            for field, amount in rating_contribution(rating.criterion, *typed_values).items():
+                totals[field] += amount
 
-        # --- Calculate Score for Nice-to-Haves ---
-        for rating in ratings.filter(criterion__type='niceToHave'):
-            criterion = rating.criterion
-            rating_value = rating.value
-
-            if rating_value is None:
-                continue
-
-            # Normalize the rating to a 0-10 scale
-            normalized_rating = 0
-            if criterion.rating_type == 'stars': # 1-5 stars
-                normalized_rating = (float(rating_value) - 1) * 2.5 
-            elif criterion.rating_type == 'yesNo': # yes/no
-                normalized_rating = 10 if rating_value == 'yes' else 0
-            elif criterion.rating_type == 'scale10': # 1-10 scale
-                normalized_rating = float(rating_value)
-
-            # Add to totals
-            weighted_score_sum += normalized_rating * criterion.weight
-            total_weight += criterion.weight
-
-        if total_weight == 0:
-            # If there are no weighted criteria, check if all must-haves are met
-            all_must_haves_met = all(
-                r.value == 'yes' for r in ratings.filter(criterion__type='mustHave')
-            )
-            self.score = 100 if all_must_haves_met else 0
-        else:
-            # Normalize the final score to be out of 100
-            final_score = (weighted_score_sum / (total_weight * 10)) * 100
-            self.score = int(round(final_score))
+        for field, amount in totals.items():
+            setattr(self, field, amount)
+        self.score = score_from_aggregates(**totals)
+
+    def refresh_criteria_flags(self, ratings=None):
+        """
+        Recompute must_haves_met and deal_breakers_present from this property's ratings.
+        Mirrors the Properties page filters: every must-have criterion of the owner
+        must be rated yes, and any deal breaker rated yes counts as present.
+        """
+        if ratings is None:
+            ratings = self.ratings.all()
+        yes_criterion_ids = {r.criterion_id for r in ratings if r.value == 'yes'}
+        owner_criteria = Criterion.objects.filter(owner_id=self.owner_id, type__in=['mustHave', 'dealBreaker'])
+        must_have_ids = set()
+        deal_breaker_ids = set()
+        for criterion_id, criterion_type in owner_criteria.values_list('id', 'type'):
+            if criterion_type == 'mustHave':
+                must_have_ids.add(criterion_id)
+            else:
+                deal_breaker_ids.add(criterion_id)
+
+        self.must_haves_met = must_have_ids <= yes_criterion_ids
+        self.deal_breakers_present = bool(deal_breaker_ids & yes_criterion_ids)
 
     def needs_ai_analysis(self):
         """Check if property needs AI analysis"""
@@ -101,19 +124,180 @@ class Property(models.Model):
             (self.image_urls and len(self.image_urls) > 0 and not self.ai_analysis)
         )
     
+    # (latitude, longitude) as last read from or written to the database
+    _location_state = (None, None)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'latitude' in instance.__dict__ and 'longitude' in instance.__dict__:
+            instance._location_state = (instance.latitude, instance.longitude)
+        return instance
+
     def save(self, *args, **kwargs):
         """Override save to calculate score automatically."""
         # Score is now calculated when a Rating is saved, not when a Property is saved.
         # We can remove the automatic calculation from here to avoid circular updates.
         # self.calculate_score() 
+        from .services.addresses import address_key
+
+        if self._state.adding and self.owner_id:
+            # A new property has no ratings yet, so it only meets must-haves if there are none
+            self.must_haves_met = not Criterion.objects.filter(owner_id=self.owner_id, type='mustHave').exists()
+        self.address_key = address_key(self.address)
+        if (
+            self.latitude is not None and self.longitude is not None
+            and self.geocode_precision not in self.APPROXIMATE_PRECISIONS
+        ):
+            self.geocode_status = 'ok'
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived_fields = set()
+            if 'address' in update_fields:
+                derived_fields.add('address_key')
+            if {'latitude', 'longitude', 'geocode_precision'} & set(update_fields):
+                derived_fields.add('geocode_status')
+            kwargs['update_fields'] = {*update_fields, *derived_fields}
         super().save(*args, **kwargs)
 
+        location = (self.latitude, self.longitude)
+        if location != self._location_state and (update_fields is None or {'latitude', 'longitude'} & set(update_fields)):
+            from .services.distances import refresh_distances
+            from .services.rescoring import STORED_FIELDS
+
+            if refresh_distances(self.owner_id, property_ids=[self.pk]):
+                # Distance-based ratings changed the score behind this instance's back
+                self.refresh_from_db(fields=STORED_FIELDS)
+        self._location_state = location
+
     def __str__(self):
         return self.address
 
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Properties"
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='property_owner_created_idx'),
+            models.Index(fields=['owner', 'score'], name='property_owner_score_idx'),
+            models.Index(fields=['owner', 'price'], name='property_owner_price_idx'),
+            models.Index(fields=['owner', 'status'], name='property_owner_status_idx'),
+            models.Index(fields=['owner', 'must_haves_met', 'deal_breakers_present'], name='property_owner_flags_idx'),
+            models.Index(fields=['owner', 'updated_at'], name='property_owner_updated_idx'),
+            models.Index(fields=['owner', 'address_key'], name='property_owner_address_key_idx'),
+            # Map viewport queries: a latitude range per owner, longitudes read from the index
+            models.Index(fields=['owner', 'latitude', 'longitude'], name='property_owner_lat_lng_idx'),
+        ]
+
+class DeletedProperty(models.Model):
+    """Tombstone for a deleted property, read by the delta sync endpoint."""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deleted_properties')
+    property_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Deleted property {self.property_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'deleted_at'], name='deleted_owner_deleted_at_idx'),
+        ]
+
+class ImportJob(models.Model):
+    """A background CSV import and its progress, checkpointed after every committed chunk."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=1024, help_text="Spooled copy of the upload")
+    field_mapping = models.JSONField(default=dict)
+    # Data rows consumed by committed chunks; a restarted job skips this many
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import {self.file_name} ({self.status})"
+
+class GeocodeCache(models.Model):
+    """A geocoder answer for an address key, shared by all users until it expires."""
+    address_key = models.CharField(max_length=255, unique=True)
+    query = models.CharField(max_length=255, help_text="Address as sent to the geocoder")
+    # Both null for a negative result: the geocoder found nothing
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    provider = models.CharField(max_length=50)
+    precision = models.CharField(max_length=20, choices=Property.GEOCODE_PRECISION_CHOICES, default='address')
+    confidence = models.FloatField(null=True, blank=True, help_text="Provider's relevance score for the match (0-1)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    @property
+    def found(self):
+        return self.latitude is not None and self.longitude is not None
+
+    def __str__(self):
+        return f"{self.address_key} ({self.provider})"
+
+class GeocodeJob(models.Model):
+    """A background geocoding run over a user's properties without coordinates."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='geocode_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_count = models.PositiveIntegerField(default=0)
+    # Properties are geocoded in pk order; a restarted job continues after this one
+    last_property_id = models.BigIntegerField(null=True, blank=True)
+    processed_count = models.PositiveIntegerField(default=0)
+    geocoded_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Geocoding for {self.owner} ({self.status})"
+
+class PointOfInterest(models.Model):
+    """A place a user measures properties against, such as work, a school or family."""
+    KIND_CHOICES = [
+        ('work', 'Work'),
+        ('school', 'School'),
+        ('family', 'Family'),
+        ('other', 'Other'),
+    ]
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='points_of_interest')
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='other')
+    address = models.CharField(max_length=255, blank=True, default='')
+    # Unset until the address is geocoded; distances are only kept for placed points
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    geocode_status = models.CharField(max_length=10, choices=Property.GEOCODE_STATUS_CHOICES, default='ok', help_text="Pending while the address awaits a network geocoder")
+    geocode_precision = models.CharField(max_length=20, choices=Property.GEOCODE_PRECISION_CHOICES, blank=True, default='', help_text="What the coordinates locate; blank if they were set by hand")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_kind_display()})"
+
+    class Meta:
+        ordering = ['name']
 
 class Criterion(models.Model):
     """Represents a user-defined criterion for scoring properties."""
@@ -133,6 +317,12 @@ class Criterion(models.Model):
         ('scale10', 'Scale (1-10)'),
     ]
     rating_type = models.CharField(max_length=20, choices=RATING_TYPE_CHOICES, default='stars', help_text="Only for Nice-to-Haves")
+    # Nice-to-haves tied to a point of interest are rated from the distance to it
+    point_of_interest = models.ForeignKey(
+        PointOfInterest, on_delete=models.SET_NULL, blank=True, null=True, related_name='criteria',
+    )
+    ideal_distance_km = models.FloatField(default=1, help_text="Distance at or under which a property gets the best rating")
+    max_distance_km = models.FloatField(default=20, help_text="Distance from which a property gets the worst rating")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -147,17 +337,108 @@ class Rating(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='ratings')
     criterion = models.ForeignKey(Criterion, on_delete=models.CASCADE, related_name='ratings')
     value = models.CharField(max_length=20, blank=True, null=True, help_text="The rating value (e.g., '4', 'yes', '8')")
+    # Typed copies of value, derived on save so scoring never parses strings
+    normalized_value = models.FloatField(blank=True, null=True, help_text="Value on a 0-10 scale for the criterion's rating type")
+    bool_value = models.BooleanField(blank=True, null=True, help_text="True for 'yes', False for 'no'")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    SCORED_FIELDS = ('criterion_id', 'normalized_value', 'bool_value')
+
+    def set_typed_values(self):
+        """Derive normalized_value and bool_value from value and the criterion's rating type."""
+        from .services.scoring import typed_rating_values
+
+        self.normalized_value, self.bool_value = typed_rating_values(self.criterion.rating_type, self.value)
+
+    def _get_scored_state(self):
+        return tuple(getattr(self, field) for field in self.SCORED_FIELDS)
+
+    def _lock_scored_state(self):
+        """
+        Lock the property, as upsert_ratings and rescore_properties do, and
+        return SCORED_FIELDS as this rating's row holds them now (None if
+        there's no row). Concurrent writes then apply their deltas in turn.
+        """
+        Property.objects.select_for_update().filter(pk=self.property_id).values_list('pk').first()
+        if self.pk is None:
+            return None
+        return Rating.objects.select_for_update().filter(pk=self.pk).values_list(*self.SCORED_FIELDS).first()
+
     def save(self, *args, **kwargs):
-        """Override save to trigger score recalculation on the related property."""
-        super().save(*args, **kwargs)
-        self.property.calculate_score()
-        self.property.save()
+        """Override save to apply this rating's change to the property's score."""
+        from .services.scoring import apply_score_delta, contribution_delta, rating_contribution
+
+        self.set_typed_values()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            if not {'value', 'criterion', 'criterion_id'} & set(update_fields):
+                # Nothing scored is written
+                return super().save(*args, **kwargs)
+            if 'value' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'normalized_value', 'bool_value'}
+
+        new_contribution = rating_contribution(self.criterion, self.normalized_value, self.bool_value)
+        with transaction.atomic():
+            previous = self._lock_scored_state()
+            super().save(*args, **kwargs)
+
+            if previous is None:
+                old_contribution, old_type = None, None
+            elif previous == self._get_scored_state():
+                return
+            else:
+                old_criterion_id, old_normalized, old_bool = previous
+                if old_criterion_id == self.criterion_id:
+                    old_criterion = self.criterion
+                else:
+                    old_criterion = Criterion.objects.filter(pk=old_criterion_id).first()
+                    if old_criterion is None:
+                        # What the old criterion contributed is unknown, so rescore from scratch
+                        self.property.calculate_score()
+                        self.property.save()
+                        return
+                old_contribution = rating_contribution(old_criterion, old_normalized, old_bool)
+                old_type = old_criterion.type
+
+            refresh_flags = bool({self.criterion.type, old_type} & {'mustHave', 'dealBreaker'})
+            apply_score_delta(self.property_id, contribution_delta(old_contribution, new_contribution), refresh_flags)
+        self._refresh_cached_property()
+
+    def delete(self, *args, **kwargs):
+        """Delete the rating; the post_delete handler unscores the values its row held."""
+        with transaction.atomic():
+            current = self._lock_scored_state()
+            if current is None:
+                # Already deleted, and unscored, by someone else
+                return 0, {}
+            self.criterion_id, self.normalized_value, self.bool_value = current
+            return super().delete(*args, **kwargs)
+
+    def _refresh_cached_property(self):
+        """Keep an already loaded property object in step with the UPDATE."""
+        from .services.scoring import SCORE_AGGREGATE_FIELDS
+
+        if self._meta.get_field('property').is_cached(self):
+            self.property.refresh_from_db(fields=[
+                *SCORE_AGGREGATE_FIELDS, 'score', 'must_haves_met', 'deal_breakers_present', 'updated_at',
+            ])
 
     def __str__(self):
         return f"{self.property.address} - {self.criterion.text}: {self.value}"
 
     class Meta:
         unique_together = ('property', 'criterion') # Ensures one rating per criterion per property
+
+class PropertyDistance(models.Model):
+    """Great-circle distance from a property to one of its owner's points of interest, kept up to date on writes."""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='distances')
+    point_of_interest = models.ForeignKey(PointOfInterest, on_delete=models.CASCADE, related_name='distances')
+    distance_km = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('property', 'point_of_interest')
+
+    def __str__(self):
+        return f"{self.property} to {self.point_of_interest}: {self.distance_km:.1f} km"
@@ -0,0 +1,126 @@
+# core/pagination.py
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (cursor) pagination on an ordering key plus `id`.
+
+    Each page is fetched with a `WHERE (key, id) < (last_key, last_id)` style
+    filter instead of an OFFSET, so deep pages cost the same as the first one
+    and rows inserted while paging never shift the window.
+
+    Pagination is opt-in: without `cursor` or `page_size` in the query string
+    the view returns the plain, unpaginated list existing clients expect.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_page_size = 50
+    max_page_size = 200
+    invalid_cursor_message = 'Invalid cursor'
+
+    # (field, descending, nulls_last) - matches Property.Meta.ordering by default.
+    # Views can override it per request with a `get_keyset_ordering()` method.
+    default_ordering = ('created_at', True, True)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending, self.nulls_last = self.get_ordering(view)
+
+        queryset = queryset.order_by(*self.get_order_by())
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_after_filter(*cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        self.next_position = None
+        if self.has_next:
+            last = rows[-1]
+            self.next_position = (getattr(last, self.field), last.pk)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.default_page_size))
+        except (TypeError, ValueError):
+            return self.default_page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, 'get_keyset_ordering'):
+            return view.get_keyset_ordering()
+        return self.default_ordering
+
+    def get_order_by(self):
+        nulls = {'nulls_last': True} if self.nulls_last else {'nulls_first': True}
+        if self.descending:
+            return [F(self.field).desc(**nulls), F('pk').desc()]
+        return [F(self.field).asc(**nulls), F('pk').asc()]
+
+    def get_after_filter(self, value, pk):
+        """Build the predicate selecting rows strictly after `(value, pk)`."""
+        pk_after = Q(pk__lt=pk) if self.descending else Q(pk__gt=pk)
+        null_key = Q(**{f'{self.field}__isnull': True})
+
+        if value is None:
+            after = null_key & pk_after
+            if not self.nulls_last:
+                # Nulls sort first, so every non-null row is still ahead of us
+                after |= ~null_key
+            return after
+
+        lookup = 'lt' if self.descending else 'gt'
+        after = Q(**{f'{self.field}__{lookup}': value}) | (Q(**{self.field: value}) & pk_after)
+        if self.nulls_last:
+            after |= null_key
+        return after
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def encode_cursor(self, position):
+        value, pk = position
+        if isinstance(value, (datetime, date)):
+            # Full isoformat keeps microseconds so ties on the key aren't merged
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        payload = json.dumps([value, pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return value, int(pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
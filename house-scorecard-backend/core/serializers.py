@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Property, Criterion, Rating
+from .models import Property, Criterion, Rating, GeocodeJob, ImportJob, PointOfInterest
+from .services.addresses import address_key
+from .services.geocoding import geocode, is_approximate
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -19,8 +21,11 @@ class UserSerializer(serializers.ModelSerializer):
 class PropertySerializer(serializers.ModelSerializer):
     listingUrl = serializers.URLField(source='listing_url', allow_null=True, required=False)
     ratings = serializers.SerializerMethodField()
+    distances = serializers.SerializerMethodField()
     imageUrls = serializers.JSONField(source='image_urls', required=False)
     statusHistory = serializers.JSONField(source='status_history', required=False)
+    geocodeStatus = serializers.CharField(source='geocode_status', read_only=True)
+    geocodePrecision = serializers.CharField(source='geocode_precision', read_only=True)
     
     # AI Analysis fields - writable to accept data from frontend
     aiAnalysis = serializers.JSONField(source='ai_analysis', required=False, allow_null=True)
@@ -35,43 +40,215 @@ class PropertySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Property
-        fields = ('id', 'address', 'listingUrl', 'price', 'beds', 'baths', 'sqft', 'notes', 'latitude', 'longitude', 'imageUrls', 'ratings', 'score', 'status', 'statusHistory', 'aiAnalysis', 'aiOverallGrade', 'aiRedFlags', 'aiPositiveIndicators', 'aiPriceAssessment', 'aiBuyerRecommendation', 'aiConfidenceScore', 'aiAnalysisSummary', 'aiAnalysisDate', 'created_at', 'updated_at')
+        fields = ('id', 'address', 'listingUrl', 'price', 'beds', 'baths', 'sqft', 'notes', 'latitude', 'longitude', 'geocodeStatus', 'geocodePrecision', 'imageUrls', 'ratings', 'distances', 'score', 'status', 'statusHistory', 'aiAnalysis', 'aiOverallGrade', 'aiRedFlags', 'aiPositiveIndicators', 'aiPriceAssessment', 'aiBuyerRecommendation', 'aiConfidenceScore', 'aiAnalysisSummary', 'aiAnalysisDate', 'created_at', 'updated_at')
         extra_kwargs = {'listing_url': {'write_only': True}} # Make original field write-only if needed
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets: drop fields the client didn't ask for on reads
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            selected = set(self.get_sparse_field_names(request))
+            for field_name in list(self.fields):
+                if field_name not in selected:
+                    self.fields.pop(field_name)
+
+    @classmethod
+    def get_sparse_field_names(cls, request):
+        """
+        Return the API field names selected by `?fields=` and `?omit=`.
+        Both take comma-separated API names; `id` is always kept.
+        """
+        selected = list(cls.Meta.fields)
+        fields_param = request.query_params.get('fields')
+        omit_param = request.query_params.get('omit')
+
+        if fields_param:
+            wanted = {name.strip() for name in fields_param.split(',')}
+            selected = [name for name in selected if name in wanted or name == 'id']
+        if omit_param:
+            omitted = {name.strip() for name in omit_param.split(',')} - {'id'}
+            selected = [name for name in selected if name not in omitted]
+        return selected
+
+    @classmethod
+    def get_model_field_names(cls, field_names):
+        """Map API field names to the model columns they read from."""
+        fields = cls().fields
+        return {
+            fields[name].source for name in field_names
+            if name in fields and fields[name].source != '*'
+        }
+
+    def update(self, instance, validated_data):
+        # Coordinates changed by the client replace any geocoded position
+        if any(
+            field in validated_data and validated_data[field] != getattr(instance, field)
+            for field in ('latitude', 'longitude')
+        ):
+            instance.geocode_precision = ''
+        return super().update(instance, validated_data)
+
+    def validate_address(self, value):
+        """Reject an address the user already has a property for, in any spelling."""
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return value
+        key = address_key(value)
+        if self.instance is not None and key == self.instance.address_key:
+            # Imports can leave several properties sharing a key; saving one that keeps its address is fine
+            return value
+        duplicates = Property.objects.filter(owner=request.user, address_key=key)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError("You already have a property at this address.")
+        return value
+
     def get_ratings(self, obj):
         """Convert Rating objects to a dictionary format expected by frontend."""
-        from .models import Criterion
+        criterion_ids = self._get_owner_criterion_ids(obj.owner_id)
         ratings_dict = {}
-        
-        # Get all existing ratings for this property
-        existing_ratings = {r.criterion.id: r.value for r in obj.ratings.all()}
-        
-        # Include only criteria owned by the same user as the property
-        for criterion in Criterion.objects.filter(owner=obj.owner):
-            value = existing_ratings.get(criterion.id)
-            
+
+        # Uses the view's prefetched ratings, so no per-property criterion lookups
+        for rating in obj.ratings.all():
+            # Include only criteria owned by the same user as the property
+            if rating.criterion_id not in criterion_ids:
+                continue
+
+            value = rating.value
             if value is not None:
                 # Convert backend value format to frontend format
-                if value == 'yes':
-                    value = True
-                elif value == 'no':
-                    value = False
+                if rating.bool_value is not None:
+                    value = rating.bool_value
                 elif value and value.isdigit():
                     value = int(value)
-                ratings_dict[criterion.id] = value
+                ratings_dict[rating.criterion_id] = value
             # For unrated criteria, don't include them in the dict (undefined means unrated)
-            
+
         return ratings_dict
 
+    def get_distances(self, obj):
+        """Distances in km to each of the owner's points of interest, by point id."""
+        # Uses the view's prefetched distances, like ratings
+        return {distance.point_of_interest_id: round(distance.distance_km, 3) for distance in obj.distances.all()}
+
+    def _get_owner_criterion_ids(self, owner_id):
+        """
+        Return the criterion IDs owned by a user, queried once per request.
+        The context dict is shared by every child of a list serializer.
+        """
+        criterion_ids_by_owner = self.context.setdefault('criterion_ids_by_owner', {})
+        if owner_id not in criterion_ids_by_owner:
+            criterion_ids_by_owner[owner_id] = set(
+                Criterion.objects.filter(owner_id=owner_id).values_list('id', flat=True)
+            )
+        return criterion_ids_by_owner[owner_id]
+
+class PointOfInterestSerializer(serializers.ModelSerializer):
+    latitude = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    geocodeStatus = serializers.CharField(source='geocode_status', read_only=True)
+    geocodePrecision = serializers.CharField(source='geocode_precision', read_only=True)
+
+    class Meta:
+        model = PointOfInterest
+        fields = (
+            'id', 'name', 'kind', 'address', 'latitude', 'longitude', 'geocodeStatus', 'geocodePrecision',
+            'created_at', 'updated_at',
+        )
+
+    def validate(self, attrs):
+        """
+        Coordinates given by hand are final. Otherwise a new address is
+        placed from what is known offline, never waiting on the network;
+        anything missing or approximate stays pending until a background
+        geocoder refines it.
+        """
+        given = [field for field in ('latitude', 'longitude') if field in attrs]
+        if len(given) == 1:
+            missing = 'longitude' if given == ['latitude'] else 'latitude'
+            raise serializers.ValidationError({missing: ['Enter both coordinates.']})
+        if given:
+            attrs.update(geocode_status='ok', geocode_precision='')
+            return attrs
+
+        address = attrs.get('address', getattr(self.instance, 'address', ''))
+        if self.instance is not None and address == self.instance.address:
+            return attrs
+        if not address:
+            raise serializers.ValidationError({'address': ['Enter an address or coordinates.']})
+        answer = geocode(address, network=False)
+        attrs['latitude'] = answer['latitude'] if answer else None
+        attrs['longitude'] = answer['longitude'] if answer else None
+        attrs['geocode_precision'] = answer['precision'] if answer else ''
+        attrs['geocode_status'] = 'ok' if answer and not is_approximate(answer) else 'pending'
+        return attrs
+
 class CriterionSerializer(serializers.ModelSerializer):
     ratingType = serializers.CharField(source='rating_type', required=False, allow_null=True)
-    
+    pointOfInterest = serializers.PrimaryKeyRelatedField(
+        source='point_of_interest', queryset=PointOfInterest.objects.all(), required=False, allow_null=True,
+    )
+    idealDistanceKm = serializers.FloatField(source='ideal_distance_km', min_value=0, required=False)
+    maxDistanceKm = serializers.FloatField(source='max_distance_km', min_value=0, required=False)
+
     class Meta:
         model = Criterion
-        fields = ('id', 'text', 'type', 'weight', 'category', 'ratingType', 'created_at', 'updated_at')
+        fields = (
+            'id', 'text', 'type', 'weight', 'category', 'ratingType',
+            'pointOfInterest', 'idealDistanceKm', 'maxDistanceKm', 'created_at', 'updated_at',
+        )
         extra_kwargs = {'rating_type': {'write_only': True}}
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the user's own points of interest can be chosen
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            self.fields['pointOfInterest'].queryset = PointOfInterest.objects.filter(owner=request.user)
+
+    def validate(self, attrs):
+        ideal = attrs.get('ideal_distance_km', getattr(self.instance, 'ideal_distance_km', 1))
+        maximum = attrs.get('max_distance_km', getattr(self.instance, 'max_distance_km', 20))
+        if maximum < ideal:
+            raise serializers.ValidationError(
+                {'maxDistanceKm': ['Enter a distance no shorter than the ideal distance.']}
+            )
+        return attrs
+
 class RatingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rating
         fields = '__all__'
+        read_only_fields = ('normalized_value', 'bool_value')
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    fileName = serializers.CharField(source='file_name', read_only=True)
+    rowsProcessed = serializers.IntegerField(source='rows_processed', read_only=True)
+    created = serializers.IntegerField(source='created_count', read_only=True)
+    updated = serializers.IntegerField(source='updated_count', read_only=True)
+    error = serializers.CharField(source='error_message', read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = (
+            'id', 'status', 'fileName', 'rowsProcessed', 'created', 'updated', 'errors', 'error',
+            'created_at', 'updated_at', 'finished_at',
+        )
+        read_only_fields = fields
+
+class GeocodeJobSerializer(serializers.ModelSerializer):
+    total = serializers.IntegerField(source='total_count', read_only=True)
+    processed = serializers.IntegerField(source='processed_count', read_only=True)
+    geocoded = serializers.IntegerField(source='geocoded_count', read_only=True)
+    failed = serializers.IntegerField(source='failed_count', read_only=True)
+    error = serializers.CharField(source='error_message', read_only=True)
+
+    class Meta:
+        model = GeocodeJob
+        fields = (
+            'id', 'status', 'total', 'processed', 'geocoded', 'failed', 'error',
+            'created_at', 'updated_at', 'finished_at',
+        )
+        read_only_fields = fields
@@ -0,0 +1,54 @@
+# core/services/addresses.py
+import re
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# "AVENUESurrey" -> "AVENUE Surrey", a common realtor.ca scraping artifact
+RUN_ON_CITY_PATTERN = re.compile(r'([A-Z]{2,}|AVENUE|STREET|ROAD|DRIVE|LANE|WAY|COURT|PLACE)([A-Z][a-z]+)')
+RUN_ON_WORD_PATTERN = re.compile(r'([A-Za-z])([A-Z][a-z])')
+KEY_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+
+ADDRESS_KEY_MAX_LENGTH = 255
+
+
+def clean_address(address):
+    """Clean and format address string to fix common parsing issues"""
+    if not address:
+        return None
+
+    # Remove multiple spaces
+    address = WHITESPACE_PATTERN.sub(' ', address.strip())
+
+    # Fix missing spaces before city names (common realtor.ca issue)
+    address = RUN_ON_CITY_PATTERN.sub(r'\1 \2', address)
+
+    # Fix missing spaces around common address components
+    address = RUN_ON_WORD_PATTERN.sub(r'\1 \2', address)
+
+    # Clean up any double spaces created by the replacements
+    return WHITESPACE_PATTERN.sub(' ', address.strip())
+
+
+def rewrite_unit_prefix(address):
+    """Convert "#18 3303 STREET" to "3303 STREET, Unit 18", which geocoders understand."""
+    address = ' '.join(address.split())
+    if address.startswith('#'):
+        parts = address.split(' ', 2)
+        if len(parts) >= 3:
+            unit, street_num, rest = parts[0][1:], parts[1], parts[2]
+            address = f"{street_num} {rest}, Unit {unit}"
+    return address
+
+
+def address_key(address):
+    """
+    Canonical form of an address for duplicate matching.
+
+    Unit prefixes are rewritten as for geocoding, then case, punctuation
+    and spacing are dropped, so "#18 3303 Street" and "3303 street, unit 18"
+    share a key. Nothing depends on case: clean_address's run-on word
+    splitting would give "McDonald" and "MCDONALD" different keys.
+    """
+    if not address:
+        return ''
+    key = KEY_PUNCTUATION_PATTERN.sub(' ', rewrite_unit_prefix(address).casefold())
+    return ' '.join(key.split())[:ADDRESS_KEY_MAX_LENGTH]
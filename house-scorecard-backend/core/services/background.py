@@ -0,0 +1,27 @@
+# core/services/background.py
+import logging
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def start_thread(name, target, *args):
+    """
+    Run target(*args) in a daemon thread of this process, for work no
+    Celery worker can take. Errors are logged; the target is expected to
+    record its own outcome (job status, geocode status, ...).
+    """
+    def run():
+        try:
+            target(*args)
+        except Exception as e:
+            logger.error(f"{name} failed: {e}")
+        finally:
+            # The thread's connection isn't closed by the request cycle
+            connection.close()
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
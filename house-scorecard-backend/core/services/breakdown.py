@@ -0,0 +1,90 @@
+# core/services/breakdown.py
+from django.core.cache import cache
+
+from ..models import Criterion, Rating
+from ..versioning import get_collection_version
+from .scoring import SCORE_AGGREGATE_FIELDS, rating_contribution, score_from_aggregates
+
+BREAKDOWN_CACHE_KEY = 'score-breakdown:{user_id}:{property_id}:{version}'
+BREAKDOWN_CACHE_TIMEOUT = 60 * 60
+
+
+def breakdown_cache_key(user_id, property_id):
+    # Every rating and criterion write advances the collection version
+    version = get_collection_version(user_id)
+    return BREAKDOWN_CACHE_KEY.format(user_id=user_id, property_id=property_id, version=version)
+
+
+def build_score_breakdown(property_obj):
+    """
+    Explain a property's score: each criterion's normalized value and
+    contribution, plus the deal breakers or must-haves that zeroed it.
+    Uses the same per-rating rules as the stored score.
+    """
+    ratings = {
+        rating.criterion_id: rating
+        for rating in Rating.objects.filter(property_id=property_obj.pk).select_related('criterion')
+    }
+    totals = dict.fromkeys(SCORE_AGGREGATE_FIELDS, 0)
+    contributions = {}
+    for criterion_id, rating in ratings.items():
+        contributions[criterion_id] = rating_contribution(rating.criterion, rating.normalized_value, rating.bool_value)
+        for field, amount in contributions[criterion_id].items():
+            totals[field] += amount
+    score = score_from_aggregates(**totals)
+    total_weight = totals['score_total_weight']
+
+    criteria = []
+    zeroed_by = []
+    for criterion in Criterion.objects.filter(owner_id=property_obj.owner_id).order_by('type', 'text'):
+        rating = ratings.get(criterion.id)
+        contribution = contributions.get(criterion.id) or dict.fromkeys(SCORE_AGGREGATE_FIELDS, 0)
+        counted = contribution['score_total_weight'] > 0
+        points = contribution['score_weighted_sum']
+        criteria.append({
+            'id': criterion.id,
+            'text': criterion.text,
+            'type': criterion.type,
+            'weight': criterion.weight,
+            'ratingType': criterion.rating_type,
+            'value': rating.value if rating else None,
+            'normalizedValue': rating.normalized_value if rating else None,
+            'counted': counted,
+            'points': points,
+            'maxPoints': criterion.weight * 10 if counted else 0,
+            # Share of the 0-100 score before any zeroing
+            'contribution': points * 10 / total_weight if counted else 0,
+        })
+
+        reason = None
+        if contribution['deal_breaker_hits']:
+            reason = 'dealBreaker'
+        elif contribution['unmet_must_haves']:
+            reason = 'mustHaveFailed'
+        elif contribution['unconfirmed_must_haves'] and total_weight == 0:
+            # With nothing weighted, a must-have that isn't a yes also scores 0
+            reason = 'mustHaveUnconfirmed'
+        if reason and score == 0:
+            zeroed_by.append({'id': criterion.id, 'text': criterion.text, 'reason': reason})
+
+    return {
+        'propertyId': property_obj.pk,
+        'score': score,
+        'zeroedBy': zeroed_by,
+        'pointsEarned': totals['score_weighted_sum'],
+        'maxPossiblePoints': total_weight * 10,
+        'criteria': criteria,
+    }
+
+
+def get_score_breakdown(user_id, property_id, load_property):
+    """
+    Return the cached breakdown for a property, building it on a miss.
+    `load_property` is only called on a miss, so a hit costs no queries.
+    """
+    key = breakdown_cache_key(user_id, property_id)
+    breakdown = cache.get(key)
+    if breakdown is None:
+        breakdown = build_score_breakdown(load_property())
+        cache.set(key, breakdown, BREAKDOWN_CACHE_TIMEOUT)
+    return breakdown
@@ -0,0 +1,165 @@
+# core/services/distances.py
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import Criterion, PointOfInterest, Property, PropertyDistance, Rating
+from ..versioning import bump_collection_version
+from .proximity import haversine_km
+from .rescoring import rescore_properties
+from .scoring import upsert_ratings
+
+
+def distance_rating_value(criterion, distance_km):
+    """
+    The rating a distance earns on a criterion tied to a point of interest:
+    the best within ideal_distance_km, the worst from max_distance_km on,
+    and proportionally in between. Yes/no criteria are a yes within
+    max_distance_km.
+    """
+    if criterion.rating_type == 'yesNo':
+        return 'yes' if distance_km <= criterion.max_distance_km else 'no'
+    span = criterion.max_distance_km - criterion.ideal_distance_km
+    if span > 0:
+        closeness = min(max((criterion.max_distance_km - distance_km) / span, 0.0), 1.0)
+    else:
+        closeness = float(distance_km <= criterion.ideal_distance_km)
+    best = 5 if criterion.rating_type == 'stars' else 10
+    return str(round(1 + (best - 1) * closeness))
+
+
+def refresh_distances(owner_id, property_ids=None, point_ids=None):
+    """
+    Recompute the distance table between a user's properties and points of
+    interest, for just property_ids and/or point_ids when given, then
+    re-rate the criteria tied to those points. Properties and points
+    without coordinates lose their distances.
+
+    Returns the number of ratings written.
+    """
+    points = PointOfInterest.objects.filter(owner_id=owner_id)
+    if point_ids is not None:
+        points = points.filter(pk__in=point_ids)
+        # A point whose address awaits geocoding can't be measured from
+        unplaced = PropertyDistance.objects.filter(point_of_interest__in=points.filter(
+            Q(latitude__isnull=True) | Q(longitude__isnull=True)
+        ))
+        if property_ids is not None:
+            unplaced = unplaced.filter(property_id__in=property_ids)
+        touched_ids = list(unplaced.values_list('property_id', flat=True).distinct())
+        if touched_ids:
+            with transaction.atomic():
+                unplaced.delete()
+                Property.objects.filter(pk__in=touched_ids).update(updated_at=timezone.now())
+                bump_collection_version(owner_id)
+    points = list(
+        points.filter(latitude__isnull=False, longitude__isnull=False)
+        .order_by('pk').values_list('pk', 'latitude', 'longitude')
+    )
+    if not points:
+        return 0
+    point_pks = [pk for pk, _, _ in points]
+
+    properties = Property.objects.filter(owner_id=owner_id)
+    if property_ids is not None:
+        properties = properties.filter(pk__in=property_ids)
+    located = list(
+        properties.filter(latitude__isnull=False, longitude__isnull=False)
+        .order_by('pk').values_list('pk', 'latitude', 'longitude')
+    )
+
+    entries = []
+    if located:
+        property_coordinates = np.array([row[1:] for row in located], dtype=float)
+        point_coordinates = np.array([row[1:] for row in points], dtype=float)
+        # Every property against every point in one broadcast: a (P, J) matrix
+        matrix = haversine_km(
+            point_coordinates[:, 0], point_coordinates[:, 1],
+            property_coordinates[:, :1], property_coordinates[:, 1:],
+        )
+        entries = [
+            PropertyDistance(property_id=property_pk, point_of_interest_id=point_pk, distance_km=distance)
+            for (property_pk, _, _), row in zip(located, matrix.tolist())
+            for point_pk, distance in zip(point_pks, row)
+        ]
+
+    with transaction.atomic():
+        PropertyDistance.objects.filter(
+            property__in=properties.filter(Q(latitude__isnull=True) | Q(longitude__isnull=True)),
+            point_of_interest_id__in=point_pks,
+        ).delete()
+        PropertyDistance.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['property', 'point_of_interest'],
+            update_fields=['distance_km', 'updated_at'],
+            batch_size=500,
+        )
+        # Serialized distances changed, so delta sync has to send these again
+        properties.update(updated_at=timezone.now())
+        bump_collection_version(owner_id)
+
+        criteria = Criterion.objects.filter(owner_id=owner_id, point_of_interest_id__in=point_pks)
+        return refresh_distance_ratings(criteria, property_ids=property_ids)
+
+
+def refresh_distance_ratings(criteria, property_ids=None):
+    """
+    Rate properties on nice-to-haves tied to a point of interest, from the
+    stored distances, and rescore those whose ratings changed. Properties
+    without a distance keep whatever rating they have.
+
+    Returns the number of ratings written.
+    """
+    criteria = [c for c in criteria if c.type == 'niceToHave' and c.point_of_interest_id]
+    if not criteria:
+        return 0
+    owner_id = criteria[0].owner_id
+
+    distances = PropertyDistance.objects.filter(
+        point_of_interest_id__in={c.point_of_interest_id for c in criteria},
+    )
+    current = Rating.objects.filter(criterion__in=criteria)
+    if property_ids is not None:
+        distances = distances.filter(property_id__in=property_ids)
+        current = current.filter(property_id__in=property_ids)
+    distances_by_point = {}
+    for property_id, point_id, distance_km in distances.values_list('property_id', 'point_of_interest_id', 'distance_km'):
+        distances_by_point.setdefault(point_id, {})[property_id] = distance_km
+    current_values = {
+        (property_id, criterion_id): value
+        for property_id, criterion_id, value in current.values_list('property_id', 'criterion_id', 'value')
+    }
+
+    ratings = []
+    for criterion in criteria:
+        for property_id, distance_km in distances_by_point.get(criterion.point_of_interest_id, {}).items():
+            value = distance_rating_value(criterion, distance_km)
+            if current_values.get((property_id, criterion.pk)) != value:
+                rating = Rating(property_id=property_id, criterion=criterion, value=value)
+                rating.set_typed_values()
+                ratings.append(rating)
+    if not ratings:
+        return 0
+
+    changed_ids = {rating.property_id for rating in ratings}
+    if len(changed_ids) == 1:
+        # One property, e.g. one that just moved, is rescored on its own
+        upsert_ratings(changed_ids.pop(), {rating.criterion: rating.value for rating in ratings})
+        return len(ratings)
+
+    with transaction.atomic():
+        Rating.objects.bulk_create(
+            ratings,
+            update_conflicts=True,
+            unique_fields=['property', 'criterion'],
+            update_fields=['value', 'normalized_value', 'bool_value', 'updated_at'],
+            batch_size=500,
+        )
+        # A changed rating can leave the score as it was, so touch every property it's on
+        Property.objects.filter(pk__in=changed_ids).update(updated_at=timezone.now())
+        bump_collection_version(owner_id)
+        # Only these properties' ratings changed, so an import chunk doesn't rescore the whole collection
+        rescore_properties(owner_id, property_ids=changed_ids)
+    return len(ratings)
@@ -0,0 +1,137 @@
+# core/services/gazetteer.py
+import bisect
+import logging
+import mmap
+import os
+import re
+import struct
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# File layout: a header, then fixed-size records sorted by key. A key is a
+# postal code without its space ("M5V1A1") or a space-padded FSA ("M5V   ").
+GAZETTEER_MAGIC = b'PCGZ'
+GAZETTEER_VERSION = 1
+HEADER = struct.Struct('<4sBI')
+RECORD = struct.Struct('<6sff')
+KEY_LENGTH = 6
+
+# Canadian postal codes never use D, F, I, O, Q or U, nor W or Z first
+POSTAL_CODE_PATTERN = re.compile(
+    r'\b([ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z])[ -]?(\d[ABCEGHJ-NPRSTV-Z]\d)?\b',
+    re.IGNORECASE,
+)
+
+
+def gazetteer_key(code):
+    return code.upper().replace(' ', '').ljust(KEY_LENGTH).encode('ascii')
+
+
+def find_postal_code(address):
+    """(FSA, full postal code or None) of the last postal code in an address, or None."""
+    matches = POSTAL_CODE_PATTERN.findall(address or '')
+    if not matches:
+        return None
+    fsa, ldu = matches[-1]
+    return fsa.upper(), (fsa + ldu).upper() if ldu else None
+
+
+class _Keys:
+    """The records' keys as a sequence, so bisect can search the mapped file."""
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        offset = HEADER.size + index * RECORD.size
+        return self.buffer[offset:offset + KEY_LENGTH]
+
+
+class PostalGazetteer:
+    """
+    Postal code and FSA centroids, memory-mapped from a file written by
+    write_gazetteer. Lookups binary-search the mapped records, so the
+    table is never loaded into Python objects.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as gazetteer_file:
+            self.buffer = mmap.mmap(gazetteer_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.buffer)
+        if magic != GAZETTEER_MAGIC or version != GAZETTEER_VERSION:
+            raise ValueError(f'{path} is not a version {GAZETTEER_VERSION} postal gazetteer')
+        if len(self.buffer) != HEADER.size + count * RECORD.size:
+            raise ValueError(f'{path} is truncated')
+        self.keys = _Keys(self.buffer, count)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, code):
+        """(latitude, longitude) of a postal code or FSA, or None."""
+        key = gazetteer_key(code)
+        index = bisect.bisect_left(self.keys, key)
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        _, latitude, longitude = RECORD.unpack_from(self.buffer, HEADER.size + index * RECORD.size)
+        return latitude, longitude
+
+    def locate(self, address):
+        """(latitude, longitude, precision) from an address's postal code, or None."""
+        codes = find_postal_code(address)
+        if codes is None:
+            return None
+        fsa, postal_code = codes
+        if postal_code:
+            coordinates = self.get(postal_code)
+            if coordinates:
+                return (*coordinates, 'postal_code')
+        coordinates = self.get(fsa)
+        if coordinates:
+            return (*coordinates, 'fsa')
+        return None
+
+
+def write_gazetteer(path, entries):
+    """
+    Write (code, latitude, longitude) entries as a gazetteer file.
+    Codes are postal codes or FSAs; a repeated code keeps its last entry.
+    """
+    records = {gazetteer_key(code): (latitude, longitude) for code, latitude, longitude in entries}
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as gazetteer_file:
+        gazetteer_file.write(HEADER.pack(GAZETTEER_MAGIC, GAZETTEER_VERSION, len(records)))
+        for key in sorted(records):
+            gazetteer_file.write(RECORD.pack(key, *records[key]))
+    # Readers never see a half-written file
+    os.replace(temp_path, path)
+    return len(records)
+
+
+_gazetteers = {}
+
+
+def get_gazetteer():
+    """
+    The gazetteer at POSTAL_GAZETTEER_PATH, mapped on first use once per
+    process, or None if there isn't one.
+    """
+    path = settings.POSTAL_GAZETTEER_PATH
+    if path not in _gazetteers:
+        try:
+            _gazetteers[path] = PostalGazetteer(path)
+        except FileNotFoundError:
+            # Optional: the deploy builds it (see build.sh), development setups usually don't
+            logger.debug(f"No postal gazetteer at {path}; run build_postal_gazetteer to geocode offline")
+            _gazetteers[path] = None
+        except ValueError as e:
+            logger.error(f"Can't use postal gazetteer: {e}")
+            _gazetteers[path] = None
+    return _gazetteers[path]
@@ -0,0 +1,419 @@
+# core/services/geocoding.py
+import logging
+import math
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from curl_cffi import requests as cf_requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import GeocodeCache, GeocodeJob, PointOfInterest, Property
+from ..versioning import bump_collection_version
+from .addresses import address_key, rewrite_unit_prefix
+from .background import start_thread
+from .distances import refresh_distances
+from .gazetteer import get_gazetteer
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = 'https://nominatim.openstreetmap.org/search'
+NOMINATIM_TIMEOUT = 10
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+# A running job saves progress after every property, so one silent for this
+# long was lost with its worker
+GEOCODE_JOB_STALE_AFTER = timedelta(minutes=10)
+
+
+class GeocodingError(Exception):
+    """The geocoder couldn't be asked; unlike a miss, this isn't cached."""
+
+
+class TokenBucket:
+    """
+    A token bucket shared by every process through the Django cache.
+
+    Tokens are numbered time slots, `rate` per second. Taking one is an
+    atomic cache.add of its slot's key, so two workers can never spend the
+    same token; the unclaimed slots among the last `capacity` are the
+    tokens saved up.
+    """
+
+    def __init__(self, name, rate, capacity=1):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        # Long enough to outlive every slot that can still be claimed
+        self.key_timeout = math.ceil(capacity / rate) + 1
+
+    def try_acquire(self):
+        current_slot = math.floor(time.time() * self.rate)
+        for slot in range(current_slot - self.capacity + 1, current_slot + 1):
+            if cache.add(f'token-bucket:{self.name}:{slot}', 1, self.key_timeout):
+                return True
+        return False
+
+    def acquire(self):
+        """Wait until a token is free and take it."""
+        while not self.try_acquire():
+            next_slot = math.floor(time.time() * self.rate) + 1
+            time.sleep(max(next_slot / self.rate - time.time(), 0.01))
+
+
+def nominatim_bucket():
+    return TokenBucket('nominatim', settings.NOMINATIM_REQUESTS_PER_SECOND)
+
+
+def nominatim_search(query):
+    """(latitude, longitude, confidence) of Nominatim's best match, or None if it found nothing."""
+    try:
+        # Use curl_cffi for geocoding as well to maintain consistency
+        response = cf_requests.get(
+            NOMINATIM_URL,
+            params={
+                'format': 'json',
+                'q': query,
+                'limit': 1,
+                'countrycodes': 'ca,us'
+            },
+            timeout=NOMINATIM_TIMEOUT,
+            headers={'User-Agent': BROWSER_USER_AGENT},
+            impersonate="chrome120"
+        )
+        data = response.json()
+        if not data:
+            return None
+        result = data[0]
+        return float(result['lat']), float(result['lon']), result.get('importance')
+    except Exception as e:
+        raise GeocodingError(str(e)) from e
+
+
+# Higher is more precise
+PRECISION_RANKS = {'fsa': 1, 'postal_code': 2, 'address': 3}
+
+
+def answer_of(entry):
+    if not entry.found:
+        return None
+    return {'latitude': entry.latitude, 'longitude': entry.longitude, 'precision': entry.precision}
+
+
+def cached_geocodes(keys):
+    """Address key -> answer, or None for a known miss, for every unexpired cache entry."""
+    keys = [key for key in keys if key]
+    if not keys:
+        return {}
+    entries = GeocodeCache.objects.filter(address_key__in=keys, expires_at__gt=timezone.now())
+    return {entry.address_key: answer_of(entry) for entry in entries}
+
+
+def store_geocode(key, query, result, provider, precision='address'):
+    if result is None:
+        latitude = longitude = confidence = None
+        ttl_days = settings.GEOCODE_NEGATIVE_CACHE_TTL_DAYS
+    else:
+        latitude, longitude, confidence = result
+        ttl_days = settings.GEOCODE_CACHE_TTL_DAYS
+    entry, _ = GeocodeCache.objects.update_or_create(
+        address_key=key,
+        defaults={
+            'query': query[:GeocodeCache._meta.get_field('query').max_length],
+            'latitude': latitude,
+            'longitude': longitude,
+            'provider': provider,
+            'precision': precision,
+            'confidence': confidence,
+            'expires_at': timezone.now() + timedelta(days=ttl_days),
+        },
+    )
+    return entry
+
+
+# Geocoders take (address, network, cached) and return an answer or None;
+# `cached` is a prefetched cached_geocodes() result, if the caller has one
+
+def locate_postal_code(address, network, cached=None):
+    """Centroid of the address's postal code or FSA, from the offline gazetteer."""
+    gazetteer = get_gazetteer()
+    found = gazetteer.locate(address) if gazetteer else None
+    if found is None:
+        return None
+    latitude, longitude, precision = found
+    return {'latitude': latitude, 'longitude': longitude, 'precision': precision}
+
+
+def locate_nominatim(address, network, cached=None):
+    """
+    Nominatim's answer, shared through GeocodeCache by every user, misses
+    included, so only addresses nobody has looked up recently reach it.
+    """
+    key = address_key(address)
+    if not key:
+        return None
+    if cached is None:
+        cached = cached_geocodes([key])
+    if key in cached:
+        return cached[key]
+    if not network:
+        return None
+
+    # Clean up address format for better geocoding results, handling
+    # Canadian unit prefixes like "#18 3303 STREET"
+    query = rewrite_unit_prefix(address)
+    logger.info(f"Geocoding address: '{address}' -> '{query}'")
+    nominatim_bucket().acquire()
+    result = nominatim_search(query)
+    return answer_of(store_geocode(key, query, result, 'nominatim'))
+
+
+# `best_precision` is the most precise answer a geocoder can give
+Geocoder = namedtuple('Geocoder', ['locate', 'offline', 'best_precision'])
+
+GEOCODERS = {
+    'postal_code': Geocoder(locate_postal_code, True, 'postal_code'),
+    'nominatim': Geocoder(locate_nominatim, False, 'address'),
+}
+
+
+def geocode(address, network=True, cached=None):
+    """
+    Best position for an address as {'latitude', 'longitude', 'precision'},
+    or None if no geocoder in GEOCODER_CHAIN finds it.
+
+    Geocoders are asked in chain order, skipping any that can't beat the
+    answer so far, so the offline gazetteer answers first and Nominatim
+    only refines it. With network=False, network geocoders only give their
+    cached answers. Raises GeocodingError if a geocoder that could have
+    given a better answer couldn't be asked.
+    """
+    best = None
+    error = None
+    for name in settings.GEOCODER_CHAIN:
+        geocoder = GEOCODERS[name.strip()]
+        if best and PRECISION_RANKS[best['precision']] >= PRECISION_RANKS[geocoder.best_precision]:
+            continue
+        try:
+            answer = geocoder.locate(address, network, cached)
+        except GeocodingError as e:
+            error = e
+            continue
+        if answer and (best is None or PRECISION_RANKS[answer['precision']] > PRECISION_RANKS[best['precision']]):
+            best = answer
+    if error is not None and (best is None or best['precision'] != 'address'):
+        raise error
+    return best
+
+
+def geocode_address(address):
+    """Like geocode, but with whatever is known offline when a geocoder can't be reached."""
+    try:
+        return geocode(address)
+    except GeocodingError as e:
+        logger.error(f'Geocoding failed for address "{address}": {e}')
+        return geocode(address, network=False)
+
+
+def parse_coordinates(latitude, longitude):
+    """(latitude, longitude) as floats, or None unless they're a plausible position."""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    # NaN fails both range checks; 0,0 is a placeholder, not a listing
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or (latitude, longitude) == (0, 0):
+        return None
+    return latitude, longitude
+
+
+def is_approximate(answer):
+    return answer['precision'] in Property.APPROXIMATE_PRECISIONS
+
+
+def fill_offline_coordinates(properties):
+    """
+    Set positions on unsaved properties that have none, from the cache and
+    offline geocoders only. Returns the properties that were filled in.
+    """
+    missing = [p for p in properties if p.latitude is None or p.longitude is None]
+    cached = cached_geocodes({p.address_key for p in missing})
+    filled = []
+    for property_obj in missing:
+        answer = geocode(property_obj.address, network=False, cached=cached)
+        if answer:
+            property_obj.latitude = answer['latitude']
+            property_obj.longitude = answer['longitude']
+            property_obj.geocode_precision = answer['precision']
+            # Bulk writes skip Property.save, which normally sets this
+            property_obj.geocode_status = 'pending' if is_approximate(answer) else 'ok'
+            filled.append(property_obj)
+    return filled
+
+
+def properties_to_geocode(owner_id):
+    """Properties without coordinates, or whose approximate ones await refinement."""
+    return Property.objects.filter(owner_id=owner_id).filter(
+        Q(latitude__isnull=True) | Q(longitude__isnull=True) | Q(geocode_status='pending')
+    ).exclude(address='')
+
+
+def save_geocode_result(property_obj, answer, pending=False):
+    """
+    Store a geocoding answer for a property: its position, or that none was
+    found. With `pending`, the property still awaits a better answer. A
+    property given coordinates by hand in the meantime is left alone.
+    Returns whether the property was updated.
+    """
+    if answer:
+        fields = {
+            'geocode_status': 'pending' if pending else 'ok',
+            'latitude': answer['latitude'],
+            'longitude': answer['longitude'],
+            'geocode_precision': answer['precision'],
+        }
+    else:
+        fields = {'geocode_status': 'failed'}
+    updated = properties_to_geocode(property_obj.owner_id).filter(pk=property_obj.pk).update(
+        updated_at=timezone.now(), **fields,
+    )
+    if updated:
+        bump_collection_version(property_obj.owner_id)
+        if answer:
+            refresh_distances(property_obj.owner_id, property_ids=[property_obj.pk])
+    return bool(updated)
+
+
+def geocode_property(property_id):
+    """
+    Geocode a property saved without coordinates, or refine approximate
+    ones. Returns the property, or None if it no longer needs geocoding. GeocodingError is left to the
+    caller, and the property stays pending.
+    """
+    property_obj = Property.objects.filter(pk=property_id).only('owner_id', 'address').first()
+    if property_obj is None:
+        return None
+    if not properties_to_geocode(property_obj.owner_id).filter(pk=property_id, geocode_status='pending').exists():
+        return None
+    save_geocode_result(property_obj, geocode(property_obj.address))
+    property_obj.refresh_from_db()
+    return property_obj
+
+
+def geocode_point_of_interest(point_id):
+    """
+    Geocode a point of interest saved with an approximate position or none,
+    then measure properties from it. Returns the point, or None if it no
+    longer needs geocoding. GeocodingError is left to the caller, and the
+    point stays pending.
+    """
+    point = PointOfInterest.objects.filter(pk=point_id, geocode_status='pending').first()
+    if point is None:
+        return None
+    answer = geocode(point.address)
+    if answer:
+        fields = {
+            'geocode_status': 'ok',
+            'latitude': answer['latitude'],
+            'longitude': answer['longitude'],
+            'geocode_precision': answer['precision'],
+        }
+    else:
+        fields = {'geocode_status': 'failed'}
+    # Left alone if its address or coordinates were edited in the meantime
+    updated = PointOfInterest.objects.filter(
+        pk=point_id, geocode_status='pending', address=point.address,
+    ).update(updated_at=timezone.now(), **fields)
+    if updated:
+        bump_collection_version(point.owner_id)
+        if answer:
+            refresh_distances(point.owner_id, point_ids=[point_id])
+    point.refresh_from_db()
+    return point
+
+
+def run_geocode_job(job_id):
+    """
+    Geocode a user's properties without coordinates, or resume after a restart.
+
+    Each property's coordinates are committed as soon as they resolve,
+    together with the job's progress, so the map can show them while the
+    job runs. Nominatim calls wait on the shared rate limit.
+    """
+    job = GeocodeJob.objects.get(pk=job_id)
+    if job.status in ('completed', 'failed'):
+        return job
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+
+    pending = properties_to_geocode(job.owner_id).order_by('pk')
+    if job.last_property_id is not None:
+        pending = pending.filter(pk__gt=job.last_property_id)
+    # Read up front rather than holding a cursor open for the whole rate-limited run
+    for property_obj in list(pending.only('owner_id', 'address')):
+        try:
+            answer = geocode(property_obj.address)
+            answered = True
+        except GeocodingError as e:
+            # Left pending rather than failed, so a later job tries again,
+            # with whatever is known offline in the meantime
+            logger.error(f'Geocoding failed for address "{property_obj.address}": {e}')
+            answer = geocode(property_obj.address, network=False)
+            answered = False
+        with transaction.atomic():
+            updated = (answer or answered) and save_geocode_result(property_obj, answer, pending=not answered)
+            if answer is None:
+                job.failed_count += 1
+            elif updated:
+                job.geocoded_count += 1
+            job.processed_count += 1
+            job.last_property_id = property_obj.pk
+            job.save(update_fields=[
+                'processed_count', 'geocoded_count', 'failed_count', 'last_property_id', 'updated_at',
+            ])
+
+    job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return job
+
+
+def fail_geocode_job(job_id, error):
+    """Mark a job as failed for good; coordinates already saved are kept."""
+    job = GeocodeJob.objects.get(pk=job_id)
+    job.status = 'failed'
+    job.error_message = str(error)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+    return job
+
+
+def _run_or_fail_geocode_job(job_id):
+    try:
+        run_geocode_job(job_id)
+    except Exception as e:
+        fail_geocode_job(job_id, e)
+        raise
+
+
+def start_geocode_job_thread(job_id):
+    """
+    Run a geocode job in a thread of this process, for when no Celery
+    worker can take it. The request returns right away; a job lost with
+    the process goes stale, and asking again starts a new one.
+    """
+    return start_thread(f'geocode-job-{job_id}', _run_or_fail_geocode_job, job_id)
+
+
+def start_property_geocoding_thread(property_id):
+    """Geocode a new property in a thread, for when no Celery worker can take it."""
+    return start_thread(f'geocode-property-{property_id}', geocode_property, property_id)
+
+
+def start_point_geocoding_thread(point_id):
+    """Geocode a point of interest in a thread, for when no Celery worker can take it."""
+    return start_thread(f'geocode-point-{point_id}', geocode_point_of_interest, point_id)
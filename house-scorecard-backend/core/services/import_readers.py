@@ -0,0 +1,208 @@
+# core/services/import_readers.py
+import datetime
+import io
+import itertools
+import json
+import os
+from collections import namedtuple
+from decimal import Decimal
+
+from .property_import import (
+    IMPORT_CHUNK_SIZE, PREVIEW_HEAD_BYTES, PREVIEW_ROW_COUNT,
+    detect_encoding, iter_csv_rows, preview_csv_file, read_csv_head, sniff_dialect,
+)
+
+# Optional format dependencies
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    openpyxl = None
+    OPENPYXL_AVAILABLE = False
+
+try:
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pq = None
+    PYARROW_AVAILABLE = False
+
+# `iter_rows(stream)` yields (row_number, {column: text}) pairs without
+# loading the whole file; `preview(uploaded_file)` returns what preview_csv
+# reports for a CSV
+ImportReader = namedtuple('ImportReader', ['label', 'available', 'requirement', 'iter_rows', 'preview'])
+
+
+def cell_text(value):
+    """A spreadsheet, JSON or Parquet value as the text a CSV cell would hold."""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store 3 bedrooms as 3.0
+        return str(int(value))
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return str(value)
+
+
+def build_preview(headers, rows, estimated_row_count, row_count_is_estimate, encoding=None):
+    return {
+        'headers': headers,
+        'preview_rows': rows[:PREVIEW_ROW_COUNT],
+        'encoding': encoding,
+        'delimiter': None,
+        'estimated_row_count': estimated_row_count,
+        'row_count_is_estimate': row_count_is_estimate,
+    }
+
+
+# CSV
+
+def iter_csv_file_rows(stream):
+    # Check the whole file, since a cp1252 character can appear on any row
+    encoding = detect_encoding(stream)
+    text, _, _ = read_csv_head(stream)
+    return iter_csv_rows(stream, encoding, sniff_dialect(text))
+
+
+# XLSX
+
+def xlsx_sheet_rows(sheet):
+    """(headers, rows) of a worksheet, with rows yielded lazily."""
+    rows = sheet.iter_rows(values_only=True)
+    headers = [cell_text(value).strip() for value in next(rows, ())]
+
+    def data_rows():
+        for row_num, values in enumerate(rows, start=2):
+            # Skip blank rows, as csv.DictReader skips blank lines
+            if all(value is None for value in values):
+                continue
+            yield row_num, dict(zip(headers, map(cell_text, values)))
+
+    return headers, data_rows()
+
+
+def iter_xlsx_rows(stream):
+    """Rows of the first worksheet, streamed with openpyxl's read-only mode."""
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        _, rows = xlsx_sheet_rows(workbook.worksheets[0])
+        yield from rows
+    finally:
+        workbook.close()
+
+
+def preview_xlsx_file(uploaded_file):
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        headers, rows = xlsx_sheet_rows(sheet)
+        rows = [row for _, row in itertools.islice(rows, PREVIEW_ROW_COUNT)]
+        # The sheet's stored dimensions, which may count trailing blank rows
+        max_row = sheet.max_row
+    finally:
+        workbook.close()
+    uploaded_file.seek(0)
+    estimated_row_count = max(max_row - 1, len(rows)) if max_row else len(rows)
+    return build_preview(headers, rows, estimated_row_count, True)
+
+
+# JSON Lines
+
+def parse_json_line(line, line_num):
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f'Line {line_num} is not valid JSON: {e}')
+    if not isinstance(record, dict):
+        raise ValueError(f'Line {line_num} is not a JSON object')
+    return {str(key): cell_text(value) for key, value in record.items()}
+
+
+def read_json_line(line, line_num):
+    """The line's row, or the ValueError saying why it can't be read."""
+    try:
+        return parse_json_line(line, line_num)
+    except ValueError as e:
+        return e
+
+
+def iter_jsonl_rows(stream):
+    """
+    One row per JSON object line; row numbers are line numbers. A malformed
+    line yields its ValueError so the importer reports it as a row error.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    try:
+        for line_num, line in enumerate(text, start=1):
+            if line.strip():
+                yield line_num, read_json_line(line, line_num)
+    finally:
+        text.detach()
+
+
+def preview_jsonl_file(uploaded_file):
+    """Preview from the first PREVIEW_HEAD_BYTES, estimating the row count like a CSV."""
+    head = uploaded_file.read(PREVIEW_HEAD_BYTES)
+    truncated = bool(uploaded_file.read(1))
+    uploaded_file.seek(0)
+    if truncated:
+        head = head[:head.rfind(b'\n') + 1]
+    lines = head.decode('utf-8-sig', errors='replace').splitlines()
+    rows = [read_json_line(line, line_num) for line_num, line in enumerate(lines, start=1) if line.strip()]
+    # Malformed lines still count towards the estimate; the import reports them
+    line_count = len(rows)
+    rows = [row for row in rows if not isinstance(row, ValueError)]
+    # Objects can have different keys; list them in order of first appearance
+    headers = list(dict.fromkeys(key for row in rows for key in row))
+    if truncated and line_count:
+        estimated_row_count = round(uploaded_file.size * line_count / len(head))
+    else:
+        estimated_row_count = line_count
+    return build_preview(headers, rows, estimated_row_count, truncated, encoding='utf-8')
+
+
+# Parquet
+
+def iter_parquet_rows(stream):
+    """Rows read one record batch at a time; row numbers count from 1."""
+    parquet_file = pq.ParquetFile(stream)
+    row_num = 0
+    for batch in parquet_file.iter_batches(batch_size=IMPORT_CHUNK_SIZE):
+        for record in batch.to_pylist():
+            row_num += 1
+            yield row_num, {str(key): cell_text(value) for key, value in record.items()}
+
+
+def preview_parquet_file(uploaded_file):
+    parquet_file = pq.ParquetFile(uploaded_file)
+    batch = next(parquet_file.iter_batches(batch_size=PREVIEW_ROW_COUNT), None)
+    rows = [
+        {str(key): cell_text(value) for key, value in record.items()}
+        for record in (batch.to_pylist() if batch is not None else [])
+    ]
+    uploaded_file.seek(0)
+    # The footer stores the exact row count
+    return build_preview(parquet_file.schema_arrow.names, rows, parquet_file.metadata.num_rows, False)
+
+
+IMPORT_READERS = {
+    '.csv': ImportReader('CSV', True, None, iter_csv_file_rows, preview_csv_file),
+    '.xlsx': ImportReader('Excel', OPENPYXL_AVAILABLE, 'openpyxl', iter_xlsx_rows, preview_xlsx_file),
+    '.jsonl': ImportReader('JSON Lines', True, None, iter_jsonl_rows, preview_jsonl_file),
+    '.ndjson': ImportReader('JSON Lines', True, None, iter_jsonl_rows, preview_jsonl_file),
+    '.parquet': ImportReader('Parquet', PYARROW_AVAILABLE, 'pyarrow', iter_parquet_rows, preview_parquet_file),
+}
+
+
+def get_import_reader(file_name):
+    """The reader for a file's extension, or None if the format isn't supported."""
+    return IMPORT_READERS.get(os.path.splitext(file_name)[1].lower())
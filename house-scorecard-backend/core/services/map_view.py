@@ -0,0 +1,137 @@
+# core/services/map_view.py
+import math
+
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.db.models.functions import Floor
+from rest_framework.exceptions import ValidationError
+
+# At this zoom and below, a viewport with more than MAP_MARKER_LIMIT
+# properties is answered with clusters instead of markers
+MAP_CLUSTER_MAX_ZOOM = 13
+MAP_MARKER_LIMIT = 500
+MAX_ZOOM = 22
+
+# Grid cells per 256px map tile side, so a cell is about 64px wide at any zoom
+GRID_CELLS_PER_TILE = 4
+
+MARKER_FIELDS = (
+    'id', 'address', 'latitude', 'longitude', 'score', 'price', 'beds', 'baths', 'sqft',
+    'geocode_precision',
+)
+
+
+def wrap_longitude(longitude):
+    return (longitude + 180) % 360 - 180
+
+
+def parse_bbox(raw_value):
+    """
+    `west,south,east,north` in degrees, as Leaflet's toBBoxString() gives it.
+    Longitudes are wrapped into [-180, 180), so west > east means the box
+    crosses the antimeridian, and None for both means every longitude.
+    """
+    try:
+        west, south, east, north = (float(part) for part in raw_value.split(','))
+    except (AttributeError, ValueError):
+        raise ValidationError({'bbox': ['Enter west,south,east,north in degrees.']})
+    if not all(math.isfinite(value) for value in (west, south, east, north)) or south > north:
+        raise ValidationError({'bbox': ['Enter west,south,east,north in degrees.']})
+    south, north = max(south, -90.0), min(north, 90.0)
+    if east - west >= 360:
+        return None, south, None, north
+    return wrap_longitude(west), south, wrap_longitude(east), north
+
+
+def parse_zoom(raw_value):
+    try:
+        zoom = int(raw_value)
+    except (TypeError, ValueError):
+        raise ValidationError({'zoom': ['Enter a whole number.']})
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValidationError({'zoom': [f'Enter a zoom level from 0 to {MAX_ZOOM}.']})
+    return zoom
+
+
+def in_bbox(queryset, bbox):
+    """
+    Properties positioned inside a parsed bbox. Served by the (owner,
+    latitude, longitude) index: a latitude range scan with longitudes
+    checked from the index entries.
+    """
+    west, south, east, north = bbox
+    queryset = queryset.filter(latitude__gte=south, latitude__lte=north, longitude__isnull=False)
+    if west is None:
+        return queryset
+    if west <= east:
+        return queryset.filter(longitude__gte=west, longitude__lte=east)
+    return queryset.filter(Q(longitude__gte=west) | Q(longitude__lte=east))
+
+
+def grid_clusters(queryset, zoom):
+    """
+    Properties grouped into square grid cells sized for the zoom level.
+
+    The grid is anchored at 0,0 rather than at the viewport, so a cluster
+    keeps its members while the map is panned. Grouping runs in the
+    database; only one row per cell comes back.
+    """
+    cell_size = 360 / (2 ** zoom * GRID_CELLS_PER_TILE)
+    cells = (
+        queryset.order_by()
+        .annotate(cell_x=Floor(F('longitude') / cell_size), cell_y=Floor(F('latitude') / cell_size))
+        .values('cell_x', 'cell_y')
+        .annotate(
+            count=Count('id'),
+            center_latitude=Avg('latitude'),
+            center_longitude=Avg('longitude'),
+            min_latitude=Min('latitude'),
+            min_longitude=Min('longitude'),
+            max_latitude=Max('latitude'),
+            max_longitude=Max('longitude'),
+            min_score=Min('score'),
+            avg_score=Avg('score'),
+        )
+    )
+    return [
+        {
+            'id': f"{zoom}:{int(cell['cell_x'])}:{int(cell['cell_y'])}",
+            'count': cell['count'],
+            'latitude': cell['center_latitude'],
+            'longitude': cell['center_longitude'],
+            'bounds': [
+                [cell['min_latitude'], cell['min_longitude']],
+                [cell['max_latitude'], cell['max_longitude']],
+            ],
+            'minScore': cell['min_score'],
+            'avgScore': round(cell['avg_score'], 1) if cell['avg_score'] is not None else None,
+        }
+        for cell in cells
+    ]
+
+
+def get_map_view(queryset, bbox, zoom):
+    """
+    What the map shows in a viewport: each property as a marker, or grid
+    clusters when zoomed out over more than MAP_MARKER_LIMIT of them.
+    """
+    queryset = in_bbox(queryset, bbox)
+    total = queryset.count()
+    if zoom <= MAP_CLUSTER_MAX_ZOOM and total > MAP_MARKER_LIMIT:
+        return {'mode': 'clusters', 'total': total, 'clusters': grid_clusters(queryset, zoom)}
+
+    markers = [
+        {
+            'id': row['id'],
+            'address': row['address'],
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'score': row['score'],
+            'price': row['price'],
+            'beds': row['beds'],
+            'baths': row['baths'],
+            'sqft': row['sqft'],
+            'geocodePrecision': row['geocode_precision'],
+        }
+        for row in queryset.order_by('-score', 'pk').values(*MARKER_FIELDS)
+    ]
+    return {'mode': 'properties', 'total': total, 'properties': markers}
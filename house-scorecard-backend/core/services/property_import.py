@@ -0,0 +1,613 @@
+# core/services/property_import.py
+import codecs
+import csv
+import io
+import itertools
+import logging
+import os
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from ..models import Criterion, ImportJob, Property
+from .addresses import address_key
+from .background import start_thread
+from .distances import refresh_distances
+from .geocoding import fill_offline_coordinates
+from ..versioning import bump_collection_version
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+
+# Property fields a column can be mapped to; anything else (including the
+# UI's empty "Don't import" choice) is ignored
+IMPORTABLE_FIELDS = ('address', 'listing_url', 'price', 'beds', 'baths', 'sqft', 'notes', 'status')
+
+
+# Compiled once rather than looked up on every cell
+PRICE_JUNK_PATTERN = re.compile(r'[CAD$,\s]')
+NON_NUMERIC_PATTERN = re.compile(r'[^\d.]')
+# Digits with at most one decimal point: exactly the strings left after
+# NON_NUMERIC_PATTERN that float() and Decimal() accept
+PLAIN_NUMBER_PATTERN = re.compile(r'\d+\.?\d*|\.\d+')
+
+EMPTY_CELL_VALUES = frozenset(['n/a', 'null', '--', ''])
+
+# Per column; keeps a file full of unique prices from growing the cache unbounded
+MAX_CACHED_CELL_VALUES = 10_000
+
+# Marks a cell that maps to nothing, so it can be cached like a parsed value
+_SKIP = object()
+_UNPARSED = object()
+
+
+def parse_canadian_price(value):
+    """Parse Canadian currency values."""
+    try:
+        # Remove currency symbols, CAD, commas, spaces
+        cleaned = PRICE_JUNK_PATTERN.sub('', value.upper())
+        if not cleaned:
+            return None
+        price = Decimal(cleaned)
+        # Validate reasonable price range (Canadian real estate)
+        if price < 10000 or price > 50000000:  # $10K to $50M CAD
+            return None
+        return price
+    except (ValueError, InvalidOperation):
+        return None
+
+
+def parse_integer(value):
+    """Parse integer values."""
+    try:
+        # Remove non-digit characters except decimal point
+        cleaned = NON_NUMERIC_PATTERN.sub('', value)
+        if not PLAIN_NUMBER_PATTERN.fullmatch(cleaned):
+            return None
+        result = int(float(cleaned))
+        # Validate reasonable ranges
+        if result < 0 or result > 50:  # 0-50 bedrooms/baths, 0-50K sqft
+            return None
+        return result
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_sqft(value):
+    """Parse square footage values."""
+    try:
+        # Remove non-digit characters except decimal point
+        cleaned = NON_NUMERIC_PATTERN.sub('', value)
+        if not PLAIN_NUMBER_PATTERN.fullmatch(cleaned):
+            return None
+        result = int(float(cleaned))
+        # Validate reasonable sqft range (100 to 50,000 sqft)
+        if result < 100 or result > 50000:
+            return None
+        return result
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_decimal(value):
+    """Parse decimal values (for bathrooms)."""
+    try:
+        cleaned = NON_NUMERIC_PATTERN.sub('', value)
+        if not PLAIN_NUMBER_PATTERN.fullmatch(cleaned):
+            return None
+        result = Decimal(cleaned)
+        # Validate reasonable bathroom range (0.5 to 20 baths)
+        if result < Decimal('0.5') or result > Decimal('20'):
+            return None
+        return result
+    except (ValueError, InvalidOperation, TypeError):
+        return None
+
+
+def parse_listing_url(value):
+    return value if value.startswith(('http://', 'https://')) else None
+
+
+# Property fields that need parsing; anything else is stored as the stripped text
+FIELD_PARSERS = {
+    'price': parse_canadian_price,
+    'beds': parse_integer,
+    'sqft': parse_sqft,
+    'baths': parse_decimal,
+    'listing_url': parse_listing_url,
+}
+
+
+def parse_cell(our_field, value):
+    """Parsed value for one stripped cell, or _SKIP if the field should be left unset."""
+    if not value or value.lower() in EMPTY_CELL_VALUES:
+        return _SKIP
+    parser = FIELD_PARSERS.get(our_field)
+    if parser is None:
+        return value
+    try:
+        result = parser(value)
+    except Exception:
+        # Skip invalid values
+        return _SKIP
+    if our_field == 'price':
+        # A zero price is dropped rather than stored
+        return result if result else _SKIP
+    return _SKIP if result is None else result
+
+
+def map_csv_rows(rows, field_mapping, caches=None):
+    """
+    Map a batch of CSV rows to Property model fields with Canadian formatting,
+    one column at a time.
+
+    Each distinct value in a parsed column is converted once, so the repeated
+    bed counts, bath counts and prices of a listing export mostly cost a dict
+    lookup. Pass the same `caches` dict for every chunk of a file to share
+    those conversions between chunks.
+
+    Returns one dict per row, or the exception a malformed row raised.
+    """
+    if caches is None:
+        caches = {}
+    results = [{} for _ in rows]
+    failed = {}
+    for csv_field, our_field in field_mapping.items():
+        column = [row.get(csv_field, '') for row in rows]
+        if None in column:
+            # DictReader fills the missing cells of a short row with None
+            for i, cell in enumerate(column):
+                if cell is None:
+                    failed.setdefault(i, ValueError('Row has fewer columns than the header'))
+            column = ['' if cell is None else cell for cell in column]
+
+        if our_field in FIELD_PARSERS:
+            parsed = caches.setdefault((csv_field, our_field), {})
+            for mapped_data, cell in zip(results, column):
+                value = cell.strip()
+                result = parsed.get(value, _UNPARSED)
+                if result is _UNPARSED:
+                    result = parse_cell(our_field, value)
+                    if len(parsed) < MAX_CACHED_CELL_VALUES:
+                        parsed[value] = result
+                if result is not _SKIP:
+                    mapped_data[our_field] = result
+        else:
+            # Text fields are stored as-is and rarely repeat, so skip the cache
+            for mapped_data, cell in zip(results, column):
+                value = cell.strip()
+                if value and value.lower() not in EMPTY_CELL_VALUES:
+                    mapped_data[our_field] = value
+
+    for i, error in failed.items():
+        results[i] = error
+    return results
+
+
+# Enough for the header, the preview rows and a sniffing sample
+PREVIEW_HEAD_BYTES = 32 * 1024
+PREVIEW_ROW_COUNT = 5
+SNIFF_DELIMITERS = ',;\t|'
+ENCODING_CHUNK_BYTES = 1024 * 1024
+
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def detect_encoding(stream, max_bytes=None):
+    """
+    Guess a CSV's encoding: from its BOM if it has one, else the first of
+    UTF-8 and cp1252 that decodes it, else latin-1, which decodes anything.
+    MLS exports from Windows tools are commonly cp1252.
+
+    Only the first `max_bytes` are checked if given. The stream is left at
+    the start.
+    """
+    stream.seek(0)
+    start = stream.read(max(len(bom) for bom, _ in BOM_ENCODINGS))
+    for bom, encoding in BOM_ENCODINGS:
+        if start.startswith(bom):
+            stream.seek(0)
+            return encoding
+
+    for encoding in ('utf-8', 'cp1252'):
+        stream.seek(0)
+        decoder = codecs.getincrementaldecoder(encoding)()
+        remaining = max_bytes
+        try:
+            while remaining is None or remaining > 0:
+                chunk = stream.read(ENCODING_CHUNK_BYTES if remaining is None else min(remaining, ENCODING_CHUNK_BYTES))
+                if not chunk:
+                    decoder.decode(b'', final=True)
+                    break
+                # A character cut off at the end of a partial read is not an error
+                decoder.decode(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+        except UnicodeDecodeError:
+            continue
+        stream.seek(0)
+        return encoding
+    stream.seek(0)
+    return 'latin-1'
+
+
+def sniff_dialect(sample):
+    """The CSV dialect of a text sample, falling back to plain comma-separated."""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=SNIFF_DELIMITERS)
+    except csv.Error:
+        return csv.excel
+
+
+def read_csv_head(stream, max_bytes=PREVIEW_HEAD_BYTES):
+    """
+    Decode the start of a CSV, cut back to the last complete line unless it
+    is the whole file. Returns (text, encoding, truncated).
+    """
+    encoding = detect_encoding(stream, max_bytes)
+    head = stream.read(max_bytes)
+    truncated = bool(stream.read(1))
+    stream.seek(0)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(head, final=not truncated)
+    if truncated:
+        last_newline = text.rfind('\n')
+        if last_newline >= 0:
+            text = text[:last_newline + 1]
+    return text, encoding, truncated
+
+
+def preview_csv_file(uploaded_file, row_count=PREVIEW_ROW_COUNT):
+    """
+    Headers, first rows and format of an uploaded CSV, from its first
+    PREVIEW_HEAD_BYTES only, so previews cost the same for any file size.
+
+    The row count is exact for files that fit in the head and otherwise
+    estimated from the average byte length of the rows that were read.
+    """
+    text, encoding, truncated = read_csv_head(uploaded_file)
+    dialect = sniff_dialect(text)
+    reader = csv.DictReader(io.StringIO(text, newline=''), dialect=dialect)
+    rows = list(reader)
+    headers = reader.fieldnames or []
+
+    if not truncated or not rows:
+        estimated_row_count = len(rows)
+    else:
+        # BOM-less codecs so the encoded lengths match the bytes in the file
+        measure = {'utf-8-sig': 'utf-8', 'utf-16': 'utf-16-le'}.get(encoding, encoding)
+        bom_bytes = {'utf-8-sig': 3, 'utf-16': 2}.get(encoding, 0)
+        header_end = text.find('\n') + 1
+        header_bytes = bom_bytes + len(text[:header_end].encode(measure))
+        data_bytes = len(text[header_end:].encode(measure))
+        estimated_row_count = round((uploaded_file.size - header_bytes) * len(rows) / data_bytes)
+
+    return {
+        'headers': headers,
+        'preview_rows': rows[:row_count],
+        'encoding': encoding,
+        'delimiter': dialect.delimiter,
+        'estimated_row_count': estimated_row_count,
+        'row_count_is_estimate': truncated,
+    }
+
+
+def iter_csv_rows(uploaded_file, encoding='utf-8', dialect=csv.excel):
+    """
+    Yield (row_number, row) pairs from an uploaded CSV, decoding it as it is
+    read rather than loading the whole file. Row numbers count the header as 1.
+    """
+    text = io.TextIOWrapper(uploaded_file, encoding=encoding, newline='')
+    try:
+        for row_num, row in enumerate(csv.DictReader(text, dialect=dialect), start=2):
+            yield row_num, row
+    finally:
+        # Leave the upload open for Django to clean up
+        text.detach()
+
+
+class PropertyImporter:
+    """
+    Create or update a user's properties from mapped import rows.
+
+    Existing properties are matched on the indexed address_key, looked up
+    once per chunk, and rows are written in chunks with bulk_create/bulk_update, each
+    chunk in its own transaction. If a chunk fails, it is replayed row by row
+    so the error report can still point at the offending rows.
+
+    `map_rows` maps a chunk's raw rows in one call (see map_csv_rows).
+    `checkpoint`, if given, is called with the importer inside each chunk's
+    transaction, so saved progress always matches what was committed.
+    """
+
+    def __init__(self, owner, map_rows, chunk_size=IMPORT_CHUNK_SIZE, checkpoint=None):
+        self.owner = owner
+        self.map_rows = map_rows
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.rows_processed = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.must_haves_met = True
+
+    def run(self, rows):
+        """Import (row_number, row) pairs and return the created/updated/errors summary."""
+        self.prepare()
+        chunk = []
+        for row_num, row in rows:
+            chunk.append((row_num, row))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self.get_result()
+
+    def prepare(self):
+        # bulk_create skips Property.save, which normally sets this for new properties
+        self.must_haves_met = not Criterion.objects.filter(owner=self.owner, type='mustHave').exists()
+
+    def get_result(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            # Rows replayed one by one report their errors after the chunk's mapping errors
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+    def add_error(self, row_num, row, error):
+        self.errors.append({
+            'row': row_num,
+            'error': str(error),
+            'data': dict(row),
+        })
+
+    def validate(self, mapped):
+        data = {field: value for field, value in mapped.items() if field in IMPORTABLE_FIELDS}
+        for field_name, value in data.items():
+            max_length = Property._meta.get_field(field_name).max_length
+            if max_length and isinstance(value, str) and len(value) > max_length:
+                raise ValueError(f'{field_name} is longer than {max_length} characters')
+        return data
+
+    def find_existing(self, keys):
+        """Address key -> pk of the owner's matching properties; the newest wins if several share a key."""
+        if not keys:
+            return {}
+        matches = (
+            Property.objects.filter(owner=self.owner, address_key__in=keys)
+            .order_by('pk')
+            .values_list('address_key', 'pk')
+        )
+        return dict(matches)
+
+    def import_chunk(self, chunk):
+        # Address key -> [(row_num, row, data), ...] for new properties, pk -> same for existing ones
+        creates = {}
+        updates = {}
+        keyed = []
+        # Readers yield an exception for a row they couldn't read
+        readable = []
+        for row_num, row in chunk:
+            if isinstance(row, Exception):
+                self.add_error(row_num, {}, row)
+            else:
+                readable.append((row_num, row))
+        mapped_rows = self.map_rows([row for _, row in readable])
+        for (row_num, row), mapped in zip(readable, mapped_rows):
+            if isinstance(mapped, Exception):
+                self.add_error(row_num, row, mapped)
+                continue
+            try:
+                data = self.validate(mapped)
+            except Exception as e:
+                self.add_error(row_num, row, e)
+                continue
+            # Skip rows with no address
+            if not data.get('address'):
+                continue
+            keyed.append((address_key(data['address']), row_num, row, data))
+
+        existing = self.find_existing({key for key, _, _, _ in keyed})
+        for key, row_num, row, data in keyed:
+            pk = existing.get(key)
+            if pk is not None:
+                updates.setdefault(pk, []).append((row_num, row, data))
+            else:
+                # Repeats of a new address within the chunk update the pending create
+                creates.setdefault(key, []).append((row_num, row, data))
+
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    if creates or updates:
+                        self.write_chunk(creates, updates)
+            except DatabaseError as e:
+                logger.warning(f"Bulk import chunk failed, retrying row by row: {e}")
+                self.write_rows(creates, updates)
+            else:
+                self.created += len(creates)
+                self.updated += sum(len(entries) for entries in updates.values())
+                self.updated += sum(len(entries) - 1 for entries in creates.values())
+            self.rows_processed += len(chunk)
+            if self.checkpoint:
+                self.checkpoint(self)
+
+    def write_chunk(self, creates, updates):
+        new_properties = []
+        for entries in creates.values():
+            data = {}
+            for _, _, row_data in entries:
+                data.update(row_data)
+            # bulk_create skips Property.save, which normally derives the key
+            new_properties.append(Property(
+                owner=self.owner, must_haves_met=self.must_haves_met,
+                address_key=address_key(data['address']), **data,
+            ))
+
+        existing = Property.objects.in_bulk(list(updates)) if updates else {}
+        if len(existing) < len(updates):
+            raise DatabaseError('A matched property was deleted during the import')
+        changed_fields = {'updated_at'}
+        now = timezone.now()
+        for pk, entries in updates.items():
+            property_obj = existing[pk]
+            for _, _, row_data in entries:
+                for field_name, value in row_data.items():
+                    setattr(property_obj, field_name, value)
+                    changed_fields.add(field_name)
+            if 'address' in changed_fields:
+                property_obj.address_key = address_key(property_obj.address)
+                changed_fields.add('address_key')
+            # bulk_update doesn't apply auto_now
+            property_obj.updated_at = now
+
+        # Cached answers and the postal code gazetteer place rows without a network call
+        if fill_offline_coordinates([*new_properties, *existing.values()]):
+            changed_fields.update(['latitude', 'longitude', 'geocode_precision', 'geocode_status'])
+
+        Property.objects.bulk_create(new_properties)
+        if existing:
+            Property.objects.bulk_update(list(existing.values()), sorted(changed_fields))
+
+        # Bulk writes skip the signals that normally bump the collection version
+        bump_collection_version(self.owner.id)
+
+        # ...and Property.save, which keeps distances to points of interest current
+        moved = [p.pk for p in new_properties if p.latitude is not None and p.longitude is not None]
+        if changed_fields & {'latitude', 'longitude'}:
+            moved.extend(existing)
+        if moved:
+            refresh_distances(self.owner.id, property_ids=moved)
+
+    def write_rows(self, creates, updates):
+        """Slow path for a failed chunk: one savepoint per row, errors reported per row."""
+        for entries in creates.values():
+            # Repeats of the address update the property the first good row created
+            pk = None
+            for row_num, row, data in entries:
+                try:
+                    with transaction.atomic():
+                        if pk is None:
+                            pk = Property.objects.create(owner=self.owner, **data).pk
+                            self.created += 1
+                        else:
+                            self.update_one(pk, data)
+                            self.updated += 1
+                except Exception as e:
+                    self.add_error(row_num, row, e)
+
+        for pk, entries in updates.items():
+            for row_num, row, data in entries:
+                try:
+                    with transaction.atomic():
+                        self.update_one(pk, data)
+                    self.updated += 1
+                except Exception as e:
+                    self.add_error(row_num, row, e)
+
+    def update_one(self, pk, data):
+        property_obj = Property.objects.get(pk=pk)
+        for field_name, value in data.items():
+            setattr(property_obj, field_name, value)
+        property_obj.save()
+
+
+def spool_upload(uploaded_file):
+    """Copy an upload to IMPORT_SPOOL_DIR once, in chunks, and return its path."""
+    os.makedirs(settings.IMPORT_SPOOL_DIR, exist_ok=True)
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(settings.IMPORT_SPOOL_DIR, f'{uuid.uuid4().hex}{extension}')
+    with open(path, 'wb') as spool:
+        for chunk in uploaded_file.chunks():
+            spool.write(chunk)
+    return path
+
+
+def remove_spooled_file(job):
+    try:
+        os.remove(job.file_path)
+    except FileNotFoundError:
+        pass
+
+
+def save_job_progress(job, importer):
+    job.rows_processed = importer.rows_processed
+    job.created_count = importer.created
+    job.updated_count = importer.updated
+    job.errors = importer.errors
+    job.save(update_fields=['rows_processed', 'created_count', 'updated_count', 'errors', 'updated_at'])
+
+
+def run_import_job(job_id):
+    """
+    Run an import job from its spooled file, or resume it after a restart.
+
+    Progress is saved in the same transaction as each chunk, so rows counted
+    in `rows_processed` are committed and are skipped when the job resumes.
+    """
+    from .import_readers import get_import_reader
+
+    job = ImportJob.objects.select_related('owner').get(pk=job_id)
+    if job.status in ('completed', 'failed'):
+        return job
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+
+    caches = {}
+    importer = PropertyImporter(
+        job.owner,
+        lambda rows: map_csv_rows(rows, job.field_mapping, caches),
+        checkpoint=lambda importer: save_job_progress(job, importer),
+    )
+    importer.rows_processed = job.rows_processed
+    importer.created = job.created_count
+    importer.updated = job.updated_count
+    importer.errors = list(job.errors)
+    reader = get_import_reader(job.file_name)
+    with open(job.file_path, 'rb') as spooled:
+        # Re-reading the skipped rows is cheap next to writing them again
+        result = importer.run(itertools.islice(reader.iter_rows(spooled), job.rows_processed, None))
+
+    job.status = 'completed'
+    job.errors = result['errors']
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'errors', 'finished_at', 'updated_at'])
+    remove_spooled_file(job)
+    return job
+
+
+def fail_import_job(job_id, error):
+    """Mark a job as failed for good and drop its spooled file."""
+    job = ImportJob.objects.get(pk=job_id)
+    job.status = 'failed'
+    job.error_message = str(error)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error_message', 'finished_at', 'updated_at'])
+    remove_spooled_file(job)
+    return job
+
+
+def _run_or_fail_import_job(job_id):
+    try:
+        run_import_job(job_id)
+    except Exception as e:
+        fail_import_job(job_id, e)
+        raise
+
+
+def start_import_job_thread(job_id):
+    """
+    Run an import job in a thread of this process, for when no Celery
+    worker can take it, so the upload request returns right away.
+    """
+    return start_thread(f'import-job-{job_id}', _run_or_fail_import_job, job_id)
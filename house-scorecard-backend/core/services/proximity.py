@@ -0,0 +1,110 @@
+# core/services/proximity.py
+import math
+
+import numpy as np
+from rest_framework.exceptions import ValidationError
+
+from .map_view import in_bbox, wrap_longitude
+
+EARTH_RADIUS_KM = 6371.0088
+# Half the Earth's circumference: no two points are farther apart
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+NEARBY_DEFAULT_LIMIT = 50
+NEARBY_MAX_LIMIT = 500
+
+# A k-nearest search starts at this radius and widens it until it holds k properties
+KNN_INITIAL_RADIUS_KM = 5
+KNN_RADIUS_GROWTH = 4
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Great-circle distances in km from a point to arrays of points. Arrays
+    broadcast on both sides, so (J,) points against (P, 1) ones give the
+    whole (P, J) distance matrix.
+    """
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    half_dlat = (lat2 - lat1) / 2
+    half_dlng = (np.radians(longitudes) - np.radians(longitude)) / 2
+    a = np.sin(half_dlat) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(half_dlng) ** 2
+    # Rounding can push `a` a hair past 1 for antipodal points
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """The smallest in_bbox() box holding every point within radius_km of a point."""
+    angular = radius_km / EARTH_RADIUS_KM
+    south = latitude - math.degrees(angular)
+    north = latitude + math.degrees(angular)
+    if south <= -90 or north >= 90:
+        # The circle takes in a pole, and with it every longitude
+        return None, max(south, -90.0), None, min(north, 90.0)
+    # The circle is widest where it touches a meridian, not at its centre's latitude
+    ratio = math.sin(angular) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return None, south, None, north
+    spread = math.degrees(math.asin(ratio))
+    return wrap_longitude(longitude - spread), south, wrap_longitude(longitude + spread), north
+
+
+def _parse_float(params, param, low, high):
+    raw_value = params.get(param, '').strip()
+    try:
+        value = float(raw_value)
+    except ValueError:
+        raise ValidationError({param: ['Enter a number.']})
+    if not low <= value <= high:
+        raise ValidationError({param: [f'Enter a number from {low} to {high}.']})
+    return value
+
+
+def parse_nearby_params(params):
+    """(latitude, longitude, radius_km or None, limit) from `lat`, `lng`, `radiusKm` and `limit`."""
+    latitude = _parse_float(params, 'lat', -90, 90)
+    longitude = _parse_float(params, 'lng', -180, 180)
+    radius_km = None
+    if params.get('radiusKm', '').strip():
+        radius_km = _parse_float(params, 'radiusKm', 0, MAX_DISTANCE_KM)
+
+    limit = NEARBY_DEFAULT_LIMIT
+    raw_limit = params.get('limit', '').strip()
+    if raw_limit:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            raise ValidationError({'limit': ['Enter a whole number.']})
+        if not 1 <= limit <= NEARBY_MAX_LIMIT:
+            raise ValidationError({'limit': [f'Enter a number from 1 to {NEARBY_MAX_LIMIT}.']})
+    return latitude, longitude, radius_km, limit
+
+
+def find_nearby(queryset, latitude, longitude, radius_km=None, limit=NEARBY_DEFAULT_LIMIT):
+    """
+    The `limit` properties nearest to a point, within radius_km if given.
+
+    Candidates come from a bounding-box query on the indexed coordinates;
+    their exact distances are then computed in one vectorized pass.
+    Without a radius, the box grows until it holds `limit` properties.
+    Returns (ids nearest first, their distances in km, how many are within
+    the radius).
+    """
+    queryset = queryset.order_by()
+    search_radius = radius_km if radius_km is not None else KNN_INITIAL_RADIUS_KM
+    while True:
+        candidates = in_bbox(queryset, bounding_box(latitude, longitude, search_radius))
+        rows = np.array(list(candidates.values_list('id', 'latitude', 'longitude')), dtype=float).reshape(-1, 3)
+        distances = haversine_km(latitude, longitude, rows[:, 1], rows[:, 2])
+        within = distances <= search_radius
+        # Everything outside the box is farther than search_radius, so once
+        # the circle holds `limit` properties, they are the nearest overall
+        if radius_km is not None or within.sum() >= limit or search_radius >= MAX_DISTANCE_KM:
+            break
+        search_radius = min(search_radius * KNN_RADIUS_GROWTH, MAX_DISTANCE_KM)
+
+    ids = rows[within, 0].astype(np.int64)
+    distances = distances[within]
+    # Nearest first; equal distances in id order, so results are stable
+    order = np.lexsort((ids, distances))[:limit]
+    return ids[order].tolist(), distances[order].tolist(), int(within.sum())
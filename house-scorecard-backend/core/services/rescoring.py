@@ -0,0 +1,146 @@
+# core/services/rescoring.py
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Criterion, Property, Rating
+from ..versioning import bump_collection_version
+from .scoring import SCORE_AGGREGATE_FIELDS
+
+STORED_FIELDS = (*SCORE_AGGREGATE_FIELDS, 'score', 'must_haves_met', 'deal_breakers_present')
+
+RatingMatrix = namedtuple('RatingMatrix', [
+    'criterion_ids',     # (C,) criterion id per column
+    'criterion_types',   # (C,) criterion type per column
+    'weights',           # (C,) criterion weight per column
+    'owned',             # (C,) column is one of the owner's criteria
+    'rated',             # (P, C) a rating row exists
+    'is_yes',            # (P, C) bool_value is True
+    'is_no',             # (P, C) bool_value is False
+    'normalized',        # (P, C) normalized_value, NaN when there is none
+])
+
+
+def load_rating_matrix(owner_id, property_ids, subset=False):
+    """
+    Load a user's ratings as a dense property x criterion matrix in one query.
+    Rows follow `property_ids`; columns are the criteria that have ratings.
+    With `subset`, property_ids are only some of the user's properties.
+    """
+    ratings = Rating.objects.filter(property__owner_id=owner_id)
+    if subset:
+        ratings = ratings.filter(property_id__in=property_ids)
+    rows = list(
+        ratings.values_list(
+            'property_id', 'criterion_id', 'normalized_value', 'bool_value',
+            'criterion__type', 'criterion__weight', 'criterion__owner_id',
+        )
+    )
+    row_index = {pk: i for i, pk in enumerate(property_ids)}
+    columns = {}
+    for _, criterion_id, _, _, criterion_type, weight, criterion_owner_id in rows:
+        columns.setdefault(criterion_id, (criterion_type, weight, criterion_owner_id == owner_id))
+    col_index = {criterion_id: j for j, criterion_id in enumerate(columns)}
+
+    shape = (len(property_ids), len(columns))
+    rated = np.zeros(shape, dtype=bool)
+    is_yes = np.zeros(shape, dtype=bool)
+    is_no = np.zeros(shape, dtype=bool)
+    normalized = np.full(shape, np.nan)
+    for property_id, criterion_id, normalized_value, bool_value, *_ in rows:
+        i, j = row_index[property_id], col_index[criterion_id]
+        rated[i, j] = True
+        is_yes[i, j] = bool_value is True
+        is_no[i, j] = bool_value is False
+        if normalized_value is not None:
+            normalized[i, j] = normalized_value
+
+    criterion_types, weights, owned = zip(*columns.values()) if columns else ((),) * 3
+    return RatingMatrix(
+        criterion_ids=np.array(list(columns), dtype=np.int64),
+        criterion_types=np.array(criterion_types, dtype=object),
+        weights=np.array(weights, dtype=float),
+        owned=np.array(owned, dtype=bool),
+        rated=rated,
+        is_yes=is_yes,
+        is_no=is_no,
+        normalized=normalized,
+    )
+
+
+def score_matrix(matrix, owned_must_have_count):
+    """
+    Vectorized Property.calculate_score over every row of a RatingMatrix.
+
+    Returns a dict of (P,) arrays keyed by STORED_FIELDS.
+    """
+    types = matrix.criterion_types
+    nice = types == 'niceToHave'
+    must_have = types == 'mustHave'
+    deal_breaker = types == 'dealBreaker'
+
+    counted = nice & ~np.isnan(matrix.normalized)
+    weighted_sum = np.where(counted, matrix.normalized * matrix.weights, 0.0).sum(axis=1)
+    total_weight = np.where(counted, matrix.weights, 0.0).sum(axis=1)
+
+    deal_breaker_hits = (matrix.is_yes & deal_breaker).sum(axis=1)
+    unmet_must_haves = (matrix.is_no & must_have).sum(axis=1)
+    unconfirmed_must_haves = (matrix.rated & must_have & ~matrix.is_yes).sum(axis=1)
+
+    # Round half up, like score_from_aggregates
+    weighted_score = np.floor(weighted_sum * 10 / np.where(total_weight == 0, 1, total_weight) + 0.5)
+    score = np.where(
+        (deal_breaker_hits > 0) | (unmet_must_haves > 0), 0,
+        np.where(total_weight == 0, np.where(unconfirmed_must_haves == 0, 100, 0), weighted_score),
+    )
+
+    owned_yes = matrix.is_yes & matrix.owned
+    return {
+        'score_weighted_sum': weighted_sum,
+        'score_total_weight': total_weight.astype(int),
+        'deal_breaker_hits': deal_breaker_hits,
+        'unmet_must_haves': unmet_must_haves,
+        'unconfirmed_must_haves': unconfirmed_must_haves,
+        'score': score.astype(int),
+        'must_haves_met': (owned_yes & must_have).sum(axis=1) == owned_must_have_count,
+        'deal_breakers_present': (owned_yes & deal_breaker).any(axis=1),
+    }
+
+
+def rescore_properties(owner_id, property_ids=None):
+    """
+    Recalculate the scores, score aggregates and criteria flags of every
+    property a user owns, or just property_ids, writing only the rows that
+    changed in one bulk_update. Properties without ratings keep their score.
+
+    Returns the number of properties updated.
+    """
+    with transaction.atomic():
+        # Locking the rows makes concurrent rating writes apply their deltas after us
+        properties = Property.objects.select_for_update().filter(owner_id=owner_id)
+        if property_ids is not None:
+            properties = properties.filter(pk__in=property_ids)
+        current = list(properties.order_by('pk').values_list('pk', *STORED_FIELDS))
+        if not current:
+            return 0
+        matrix = load_rating_matrix(owner_id, [row[0] for row in current], subset=property_ids is not None)
+        owned_must_have_count = Criterion.objects.filter(owner_id=owner_id, type='mustHave').count()
+        results = score_matrix(matrix, owned_must_have_count)
+        has_ratings = matrix.rated.any(axis=1)
+
+        now = timezone.now()
+        changed = []
+        for i, (pk, *stored) in enumerate(current):
+            values = {field: results[field][i].item() for field in STORED_FIELDS}
+            if not has_ratings[i]:
+                values['score'] = stored[STORED_FIELDS.index('score')]
+            if list(values.values()) != stored:
+                changed.append(Property(pk=pk, owner_id=owner_id, updated_at=now, **values))
+
+        Property.objects.bulk_update(changed, [*STORED_FIELDS, 'updated_at'], batch_size=500)
+        if changed:
+            # bulk_update skips signals, so advance the ETag version here
+            bump_collection_version(owner_id)
+    return len(changed)
@@ -0,0 +1,197 @@
+# core/services/scoring.py
+import math
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, FloatField, IntegerField, OuterRef, Value, When
+from django.db.models.functions import Cast, Floor
+from django.db.models.lookups import Exact, GreaterThan
+from django.utils import timezone
+
+from ..models import Criterion, Property, Rating
+
+# Running totals kept on Property so a single rating write can rescore in O(1)
+SCORE_AGGREGATE_FIELDS = (
+    'score_weighted_sum',
+    'score_total_weight',
+    'deal_breaker_hits',
+    'unmet_must_haves',
+    'unconfirmed_must_haves',
+)
+
+
+def normalize_rating(rating_type, value):
+    """
+    Normalize a nice-to-have rating value to the 0-10 scale.
+    Returns None for star and scale values that aren't numbers, which can be
+    left behind when a criterion's rating type changes.
+    """
+    if rating_type == 'yesNo':
+        return 10 if value == 'yes' else 0
+    if rating_type not in ('stars', 'scale10'):
+        return 0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    if rating_type == 'stars':  # 1-5 stars
+        return (number - 1) * 2.5
+    return number  # 1-10 scale
+
+
+def typed_rating_values(rating_type, value):
+    """Return the (normalized_value, bool_value) pair stored alongside a raw rating value."""
+    normalized_value = normalize_rating(rating_type, value) if value is not None else None
+    bool_value = {'yes': True, 'no': False}.get(value)
+    return normalized_value, bool_value
+
+
+def rating_contribution(criterion, normalized_value, bool_value):
+    """
+    Return what one rating adds to each score aggregate, from its typed values.
+
+    Deal breakers and must-haves only count hits; nice-to-haves add their
+    weighted, normalized value. Unanswered nice-to-haves add nothing.
+    """
+    contribution = dict.fromkeys(SCORE_AGGREGATE_FIELDS, 0)
+    if criterion.type == 'dealBreaker':
+        contribution['deal_breaker_hits'] = int(bool_value is True)
+    elif criterion.type == 'mustHave':
+        contribution['unmet_must_haves'] = int(bool_value is False)
+        contribution['unconfirmed_must_haves'] = int(bool_value is not True)
+    elif criterion.type == 'niceToHave' and normalized_value is not None:
+        contribution['score_weighted_sum'] = normalized_value * criterion.weight
+        contribution['score_total_weight'] = criterion.weight
+    return contribution
+
+
+def score_from_aggregates(score_weighted_sum, score_total_weight, deal_breaker_hits,
+                          unmet_must_haves, unconfirmed_must_haves):
+    """Turn score aggregates into the 0-100 property score."""
+    if deal_breaker_hits or unmet_must_haves:
+        return 0
+    if score_total_weight == 0:
+        # No weighted criteria: all rated must-haves have to be a yes
+        return 100 if unconfirmed_must_haves == 0 else 0
+    # Round half up, the same way score_expression does in SQL
+    return math.floor(score_weighted_sum * 10 / score_total_weight + 0.5)
+
+
+def score_expression(aggregates):
+    """SQL version of score_from_aggregates over a mapping of aggregate expressions."""
+    total_weight = aggregates['score_total_weight']
+    return Case(
+        When(GreaterThan(aggregates['deal_breaker_hits'], 0), then=Value(0)),
+        When(GreaterThan(aggregates['unmet_must_haves'], 0), then=Value(0)),
+        When(
+            Exact(total_weight, 0),
+            then=Case(
+                When(Exact(aggregates['unconfirmed_must_haves'], 0), then=Value(100)),
+                default=Value(0),
+            ),
+        ),
+        default=Cast(
+            Floor(aggregates['score_weighted_sum'] * Value(10.0) / Cast(total_weight, FloatField()) + Value(0.5)),
+            IntegerField(),
+        ),
+        output_field=IntegerField(),
+    )
+
+
+def apply_score_delta(property_id, delta, refresh_flags=False):
+    """
+    Shift a property's score aggregates by `delta` and rescore it in one UPDATE.
+
+    `delta` maps aggregate fields to the amount they change by. The criteria
+    flags are only recomputed when a must-have or deal breaker was involved.
+    """
+    aggregates = {
+        field: F(field) + Value(
+            delta.get(field, 0),
+            output_field=FloatField() if field == 'score_weighted_sum' else IntegerField(),
+        )
+        for field in SCORE_AGGREGATE_FIELDS
+    }
+    changes = dict(aggregates, score=score_expression(aggregates), updated_at=timezone.now())
+    if refresh_flags:
+        changes.update(criteria_flag_expressions())
+    return Property.objects.filter(pk=property_id).update(**changes)
+
+
+def contribution_delta(old=None, new=None):
+    """Difference between two rating_contribution results; either side may be None."""
+    return {
+        field: (new[field] if new else 0) - (old[field] if old else 0)
+        for field in SCORE_AGGREGATE_FIELDS
+    }
+
+
+def upsert_ratings(property_id, values_by_criterion):
+    """
+    Insert or update a property's ratings for many criteria in one statement,
+    then rescore the property once. Returns the rescored property.
+    """
+    ratings = []
+    for criterion, value in values_by_criterion.items():
+        rating = Rating(property_id=property_id, criterion=criterion, value=value)
+        rating.set_typed_values()
+        ratings.append(rating)
+
+    with transaction.atomic():
+        # Concurrent single-rating writes wait and apply their deltas on top of this
+        property_obj = Property.objects.select_for_update().get(pk=property_id)
+        Rating.objects.bulk_create(
+            ratings,
+            update_conflicts=True,
+            unique_fields=['property', 'criterion'],
+            update_fields=['value', 'normalized_value', 'bool_value', 'updated_at'],
+        )
+        # bulk_create bypasses Rating.save, so there are no deltas to apply
+        property_obj.calculate_score()
+        property_obj.save(update_fields=[
+            *SCORE_AGGREGATE_FIELDS, 'score', 'must_haves_met', 'deal_breakers_present', 'updated_at',
+        ])
+    return property_obj
+
+
+def refresh_typed_values(criterion):
+    """Re-derive the typed values of a criterion's ratings after its rating type changed."""
+    ratings = list(criterion.ratings.only('id', 'criterion_id', 'value'))
+    for rating in ratings:
+        rating.normalized_value, rating.bool_value = typed_rating_values(criterion.rating_type, rating.value)
+    Rating.objects.bulk_update(ratings, ['normalized_value', 'bool_value'], batch_size=500)
+
+
+def criteria_flag_expressions():
+    """
+    SQL expressions for Property.must_haves_met and Property.deal_breakers_present.
+    Same rules as Property.refresh_criteria_flags, evaluated per row by the database.
+    """
+    yes_rating = Rating.objects.filter(
+        property=OuterRef(OuterRef('pk')),
+        criterion=OuterRef('pk'),
+        bool_value=True,
+    )
+    unmet_must_haves = Criterion.objects.filter(
+        owner=OuterRef('owner'),
+        type='mustHave',
+    ).filter(~Exists(yes_rating))
+    deal_breaker_hits = Rating.objects.filter(
+        property=OuterRef('pk'),
+        criterion__owner=OuterRef('owner'),
+        criterion__type='dealBreaker',
+        bool_value=True,
+    )
+    return {
+        'must_haves_met': ~Exists(unmet_must_haves),
+        'deal_breakers_present': Exists(deal_breaker_hits),
+    }
+
+
+def refresh_criteria_flags(owner_id):
+    """Recompute the criteria flags of every property a user owns in one UPDATE."""
+    return Property.objects.filter(owner_id=owner_id).update(
+        updated_at=timezone.now(),
+        **criteria_flag_expressions(),
+    )
@@ -0,0 +1,84 @@
+# core/services/simulation.py
+import numpy as np
+from django.core.cache import cache
+
+from ..models import Criterion, Property
+from ..versioning import get_collection_version
+from .rescoring import load_rating_matrix, score_matrix
+
+SIMULATION_CACHE_KEY = 'rating-matrix:{user_id}:{version}'
+SIMULATION_CACHE_TIMEOUT = 60 * 30
+
+
+def get_simulation_data(owner_id):
+    """
+    Return the user's ratings matrix plus the property details the simulator
+    reports, cached under the collection version so any write invalidates it.
+    """
+    key = SIMULATION_CACHE_KEY.format(user_id=owner_id, version=get_collection_version(owner_id))
+    data = cache.get(key)
+    if data is None:
+        properties = list(
+            Property.objects.filter(owner_id=owner_id).order_by('pk').values_list('pk', 'address', 'score')
+        )
+        property_ids = [pk for pk, _, _ in properties]
+        data = {
+            'property_ids': np.array(property_ids, dtype=np.int64),
+            'addresses': [address for _, address, _ in properties],
+            'scores': np.array([np.nan if score is None else score for _, _, score in properties], dtype=float),
+            'criterion_ids': set(Criterion.objects.filter(owner_id=owner_id).values_list('pk', flat=True)),
+            'matrix': load_rating_matrix(owner_id, property_ids),
+        }
+        cache.set(key, data, SIMULATION_CACHE_TIMEOUT)
+    return data
+
+
+def _ranks(scores, property_ids):
+    """1-based ranks by score, highest first, unscored last and newest first on ties."""
+    order = np.lexsort((-property_ids, np.where(np.isnan(scores), np.inf, -scores)))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(1, len(order) + 1)
+    return order, ranks
+
+
+def simulate_scores(owner_id, overrides):
+    """
+    Rescore and re-rank a user's properties under hypothetical criterion
+    weights and types, in memory and without writing anything.
+
+    `overrides` maps criterion IDs to dicts with an optional `weight` and
+    `type`. Returns one row per property, best simulated score first.
+    """
+    data = get_simulation_data(owner_id)
+    matrix = data['matrix']
+    criterion_types = matrix.criterion_types.copy()
+    weights = matrix.weights.copy()
+    columns = {criterion_id: j for j, criterion_id in enumerate(matrix.criterion_ids.tolist())}
+    for criterion_id, override in overrides.items():
+        j = columns.get(criterion_id)
+        if j is None:
+            # Nothing is rated on this criterion, so it can't move any score
+            continue
+        criterion_types[j] = override.get('type', criterion_types[j])
+        weights[j] = override.get('weight', weights[j])
+
+    # The criteria flags aren't reported, so the must-have count doesn't matter
+    results = score_matrix(matrix._replace(criterion_types=criterion_types, weights=weights), 0)
+    current_scores = data['scores']
+    # Unrated properties keep their score, as they do when really rescoring
+    scores = np.where(matrix.rated.any(axis=1), results['score'], current_scores)
+
+    property_ids = data['property_ids']
+    order, ranks = _ranks(scores, property_ids)
+    _, current_ranks = _ranks(current_scores, property_ids)
+    return [
+        {
+            'id': int(property_ids[i]),
+            'address': data['addresses'][i],
+            'score': None if np.isnan(scores[i]) else int(scores[i]),
+            'currentScore': None if np.isnan(current_scores[i]) else int(current_scores[i]),
+            'rank': int(ranks[i]),
+            'currentRank': int(current_ranks[i]),
+        }
+        for i in order
+    ]
@@ -0,0 +1,55 @@
+# core/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Criterion, DeletedProperty, PointOfInterest, Property, Rating
+from .services.scoring import apply_score_delta, contribution_delta, rating_contribution
+from .versioning import bump_collection_version
+
+
+def _is_direct_delete(origin, model):
+    """True when the delete started from `model` itself rather than a cascade."""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver([post_save, post_delete], sender=Property)
+@receiver([post_save, post_delete], sender=Criterion)
+@receiver([post_save, post_delete], sender=PointOfInterest)
+def bump_version_on_owned_write(sender, instance, **kwargs):
+    bump_collection_version(instance.owner_id)
+
+
+@receiver(post_delete, sender=Property)
+def log_property_deletion(sender, instance, origin=None, **kwargs):
+    # Deleting the owner removes the whole collection, tombstones included
+    if _is_direct_delete(origin, Property):
+        DeletedProperty.objects.create(owner_id=instance.owner_id, property_id=instance.pk)
+
+
+@receiver(post_save, sender=Rating)
+def bump_version_on_rating_save(sender, instance, **kwargs):
+    bump_collection_version(instance.property.owner_id)
+
+
+@receiver(post_delete, sender=Rating)
+def unscore_deleted_rating(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Criterion):
+        # The view refreshes the criteria flags once the criterion itself is gone
+        criterion, refresh_flags = origin, False
+    elif _is_direct_delete(origin, Rating):
+        criterion = instance.criterion
+        refresh_flags = criterion.type in ('mustHave', 'dealBreaker')
+    else:
+        # The property itself, or its owner, is being deleted
+        return
+    # Also touches updated_at, so delta sync sends the property again
+    delta = contribution_delta(
+        old=rating_contribution(criterion, instance.normalized_value, instance.bool_value)
+    )
+    apply_score_delta(instance.property_id, delta, refresh_flags)
+
+    # A criterion delete already bumped the version
+    if not isinstance(origin, Criterion):
+        owner_id = Property.objects.filter(pk=instance.property_id).values_list('owner_id', flat=True).first()
+        if owner_id is not None:
+            bump_collection_version(owner_id)
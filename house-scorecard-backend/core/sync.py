@@ -0,0 +1,43 @@
+# core/sync.py
+import base64
+import binascii
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Tokens trail the server clock so rows saved just before a sync, but committed
+# just after it, are still picked up by the next one. Re-sent rows are harmless.
+SYNC_TOKEN_LAG = timedelta(seconds=5)
+
+# Tombstones older than this are pruned; older tokens get a full resync instead
+DELETION_LOG_RETENTION = timedelta(days=30)
+
+
+def encode_sync_token(moment):
+    """Encode a point in time as an opaque sync token."""
+    return base64.urlsafe_b64encode(moment.isoformat().encode('utf-8')).decode('ascii')
+
+
+def decode_sync_token(token):
+    """Decode a sync token back to an aware datetime, or None if it is invalid."""
+    try:
+        moment = parse_datetime(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError, binascii.Error):
+        return None
+    if moment is None or timezone.is_naive(moment):
+        return None
+    return moment
+
+
+def next_sync_token():
+    return encode_sync_token(timezone.now() - SYNC_TOKEN_LAG)
+
+
+def prune_deletion_log():
+    """Delete tombstones past DELETION_LOG_RETENTION; returns (count, cutoff)."""
+    from .models import DeletedProperty
+
+    cutoff = timezone.now() - DELETION_LOG_RETENTION
+    deleted_count, _ = DeletedProperty.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted_count, cutoff
@@ -131,4 +131,155 @@ def cleanup_old_ai_analyses():
         # Could implement selective cleanup here
         # For now, just log the count
     
-    return {'cleaned_count': 0, 'found_old_count': count}
\ No newline at end of file
+    return {'cleaned_count': 0, 'found_old_count': count}
+
+@shared_task
+def prune_deleted_properties():
+    """
+    Background task to prune delta sync tombstones past their retention window.
+    Clients holding older sync tokens get a full resync instead.
+    """
+    from .sync import prune_deletion_log
+
+    deleted_count, cutoff = prune_deletion_log()
+    logger.info(f"Pruned {deleted_count} property tombstones older than {cutoff}")
+    return {'pruned_count': deleted_count}
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=3)
+def run_property_import(self, job_id):
+    """
+    Background task to run a bulk CSV import job
+
+    The job checkpoints after every committed chunk, so a retried task or one
+    redelivered after a worker restart resumes where it stopped.
+
+    Args:
+        job_id: ID of the ImportJob to run
+
+    Returns:
+        dict: Import counts, or the error if the job failed
+    """
+    from .services.property_import import fail_import_job, run_import_job
+
+    try:
+        job = run_import_job(job_id)
+    except ObjectDoesNotExist:
+        logger.error(f"Import job {job_id} not found")
+        return {'success': False, 'error': 'Import job not found'}
+    except Exception as exc:
+        logger.error(f"Import job {job_id} failed: {str(exc)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=60)
+        fail_import_job(job_id, exc)
+        return {'success': False, 'error': str(exc), 'job_id': job_id}
+
+    logger.info(f"Import job {job_id} finished: {job.created_count} created, {job.updated_count} updated")
+    return {
+        'success': job.status == 'completed',
+        'job_id': job_id,
+        'created': job.created_count,
+        'updated': job.updated_count,
+        'errors_count': len(job.errors),
+    }
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=3)
+def run_property_geocoding(self, job_id):
+    """
+    Background task to geocode a user's properties without coordinates
+
+    Progress is saved after every property, so a retried task or one
+    redelivered after a worker restart resumes where it stopped.
+
+    Args:
+        job_id: ID of the GeocodeJob to run
+
+    Returns:
+        dict: Geocoding counts, or the error if the job failed
+    """
+    from .services.geocoding import fail_geocode_job, run_geocode_job
+
+    try:
+        job = run_geocode_job(job_id)
+    except ObjectDoesNotExist:
+        logger.error(f"Geocode job {job_id} not found")
+        return {'success': False, 'error': 'Geocode job not found'}
+    except Exception as exc:
+        logger.error(f"Geocode job {job_id} failed: {str(exc)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=60)
+        fail_geocode_job(job_id, exc)
+        return {'success': False, 'error': str(exc), 'job_id': job_id}
+
+    logger.info(f"Geocode job {job_id} finished: {job.geocoded_count} geocoded, {job.failed_count} not found")
+    return {
+        'success': job.status == 'completed',
+        'job_id': job_id,
+        'geocoded': job.geocoded_count,
+        'failed': job.failed_count,
+    }
+
+@shared_task(bind=True, max_retries=3)
+def geocode_property_async(self, property_id):
+    """
+    Background task to geocode a property saved without coordinates
+
+    Retried while the geocoder can't be reached; the property stays
+    pending until it answers.
+
+    Args:
+        property_id: ID of the property to geocode
+
+    Returns:
+        dict: The property's geocode status, or the error
+    """
+    from .services.geocoding import GeocodingError, geocode_property
+
+    try:
+        property_instance = geocode_property(property_id)
+    except GeocodingError as exc:
+        logger.error(f"Geocoding failed for property {property_id}: {str(exc)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=60)
+        return {'success': False, 'error': str(exc), 'property_id': property_id}
+
+    if property_instance is None:
+        return {'success': True, 'message': 'Property no longer needs geocoding', 'property_id': property_id}
+    logger.info(f"Geocoded property {property_id}: {property_instance.geocode_status}")
+    return {
+        'success': property_instance.geocode_status == 'ok',
+        'property_id': property_id,
+        'geocode_status': property_instance.geocode_status,
+    }
+
+@shared_task(bind=True, max_retries=3)
+def geocode_point_of_interest_async(self, point_id):
+    """
+    Background task to geocode a point of interest's address
+
+    Retried while the geocoder can't be reached; the point stays pending
+    until it answers.
+
+    Args:
+        point_id: ID of the point of interest to geocode
+
+    Returns:
+        dict: The point's geocode status, or the error
+    """
+    from .services.geocoding import GeocodingError, geocode_point_of_interest
+
+    try:
+        point = geocode_point_of_interest(point_id)
+    except GeocodingError as exc:
+        logger.error(f"Geocoding failed for point of interest {point_id}: {str(exc)}")
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=60)
+        return {'success': False, 'error': str(exc), 'point_id': point_id}
+
+    if point is None:
+        return {'success': True, 'message': 'Point of interest no longer needs geocoding', 'point_id': point_id}
+    logger.info(f"Geocoded point of interest {point_id}: {point.geocode_status}")
+    return {
+        'success': point.geocode_status == 'ok',
+        'point_id': point_id,
+        'geocode_status': point.geocode_status,
+    }
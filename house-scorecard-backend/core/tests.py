@@ -1,9 +1,49 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import tempfile
+from unittest import mock, skipUnless
+
+import numpy as np
+from bs4 import BeautifulSoup
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from datetime import timedelta
 from decimal import Decimal
-from .models import Property, Criterion, Rating
+from django.utils import timezone
+from .models import (
+    Property, Criterion, Rating, DeletedProperty, GeocodeCache, GeocodeJob, ImportJob, PointOfInterest, PropertyDistance,
+)
+from .management.commands.benchmark_csv_mapping import legacy_map_csv_row
+from .services.addresses import address_key
+from .services.distances import distance_rating_value
+from .services.gazetteer import PostalGazetteer, find_postal_code, write_gazetteer
+from .services.geocoding import (
+    GeocodingError, TokenBucket, geocode, geocode_address, geocode_point_of_interest, geocode_property,
+    run_geocode_job,
+)
+from .services.import_readers import OPENPYXL_AVAILABLE, PYARROW_AVAILABLE
+from .services.property_import import PropertyImporter, map_csv_rows, run_import_job
+from .services.proximity import bounding_box, haversine_km
+from .sync import decode_sync_token, encode_sync_token
+from .views import PropertyViewSet
+
+TEST_SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'scorecard-import-tests')
+
+
+class ScorecardAPITestCase(APITestCase):
+    def tearDown(self):
+        # Throttle counters live in the cache and would otherwise carry over between tests
+        cache.clear()
+        super().tearDown()
 
 
 class PropertyModelTest(TestCase):
@@ -70,6 +110,234 @@ class PropertyModelTest(TestCase):
         self.assertEqual(property_obj.score, expected_score)
 
 
+class IncrementalScoreTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.garden = Criterion.objects.create(
+            owner=self.user, text='Garden', type='niceToHave', weight=8, rating_type='stars'
+        )
+        self.view = Criterion.objects.create(
+            owner=self.user, text='View', type='niceToHave', weight=3, rating_type='scale10'
+        )
+        self.parking = Criterion.objects.create(owner=self.user, text='Parking', type='mustHave')
+        self.property = Property.objects.create(owner=self.user, address='123 Test St')
+
+    def assertMatchesFullRecompute(self):
+        stored = Property.objects.get(pk=self.property.pk)
+        expected = Property.objects.get(pk=self.property.pk)
+        expected.calculate_score()
+        for field in ('score', 'score_weighted_sum', 'score_total_weight', 'deal_breaker_hits',
+                      'unmet_must_haves', 'unconfirmed_must_haves', 'must_haves_met'):
+            self.assertEqual(getattr(stored, field), getattr(expected, field), field)
+
+    def test_rating_writes_match_full_recompute(self):
+        garden = Rating.objects.create(property=self.property, criterion=self.garden, value='4')
+        self.assertMatchesFullRecompute()
+        Rating.objects.create(property=self.property, criterion=self.view, value='7')
+        self.assertMatchesFullRecompute()
+        parking = Rating.objects.create(property=self.property, criterion=self.parking, value='no')
+        self.assertMatchesFullRecompute()
+        self.assertEqual(Property.objects.get(pk=self.property.pk).score, 0)
+
+        parking = Rating.objects.get(pk=parking.pk)
+        parking.value = 'yes'
+        parking.save()
+        self.assertMatchesFullRecompute()
+        self.assertTrue(Property.objects.get(pk=self.property.pk).must_haves_met)
+
+        garden = Rating.objects.get(pk=garden.pk)
+        garden.criterion = Criterion.objects.create(
+            owner=self.user, text='Yard', type='niceToHave', weight=2, rating_type='stars'
+        )
+        garden.save()
+        self.assertMatchesFullRecompute()
+
+        garden.delete()
+        self.assertMatchesFullRecompute()
+        Rating.objects.filter(property=self.property).delete()
+        self.assertMatchesFullRecompute()
+
+    def test_deleting_criterion_rescores_rated_properties(self):
+        Rating.objects.create(property=self.property, criterion=self.garden, value='5')
+        Rating.objects.create(property=self.property, criterion=self.view, value='4')
+        self.garden.delete()
+        self.assertMatchesFullRecompute()
+        self.assertEqual(Property.objects.get(pk=self.property.pk).score, 40)
+
+    def test_rating_save_skips_ratings_and_criteria_reads(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Rating.objects.create(property=self.property, criterion=self.garden, value='3')
+        statements = [
+            query['sql'] for query in ctx.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        # The property lock, INSERT, the scoring UPDATE and the refresh of the loaded property
+        self.assertEqual(len(statements), 4)
+        self.assertEqual(self.property.score, 50)
+
+    def test_stale_rating_instances_apply_deltas_from_the_stored_row(self):
+        rating = Rating.objects.create(property=self.property, criterion=self.garden, value='2')
+        first = Rating.objects.get(pk=rating.pk)
+        second = Rating.objects.get(pk=rating.pk)
+        first.value = '5'
+        first.save()
+        # second was loaded before first's write, but its delta starts from 5 stars, not 2
+        second.value = '3'
+        second.save()
+        self.assertMatchesFullRecompute()
+        self.assertEqual(Property.objects.get(pk=self.property.pk).score, 50)
+
+        first.delete()
+        second.delete()
+        self.assertMatchesFullRecompute()
+        self.assertEqual(Property.objects.get(pk=self.property.pk).score_total_weight, 0)
+
+
+class BulkRescoreTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.garden = Criterion.objects.create(
+            owner=self.user, text='Garden', type='niceToHave', weight=8, rating_type='stars'
+        )
+        self.pool = Criterion.objects.create(
+            owner=self.user, text='Pool', type='niceToHave', weight=2, rating_type='yesNo'
+        )
+        self.parking = Criterion.objects.create(owner=self.user, text='Parking', type='mustHave')
+        self.busy_road = Criterion.objects.create(owner=self.user, text='Busy road', type='dealBreaker')
+        self.properties = [
+            Property.objects.create(owner=self.user, address=f'{i} Test St') for i in range(4)
+        ]
+        ratings = [
+            (0, self.garden, '4'), (0, self.pool, 'yes'), (0, self.parking, 'yes'),
+            (1, self.garden, '2'), (1, self.parking, 'no'),
+            (2, self.pool, 'no'), (2, self.busy_road, 'yes'),
+        ]
+        for index, criterion, value in ratings:
+            Rating.objects.create(property=self.properties[index], criterion=criterion, value=value)
+
+    def assertScoresMatchFullRecompute(self):
+        for property_obj in Property.objects.filter(owner=self.user, ratings__isnull=False).distinct():
+            expected = Property.objects.get(pk=property_obj.pk)
+            expected.calculate_score()
+            for field in ('score', 'score_weighted_sum', 'score_total_weight', 'unconfirmed_must_haves',
+                          'must_haves_met', 'deal_breakers_present'):
+                self.assertEqual(getattr(property_obj, field), getattr(expected, field), field)
+
+    def test_rescore_rebuilds_stale_scores(self):
+        from .services.rescoring import rescore_properties
+        Property.objects.filter(pk=self.properties[0].pk).update(score=12, score_weighted_sum=0, must_haves_met=False)
+        self.assertEqual(rescore_properties(self.user.id), 1)
+        self.assertScoresMatchFullRecompute()
+        self.assertEqual(Property.objects.get(pk=self.properties[0].pk).score, 80)
+        # Unrated properties keep their (empty) score
+        self.assertIsNone(Property.objects.get(pk=self.properties[3].pk).score)
+        self.assertEqual(rescore_properties(self.user.id), 0)
+
+    def test_rescore_only_given_properties(self):
+        from .services.rescoring import rescore_properties
+        Property.objects.filter(pk__in=[p.pk for p in self.properties[:2]]).update(score=12)
+        self.assertEqual(rescore_properties(self.user.id, property_ids=[self.properties[0].pk]), 1)
+        self.assertEqual(Property.objects.get(pk=self.properties[0].pk).score, 80)
+        self.assertEqual(Property.objects.get(pk=self.properties[1].pk).score, 12)
+
+    def test_criterion_update_rescores_properties(self):
+        response = self.client.patch(f'/api/criteria/{self.pool.id}/', {'weight': 8})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertScoresMatchFullRecompute()
+        self.assertEqual(Property.objects.get(pk=self.properties[0].pk).score, 88)
+
+        response = self.client.patch(f'/api/criteria/{self.busy_road.id}/', {'type': 'niceToHave'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertScoresMatchFullRecompute()
+        self.assertFalse(Property.objects.get(pk=self.properties[2].pk).deal_breakers_present)
+
+    def test_rating_type_change_rederives_typed_values(self):
+        rating = Rating.objects.get(property=self.properties[0], criterion=self.garden)
+        self.assertEqual((rating.normalized_value, rating.bool_value), (7.5, None))
+        rating = Rating.objects.get(property=self.properties[0], criterion=self.pool)
+        self.assertEqual((rating.normalized_value, rating.bool_value), (10, True))
+
+        response = self.client.patch(f'/api/criteria/{self.garden.id}/', {'ratingType': 'scale10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rating = Rating.objects.get(property=self.properties[0], criterion=self.garden)
+        self.assertEqual(rating.normalized_value, 4)
+        self.assertScoresMatchFullRecompute()
+
+    def test_simulate_reranks_without_writing(self):
+        before = list(Property.objects.order_by('pk').values_list('pk', 'score', 'updated_at'))
+        url = '/api/properties/simulate/'
+        response = self.client.post(url, {'criteria': {
+            str(self.garden.id): {'weight': 2},
+            str(self.busy_road.id): {'type': 'niceToHave'},
+        }}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(Property.objects.order_by('pk').values_list('pk', 'score', 'updated_at')), before)
+
+        rows = {row['id']: row for row in response.data['properties']}
+        self.assertEqual([row['rank'] for row in response.data['properties']], [1, 2, 3, 4])
+        # Garden 7.5 * 2 + pool 10 * 2 over a total weight of 4
+        self.assertEqual(rows[self.properties[0].id]['score'], 88)
+        self.assertEqual(rows[self.properties[0].id]['currentScore'], 80)
+        # No longer a deal breaker, and 'yes' isn't a star rating, so only the pool counts
+        self.assertEqual(rows[self.properties[2].id]['score'], 0)
+        self.assertIsNone(rows[self.properties[3].id]['score'])
+        self.assertEqual(rows[self.properties[3].id]['rank'], 4)
+
+        # The same change, applied for real, gives the same scores
+        self.client.patch(f'/api/criteria/{self.garden.id}/', {'weight': 2})
+        self.assertEqual(Property.objects.get(pk=self.properties[0].pk).score, 88)
+
+        response = self.client.post(url, {'criteria': {str(self.garden.id): {'weight': 11}}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'criteria': {'999': {'weight': 1}}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_score_breakdown(self):
+        url = f'/api/properties/{self.properties[0].id}/score-breakdown/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['score'], self.properties[0].score)
+        self.assertEqual(response.data['zeroedBy'], [])
+        criteria = {row['id']: row for row in response.data['criteria']}
+        self.assertEqual(criteria[self.garden.id]['normalizedValue'], 7.5)
+        self.assertEqual(criteria[self.garden.id]['points'], 60)
+        self.assertEqual(criteria[self.garden.id]['contribution'], 60)
+        self.assertEqual(criteria[self.pool.id]['contribution'], 20)
+        self.assertFalse(criteria[self.busy_road.id]['counted'])
+
+        response = self.client.get(f'/api/properties/{self.properties[2].id}/score-breakdown/')
+        self.assertEqual(response.data['zeroedBy'], [
+            {'id': self.busy_road.id, 'text': 'Busy road', 'reason': 'dealBreaker'},
+        ])
+
+        # Served from the cache until the collection version moves on
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # ...and rebuilt once a rating write bumps it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/api/properties/{self.properties[0].id}/ratings/bulk/', {str(self.garden.id): '5'}, format='json'
+            )
+        response = self.client.get(url)
+        self.assertEqual(response.data['score'], 100)
+
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_management_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        Property.objects.filter(owner=self.user).update(score=None)
+        out = StringIO()
+        call_command('rescore_properties', user='testuser', stdout=out)
+        self.assertIn('testuser: 3 properties updated', out.getvalue())
+        self.assertScoresMatchFullRecompute()
+
+
 class CriterionModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
@@ -96,7 +364,8 @@ class CriterionModelTest(TestCase):
         self.assertEqual(str(criterion), 'Must-Have: Must have garage')
 
 
-class PropertyAPITest(APITestCase):
+@override_settings(IMPORT_SPOOL_DIR=TEST_SPOOL_DIR)
+class PropertyAPITest(ScorecardAPITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.client = APIClient()
@@ -161,8 +430,1366 @@ class PropertyAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 0)
 
+    def test_create_property_rejects_duplicate_address(self):
+        Property.objects.create(owner=self.user, address='3303 Street, Unit 18')
+        response = self.client.post('/api/properties/', {'address': '#18  3303 STREET'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('address', response.data)
+        self.assertEqual(Property.objects.count(), 1)
+
+        # Other users' properties and the property itself don't count
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        other = Property.objects.create(owner=other_user, address='12 Maple Ave')
+        response = self.client.post('/api/properties/', {'address': '12 maple ave.'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.patch(f"/api/properties/{response.data['id']}/", {'address': '12 Maple Ave'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(other.address_key, '')
+
+    def test_bulk_import_matches_unit_spellings(self):
+        existing = Property.objects.create(owner=self.user, address='3303 Street, Unit 18')
+        content = 'Address,List Price\n#18 3303 Street,"$425,000"\n'
+        response = self._import_csv(content, {'Address': 'address', 'List Price': 'price'})
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['updated'], 1)
+        existing.refresh_from_db()
+        self.assertEqual(existing.price, Decimal('425000.00'))
+        self.assertEqual(existing.address_key, address_key('3303 Street, Unit 18'))
+
+    def test_update_keeps_address_shared_with_another_property(self):
+        # Imports match the newest property, so older rows can share a key
+        first = Property.objects.create(owner=self.user, address='12 Maple Ave')
+        Property.objects.create(owner=self.user, address='12 maple ave.')
+        response = self.client.patch(
+            f'/api/properties/{first.id}/',
+            {'address': '12 MAPLE AVE', 'notes': 'Corner lot'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        self.assertEqual(first.notes, 'Corner lot')
+
+    def test_duplicates_match_in_any_case(self):
+        existing = Property.objects.create(owner=self.user, address='123 McDonald Ave')
+        response = self.client.post('/api/properties/', {'address': '123 MCDONALD AVE'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('address', response.data)
+
+        content = 'Address,List Price\n123 mcdonald ave,"$425,000"\n'
+        response = self._import_csv(content, {'Address': 'address', 'List Price': 'price'})
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['updated'], 1)
+        existing.refresh_from_db()
+        self.assertEqual(existing.price, Decimal('425000.00'))
+
+    def _import_csv(self, content, mapping, encoding='utf-8', file_name='listings.csv'):
+        data = content if isinstance(content, bytes) else content.encode(encoding)
+        upload = SimpleUploadedFile(file_name, data)
+        # With no broker to queue on, the job goes to a thread; run it here
+        # instead and return its progress as the client would poll it
+        with mock.patch('core.tasks.run_property_import.delay', side_effect=ConnectionError), \
+                mock.patch('core.views.start_import_job_thread') as start:
+            response = self.client.post(
+                '/api/properties/bulk_import/',
+                {'file': upload, 'mapping': json.dumps(mapping)},
+                format='multipart',
+            )
+        if response.status_code != status.HTTP_202_ACCEPTED:
+            return response
+        self.assertEqual(response.data['status'], 'pending')
+        start.assert_called_once_with(response.data['id'])
+        run_import_job(response.data['id'])
+        return self.client.get(f"/api/import-jobs/{response.data['id']}/")
+
+    def test_bulk_import_creates_and_updates_by_address(self):
+        existing = Property.objects.create(owner=self.user, address='12 Maple Ave', price=Decimal('400000.00'))
+        content = (
+            'Address,List Price,Bedrooms,MLS Number\n'
+            '12  MAPLE ave,"$425,000",3,X1\n'
+            '99 Birch Rd,"$500,000",4,X2\n'
+            '99 birch rd,"$510,000",,X3\n'
+        )
+        mapping = {'Address': 'address', 'List Price': 'price', 'Bedrooms': 'beds', 'MLS Number': ''}
+        response = self._import_csv(content, mapping)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['rowsProcessed'], 3)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['errors'], [])
+
+        existing_updated_at = existing.updated_at
+        existing.refresh_from_db()
+        self.assertEqual(existing.price, Decimal('425000.00'))
+        self.assertEqual(existing.beds, 3)
+        self.assertGreater(existing.updated_at, existing_updated_at)
+        # Like any update, the last matching row's address wins
+        created = Property.objects.get(address='99 birch rd')
+        self.assertEqual(created.price, Decimal('510000.00'))
+        self.assertEqual(created.beds, 4)
+        self.assertEqual(Property.objects.filter(owner=self.user).count(), 2)
+
+    def test_bulk_import_reports_row_errors(self):
+        content = 'Address,Notes\n1 Good St,ok\n{},too long\n'.format('x' * 300)
+        response = self._import_csv(content, {'Address': 'address', 'Notes': 'notes'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(len(response.data['errors']), 1)
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+        self.assertEqual(response.data['errors'][0]['data']['Notes'], 'too long')
+
+    def test_bulk_import_sniffs_encoding_and_delimiter(self):
+        content = 'Address;List Price\n"5 Rue Québec";"$450,000"\n'
+        response = self._import_csv(content, {'Address': 'address', 'List Price': 'price'}, encoding='cp1252')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        created = Property.objects.get(owner=self.user)
+        self.assertEqual(created.address, '5 Rue Québec')
+        self.assertEqual(created.price, Decimal('450000.00'))
+
+    def _preview_csv(self, data, file_name='listings.csv'):
+        upload = SimpleUploadedFile(file_name, data)
+        return self.client.post('/api/properties/preview_csv/', {'file': upload}, format='multipart')
+
+    def test_preview_detects_cp1252_and_semicolons(self):
+        content = 'Address;List Price;Bedrooms\n"12 Rue Montréal";"$500,000";3\n"3 Côte St";"$650,000";4\n'
+        response = self._preview_csv(content.encode('cp1252'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['encoding'], 'cp1252')
+        self.assertEqual(response.data['delimiter'], ';')
+        self.assertEqual(response.data['headers'], ['Address', 'List Price', 'Bedrooms'])
+        self.assertEqual(response.data['preview_rows'][0]['Address'], '12 Rue Montréal')
+        self.assertEqual(response.data['estimated_row_count'], 2)
+        self.assertFalse(response.data['row_count_is_estimate'])
+        self.assertEqual(response.data['suggested_mapping']['Bedrooms'], 'beds')
+
+    def test_preview_reads_only_the_head_of_large_files(self):
+        lines = ['Address,List Price,Bedrooms'] + [
+            f'"{i} Maple Ave, Toronto ON","${400000 + i:,}",{i % 5 + 1}' for i in range(20000)
+        ]
+        data = ('\n'.join(lines) + '\n').encode('utf-8-sig')
+        response = self._preview_csv(data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['encoding'], 'utf-8-sig')
+        # The BOM doesn't leak into the first header
+        self.assertEqual(response.data['headers'][0], 'Address')
+        self.assertEqual(len(response.data['preview_rows']), 5)
+        self.assertTrue(response.data['row_count_is_estimate'])
+        self.assertAlmostEqual(response.data['estimated_row_count'], 20000, delta=1000)
+
+    IMPORT_MAPPING = {'Address': 'address', 'List Price': 'price', 'Bedrooms': 'beds', 'Bathrooms': 'baths'}
+
+    def assertImportedListings(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'], [])
+        first = Property.objects.get(owner=self.user, address='1 King St W')
+        self.assertEqual(first.price, Decimal('599000.00'))
+        self.assertEqual(first.beds, 3)
+        self.assertEqual(first.baths, Decimal('2.5'))
+
+    @skipUnless(OPENPYXL_AVAILABLE, 'openpyxl is not installed')
+    def test_bulk_import_xlsx(self):
+        import openpyxl
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['Address', 'List Price', 'Bedrooms', 'Bathrooms'])
+        sheet.append(['1 King St W', 599000, 3, 2.5])
+        sheet.append([None, None, None, None])
+        sheet.append(['2 Queen St E', '$725,000', 4.0, 3])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        preview = self._preview_csv(buffer.getvalue(), file_name='listings.xlsx')
+        self.assertEqual(preview.data['format'], 'Excel')
+        self.assertEqual(preview.data['headers'], ['Address', 'List Price', 'Bedrooms', 'Bathrooms'])
+        self.assertEqual(preview.data['preview_rows'][0]['Bedrooms'], '3')
+        self.assertEqual(preview.data['suggested_mapping']['Bedrooms'], 'beds')
+
+        response = self._import_csv(buffer.getvalue(), self.IMPORT_MAPPING, file_name='listings.xlsx')
+        self.assertImportedListings(response)
+
+    def test_bulk_import_json_lines(self):
+        content = (
+            '{"Address": "1 King St W", "List Price": 599000, "Bedrooms": 3, "Bathrooms": 2.5}\n'
+            '\n'
+            '{"Address": "2 Queen St E", "List Price": "$725,000", "Bedrooms": 4, "Parking": true}\n'
+        )
+        preview = self._preview_csv(content.encode('utf-8'), file_name='listings.jsonl')
+        self.assertEqual(preview.data['headers'], ['Address', 'List Price', 'Bedrooms', 'Bathrooms', 'Parking'])
+        self.assertEqual(preview.data['estimated_row_count'], 2)
+
+        response = self._import_csv(content, self.IMPORT_MAPPING, file_name='listings.jsonl')
+        self.assertImportedListings(response)
+
+    def test_bulk_import_json_lines_reports_bad_lines(self):
+        content = (
+            '{"Address": "1 King St W", "List Price": 599000, "Bedrooms": 3, "Bathrooms": 2.5}\n'
+            '{"Address": "3 Bay St", \n'
+            '["not", "an", "object"]\n'
+            '{"Address": "2 Queen St E", "List Price": "$725,000", "Bedrooms": 4}\n'
+        )
+        preview = self._preview_csv(content.encode('utf-8'), file_name='listings.jsonl')
+        self.assertEqual(preview.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(preview.data['preview_rows']), 2)
+
+        response = self._import_csv(content, self.IMPORT_MAPPING, file_name='listings.jsonl')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertIn('not valid JSON', response.data['errors'][0]['error'])
+        self.assertIn('not a JSON object', response.data['errors'][1]['error'])
+        self.assertTrue(Property.objects.filter(owner=self.user, address='2 Queen St E').exists())
+
+    @skipUnless(PYARROW_AVAILABLE, 'pyarrow is not installed')
+    def test_bulk_import_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({
+            'Address': ['1 King St W', '2 Queen St E'],
+            'List Price': [599000.0, 725000.0],
+            'Bedrooms': [3, 4],
+            'Bathrooms': [2.5, None],
+        })
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+
+        preview = self._preview_csv(buffer.getvalue(), file_name='listings.parquet')
+        self.assertEqual(preview.data['estimated_row_count'], 2)
+        self.assertFalse(preview.data['row_count_is_estimate'])
+
+        response = self._import_csv(buffer.getvalue(), self.IMPORT_MAPPING, file_name='listings.parquet')
+        self.assertImportedListings(response)
+
+    def test_bulk_import_rejects_unsupported_formats(self):
+        response = self._import_csv('Address\n1 Main St\n', {'Address': 'address'}, file_name='listings.txt')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImportJob.objects.exists())
+
+
+class AddressKeyTest(TestCase):
+    def test_variants_share_a_key(self):
+        key = address_key('3303 Street, Unit 18')
+        self.assertEqual(key, '3303 street unit 18')
+        for variant in ['#18 3303 Street', '  #18   3303 STREET ', '3303 street unit 18', '3303 Street,  Unit 18.']:
+            self.assertEqual(address_key(variant), key)
+        self.assertNotEqual(address_key('3303 Street, Unit 19'), key)
+        self.assertEqual(address_key(''), '')
+
+    def test_case_variants_share_a_key(self):
+        for variants in (['123 McDonald Ave', '123 MCDONALD AVE', '123 mcdonald ave'],
+                         ['45 MacKenzie Rd', '45 Mackenzie Rd', '45 MACKENZIE RD']):
+            self.assertEqual(len({address_key(variant) for variant in variants}), 1, variants)
+
+    def test_save_keeps_key_in_sync(self):
+        user = User.objects.create_user(username='keyuser', password='testpass')
+        property_obj = Property.objects.create(owner=user, address='12 Maple Ave')
+        self.assertEqual(property_obj.address_key, '12 maple ave')
+        property_obj.address = '#2 12 Maple Ave'
+        property_obj.save(update_fields=['address'])
+        property_obj.refresh_from_db()
+        self.assertEqual(property_obj.address_key, '12 maple ave unit 2')
+
+
+class CsvMappingTest(TestCase):
+    MAPPING = {'Address': 'address', 'Price': 'price', 'Beds': 'beds', 'Baths': 'baths',
+               'Sqft': 'sqft', 'URL': 'listing_url', 'Notes': 'notes', 'MLS': ''}
+
+    def test_columnar_mapping_matches_row_mapping(self):
+        cells = {
+            'Address': ['1 Main St', '  2 Main St  ', 'N/A', '', '--'],
+            'Price': ['$599,000', 'CAD $875,000', '$9,999', '$10,000', '$50,000,000', '$50,000,001',
+                      '1E6', 'Infinity', 'NaN', 'abc', '', '0', '$1.5.0', ' null '],
+            'Beds': ['3', '3.7', '0', '50', '51', '-2', '.', '1.2.3', 'three', '2 beds', '9' * 400],
+            'Baths': ['2', '3.5', '0.4', '0.5', '20', '20.5', '.5', '1.', '1.2.3', '½'],
+            'Sqft': ['99', '100', '1,200', '50000', '50001', '1200 sq ft', '.'],
+            'URL': ['https://example.com/1', 'example.com', 'http://x'],
+            'Notes': ['Detached', 'NULL'],
+            'MLS': ['C1234567'],
+        }
+        rows = [
+            {column: values[i % len(values)] for column, values in cells.items()}
+            for i in range(max(len(values) for values in cells.values()))
+        ]
+        expected = [legacy_map_csv_row(row, self.MAPPING) for row in rows]
+        caches = {}
+        # Mapped in two chunks sharing caches, as an import job does
+        actual = map_csv_rows(rows[:5], self.MAPPING, caches) + map_csv_rows(rows[5:], self.MAPPING, caches)
+        self.assertEqual(actual, expected)
+        # The $10K-$50M bounds are inclusive
+        self.assertNotIn('price', actual[2])
+        self.assertEqual(actual[3]['price'], Decimal('10000'))
+        self.assertEqual(actual[4]['price'], Decimal('50000000'))
+        self.assertNotIn('price', actual[5])
+
+    def test_short_row_is_an_error(self):
+        rows = [{'Address': '1 Main St', 'Beds': '3'}, {'Address': '2 Main St', 'Beds': None}]
+        mapped = map_csv_rows(rows, {'Address': 'address', 'Beds': 'beds'})
+        self.assertEqual(mapped[0], {'address': '1 Main St', 'beds': 3})
+        self.assertIsInstance(mapped[1], ValueError)
+
+
+@override_settings(IMPORT_SPOOL_DIR=TEST_SPOOL_DIR)
+class ImportJobTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        os.makedirs(TEST_SPOOL_DIR, exist_ok=True)
+
+    def _spool(self, content):
+        path = os.path.join(TEST_SPOOL_DIR, 'resume-test.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as spool:
+            spool.write(content)
+        return path
+
+    def test_job_resumes_after_last_checkpoint(self):
+        content = 'Address,Bedrooms\n1 First St,1\n2 Second St,2\n3 Third St,3\n4 Fourth St,4\n'
+        # The first two rows were committed before the worker restarted
+        Property.objects.create(owner=self.user, address='1 First St', beds=1)
+        Property.objects.create(owner=self.user, address='2 Second St', beds=2)
+        job = ImportJob.objects.create(
+            owner=self.user,
+            status='running',
+            file_name='listings.csv',
+            file_path=self._spool(content),
+            field_mapping={'Address': 'address', 'Bedrooms': 'beds'},
+            rows_processed=2,
+            created_count=2,
+        )
+
+        job = run_import_job(job.id)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.rows_processed, 4)
+        self.assertEqual(job.created_count, 4)
+        self.assertEqual(job.updated_count, 0)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(Property.objects.filter(owner=self.user).count(), 4)
+        self.assertFalse(os.path.exists(job.file_path))
+
+    def test_bulk_import_queues_job(self):
+        upload = SimpleUploadedFile('listings.csv', b'Address\n1 Queued St\n', content_type='text/csv')
+        with mock.patch('core.tasks.run_property_import.delay') as delay:
+            response = self.client.post(
+                '/api/properties/bulk_import/',
+                {'file': upload, 'mapping': json.dumps({'Address': 'address'})},
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        delay.assert_called_once_with(response.data['id'])
+        self.assertFalse(Property.objects.exists())
+
+        job = ImportJob.objects.get(pk=response.data['id'])
+        with open(job.file_path, 'rb') as spooled:
+            self.assertEqual(spooled.read(), b'Address\n1 Queued St\n')
+        run_import_job(job.id)
+        self.assertTrue(Property.objects.filter(owner=self.user, address='1 Queued St').exists())
+
+    def test_progress_is_owner_scoped(self):
+        job = ImportJob.objects.create(
+            owner=self.user, status='running', file_name='mine.csv', file_path='unused', rows_processed=500,
+        )
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        other_job = ImportJob.objects.create(owner=other_user, file_name='theirs.csv', file_path='unused')
+
+        response = self.client.get(f'/api/import-jobs/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'running')
+        self.assertEqual(response.data['rowsProcessed'], 500)
+        self.assertEqual(response.data['fileName'], 'mine.csv')
 
-class CriterionAPITest(APITestCase):
+        response = self.client.get(f'/api/import-jobs/{other_job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(IMPORT_SPOOL_DIR=TEST_SPOOL_DIR, NOMINATIM_REQUESTS_PER_SECOND=1000)
+class GeocodeCacheTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        os.makedirs(TEST_SPOOL_DIR, exist_ok=True)
+
+    def _nominatim(self, results):
+        response = mock.Mock()
+        response.json.return_value = results
+        return mock.patch('core.services.geocoding.cf_requests.get', return_value=response)
+
+    def _cache(self, address, latitude, longitude, expires_in=timedelta(days=1)):
+        return GeocodeCache.objects.create(
+            address_key=address_key(address), query=address, latitude=latitude, longitude=longitude,
+            provider='nominatim', expires_at=timezone.now() + expires_in,
+        )
+
+    def test_repeated_addresses_skip_the_network(self):
+        with self._nominatim([{'lat': '49.1', 'lon': '-122.8', 'importance': 0.6}]) as get:
+            first = geocode_address('#18 3303 Street')
+            second = geocode_address('3303 street, unit 18')
+        self.assertEqual(first, {'latitude': 49.1, 'longitude': -122.8, 'precision': 'address'})
+        self.assertEqual(second, first)
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs['params']['q'], '3303 Street, Unit 18')
+        entry = GeocodeCache.objects.get()
+        self.assertEqual((entry.provider, entry.confidence), ('nominatim', 0.6))
+
+    def test_misses_are_cached_until_they_expire(self):
+        with self._nominatim([]) as get:
+            self.assertIsNone(geocode_address('1 Nowhere Rd'))
+            self.assertIsNone(geocode_address('1 NOWHERE RD'))
+        get.assert_called_once()
+        self.assertFalse(GeocodeCache.objects.get().found)
+
+        GeocodeCache.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self._nominatim([{'lat': '45.0', 'lon': '-75.0'}]) as get:
+            self.assertEqual(geocode_address('1 Nowhere Rd'), {'latitude': 45.0, 'longitude': -75.0, 'precision': 'address'})
+        get.assert_called_once()
+
+    def test_geocoder_errors_are_not_cached(self):
+        with mock.patch('core.services.geocoding.cf_requests.get', side_effect=ConnectionError):
+            self.assertIsNone(geocode_address('12 Maple Ave'))
+        self.assertFalse(GeocodeCache.objects.exists())
+
+    def test_geocode_properties_uses_cache(self):
+        self._cache('12 Maple Ave', 49.2, -123.1)
+        self._cache('1 Nowhere Rd', None, None)
+        Property.objects.create(owner=self.user, address='12 maple ave')
+        Property.objects.create(owner=self.user, address='1 Nowhere Rd')
+        # With no broker to queue on, the job goes to a thread rather than running in the request
+        with mock.patch('core.tasks.run_property_geocoding.delay', side_effect=ConnectionError), \
+                mock.patch('core.views.start_geocode_job_thread') as start:
+            response = self.client.post('/api/properties/geocode_properties/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        start.assert_called_once_with(response.data['id'])
+
+        with self._nominatim([]) as get, mock.patch('core.services.geocoding.time.sleep') as sleep:
+            job = run_geocode_job(response.data['id'])
+        self.assertEqual((job.status, job.geocoded_count, job.failed_count), ('completed', 1, 1))
+        get.assert_not_called()
+        sleep.assert_not_called()
+        property_obj = Property.objects.get(address='12 maple ave')
+        self.assertEqual((property_obj.latitude, property_obj.longitude), (49.2, -123.1))
+        self.assertEqual(property_obj.geocode_status, 'ok')
+        self.assertEqual(Property.objects.get(address='1 Nowhere Rd').geocode_status, 'failed')
+
+    def test_create_defers_geocoding(self):
+        analyze = mock.patch('core.tasks.analyze_property_with_ai_async.delay')
+        analyze.start()
+        self.addCleanup(analyze.stop)
+        with mock.patch('core.services.geocoding.cf_requests.get') as get, \
+                mock.patch('core.tasks.geocode_property_async.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/properties/', {'address': '12 Maple Ave'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['geocodeStatus'], 'pending')
+        self.assertIsNone(response.data['latitude'])
+        get.assert_not_called()
+        delay.assert_called_once_with(response.data['id'])
+
+        # An address the cache knows is placed right away
+        self._cache('99 Birch Rd', 43.7, -79.4)
+        with mock.patch('core.tasks.geocode_property_async.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/properties/', {'address': '99 BIRCH RD'})
+        self.assertEqual(response.data['geocodeStatus'], 'ok')
+        self.assertEqual((response.data['latitude'], response.data['longitude']), (43.7, -79.4))
+        delay.assert_not_called()
+
+    def test_create_geocodes_in_a_thread_without_a_broker(self):
+        with mock.patch('core.tasks.analyze_property_with_ai_async.delay'), \
+                mock.patch('core.tasks.geocode_property_async.delay', side_effect=ConnectionError), \
+                mock.patch('core.views.start_property_geocoding_thread') as start, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/properties/', {'address': '12 Maple Ave'})
+        self.assertEqual(response.data['geocodeStatus'], 'pending')
+        start.assert_called_once_with(response.data['id'])
+
+        with mock.patch('core.services.geocoding.nominatim_search', return_value=(49.2, -123.1, 0.5)), \
+                mock.patch('core.services.geocoding.TokenBucket.acquire'):
+            self.assertEqual(geocode_property(response.data['id']).geocode_status, 'ok')
+
+    def test_geocode_property_records_status(self):
+        found = Property.objects.create(owner=self.user, address='12 Maple Ave')
+        missing = Property.objects.create(owner=self.user, address='1 Nowhere Rd')
+        unreachable = Property.objects.create(owner=self.user, address='5 Offline St')
+        answers = {'12 Maple Ave': (49.2, -123.1, 0.5), '1 Nowhere Rd': None}
+
+        def search(query):
+            if query not in answers:
+                raise GeocodingError('timed out')
+            return answers[query]
+
+        with mock.patch('core.services.geocoding.nominatim_search', side_effect=search):
+            self.assertEqual(geocode_property(found.id).geocode_status, 'ok')
+            self.assertEqual(geocode_property(missing.id).geocode_status, 'failed')
+            with self.assertRaises(GeocodingError):
+                geocode_property(unreachable.id)
+            # Already answered
+            self.assertIsNone(geocode_property(found.id))
+        found.refresh_from_db()
+        self.assertEqual((found.latitude, found.longitude), (49.2, -123.1))
+        unreachable.refresh_from_db()
+        self.assertEqual(unreachable.geocode_status, 'pending')
+
+        # Setting coordinates by hand counts as geocoded
+        unreachable.latitude, unreachable.longitude = 45.0, -75.0
+        unreachable.save(update_fields=['latitude', 'longitude'])
+        unreachable.refresh_from_db()
+        self.assertEqual(unreachable.geocode_status, 'ok')
+
+    def test_bulk_import_fills_cached_coordinates(self):
+        self._cache('12 Maple Ave', 49.2, -123.1)
+        self._cache('1 Old Rd', 45.0, -75.0, expires_in=-timedelta(days=1))
+        existing = Property.objects.create(owner=self.user, address='99 Birch Rd')
+        self._cache('99 Birch Rd', 43.7, -79.4)
+        job = ImportJob.objects.create(
+            owner=self.user,
+            file_name='listings.csv',
+            file_path=os.path.join(TEST_SPOOL_DIR, 'geocode-test.csv'),
+            field_mapping={'Address': 'address'},
+        )
+        with open(job.file_path, 'w', encoding='utf-8') as spool:
+            spool.write('Address\n12 MAPLE AVE\n1 Old Rd\n99 Birch Rd\n')
+        with self._nominatim([]) as get:
+            run_import_job(job.id)
+        get.assert_not_called()
+
+        created = Property.objects.get(address='12 MAPLE AVE')
+        self.assertEqual((created.latitude, created.longitude), (49.2, -123.1))
+        self.assertEqual(created.geocode_status, 'ok')
+        self.assertIsNone(Property.objects.get(address='1 Old Rd').latitude)
+        existing.refresh_from_db()
+        self.assertEqual((existing.latitude, existing.longitude), (43.7, -79.4))
+
+
+class GeocodeJobTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_token_bucket_spends_each_slot_once(self):
+        bucket = TokenBucket('test', rate=1, capacity=2)
+        with mock.patch('core.services.geocoding.time.time', return_value=1000.5):
+            # The previous second's unspent token is saved up
+            self.assertTrue(bucket.try_acquire())
+            self.assertTrue(bucket.try_acquire())
+            self.assertFalse(bucket.try_acquire())
+            self.assertFalse(TokenBucket('test', rate=1, capacity=2).try_acquire())
+        with mock.patch('core.services.geocoding.time.time', return_value=1001.0):
+            self.assertTrue(bucket.try_acquire())
+            self.assertFalse(bucket.try_acquire())
+
+    def test_geocode_properties_queues_job(self):
+        Property.objects.create(owner=self.user, address='12 Maple Ave')
+        Property.objects.create(owner=self.user, address='1 Placed Rd', latitude=45.0, longitude=-75.0)
+        with mock.patch('core.tasks.run_property_geocoding.delay') as delay:
+            response = self.client.post('/api/properties/geocode_properties/')
+            # Asking again while it runs returns the same job
+            again = self.client.post('/api/properties/geocode_properties/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(response.data['total'], 1)
+        delay.assert_called_once_with(response.data['id'])
+        self.assertEqual(again.data['id'], response.data['id'])
+
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        other_job = GeocodeJob.objects.create(owner=other_user)
+        self.assertEqual(self.client.get(f"/api/geocode-jobs/{response.data['id']}/").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(f'/api/geocode-jobs/{other_job.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_job_commits_coordinates_and_resumes(self):
+        done = Property.objects.create(owner=self.user, address='1 Done St')
+        found = Property.objects.create(owner=self.user, address='12 Maple Ave')
+        missing = Property.objects.create(owner=self.user, address='1 Nowhere Rd')
+        # The first property was processed before the worker restarted
+        job = GeocodeJob.objects.create(
+            owner=self.user, status='running', total_count=3, processed_count=1, failed_count=1,
+            last_property_id=done.pk,
+        )
+        answers = {'12 Maple Ave': (49.2, -123.1, 0.5), '1 Nowhere Rd': None}
+        with mock.patch('core.services.geocoding.nominatim_search', side_effect=answers.get) as search, \
+                mock.patch('core.services.geocoding.TokenBucket.acquire') as acquire:
+            job = run_geocode_job(job.id)
+        self.assertEqual(search.call_count, 2)
+        self.assertEqual(acquire.call_count, 2)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed_count, job.geocoded_count, job.failed_count), (3, 1, 2))
+        self.assertEqual(job.last_property_id, missing.pk)
+        found.refresh_from_db()
+        self.assertEqual((found.latitude, found.longitude), (49.2, -123.1))
+        done.refresh_from_db()
+        self.assertIsNone(done.latitude)
+
+
+class PostalGazetteerTest(ScorecardAPITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.gazetteer_path = os.path.join(cls.tempdir.name, 'postal_gazetteer.bin')
+        write_gazetteer(cls.gazetteer_path, [
+            ('M5V', 43.64, -79.39),
+            ('M5V 1A1', 43.645, -79.395),
+            ('V6B', 49.28, -123.11),
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        settings_override = override_settings(POSTAL_GAZETTEER_PATH=self.gazetteer_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_lookup_falls_back_to_fsa(self):
+        gazetteer = PostalGazetteer(self.gazetteer_path)
+        self.assertEqual(len(gazetteer), 3)
+        latitude, longitude, precision = gazetteer.locate('123 Main St, Toronto ON M5V 1A1')
+        self.assertEqual(precision, 'postal_code')
+        self.assertAlmostEqual(latitude, 43.645, places=4)
+        self.assertEqual(gazetteer.locate('9 King St W, Toronto, ON m5v3l9')[2], 'fsa')
+        self.assertEqual(gazetteer.locate('456 Oak Ave, Vancouver BC V6B')[2], 'fsa')
+        self.assertIsNone(gazetteer.locate('789 Maple Dr, Calgary AB T2P 3H2'))
+        self.assertIsNone(gazetteer.locate('12 Maple Ave'))
+        self.assertEqual(find_postal_code('Unit 5, 10 Bay St, Toronto, ON M5J-2R8'), ('M5J', 'M5J2R8'))
+
+        with open(self.gazetteer_path, 'rb') as source:
+            truncated = source.read()[:-3]
+        broken_path = os.path.join(self.tempdir.name, 'broken.bin')
+        with open(broken_path, 'wb') as broken:
+            broken.write(truncated)
+        with self.assertRaises(ValueError):
+            PostalGazetteer(broken_path)
+
+    def test_build_command_derives_fsa_centroids(self):
+        source_path = os.path.join(self.tempdir.name, 'CA_full.txt')
+        with open(source_path, 'w', encoding='utf-8') as source:
+            source.write('CA\tT2P 3H2\tCalgary\tAlberta\tAB\t\t\t\t\t51.04\t-114.07\t6\n')
+            source.write('CA\tT2P 1J9\tCalgary\tAlberta\tAB\t\t\t\t\t51.06\t-114.09\t6\n')
+            source.write('US\t90210\tBeverly Hills\tCalifornia\tCA\t\t\t\t\t34.09\t-118.41\t4\n')
+        output_path = os.path.join(self.tempdir.name, 'built.bin')
+        call_command('build_postal_gazetteer', source_path, output=output_path, stdout=io.StringIO())
+
+        gazetteer = PostalGazetteer(output_path)
+        self.assertEqual(len(gazetteer), 3)
+        latitude, longitude = gazetteer.get('T2P')
+        self.assertAlmostEqual(latitude, 51.05, places=4)
+        self.assertAlmostEqual(longitude, -114.08, places=4)
+
+    def test_chain_answers_offline_and_refines_online(self):
+        address = '123 Main St, Toronto ON M5V 1A1'
+        with mock.patch('core.services.geocoding.cf_requests.get', side_effect=ConnectionError):
+            approximate = geocode(address, network=False)
+            self.assertEqual(approximate['precision'], 'postal_code')
+            with self.assertRaises(GeocodingError):
+                geocode(address)
+            # No network at all still places the address
+            self.assertEqual(geocode_address(address), approximate)
+        with override_settings(GEOCODER_CHAIN=['postal_code']):
+            self.assertEqual(geocode(address), approximate)
+
+        with mock.patch('core.tasks.analyze_property_with_ai_async.delay'), \
+                mock.patch('core.tasks.geocode_property_async.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/properties/', {'address': address})
+        self.assertEqual(response.data['geocodePrecision'], 'postal_code')
+        self.assertEqual(response.data['geocodeStatus'], 'pending')
+        self.assertAlmostEqual(response.data['latitude'], 43.645, places=4)
+        delay.assert_called_once_with(response.data['id'])
+
+        with mock.patch('core.services.geocoding.nominatim_search', return_value=(43.6451, -79.3952, 0.7)), \
+                override_settings(NOMINATIM_REQUESTS_PER_SECOND=1000):
+            property_obj = geocode_property(response.data['id'])
+        self.assertEqual((property_obj.geocode_status, property_obj.geocode_precision), ('ok', 'address'))
+        self.assertEqual(property_obj.latitude, 43.6451)
+
+    def test_bulk_import_places_postal_codes(self):
+        importer = PropertyImporter(self.user, lambda rows: [dict(row) for row in rows])
+        importer.run([(2, {'address': '456 Oak Ave, Vancouver BC V6B 2K9'}), (3, {'address': '12 Maple Ave'})])
+        placed = Property.objects.get(address__startswith='456 Oak')
+        self.assertEqual((placed.geocode_precision, placed.geocode_status), ('fsa', 'pending'))
+        self.assertAlmostEqual(placed.longitude, -123.11, places=4)
+        self.assertIsNone(Property.objects.get(address='12 Maple Ave').latitude)
+
+        # Coordinates typed in by hand are final
+        response = self.client.patch(f'/api/properties/{placed.id}/', {'latitude': 49.2827, 'longitude': -123.1207})
+        self.assertEqual(response.data['geocodeStatus'], 'ok')
+        self.assertEqual(response.data['geocodePrecision'], '')
+
+
+class ListingCoordinatesTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.viewset = PropertyViewSet()
+
+    def coordinates_of(self, html):
+        return self.viewset._extract_coordinates(BeautifulSoup(html, 'html.parser'))
+
+    def test_extracts_json_ld_geo_and_meta_tags(self):
+        json_ld = {
+            '@context': 'https://schema.org',
+            '@graph': [
+                {'@type': 'Organization', 'name': 'Brokerage'},
+                {'@type': 'RealEstateListing', 'mainEntity': {
+                    '@type': 'SingleFamilyResidence',
+                    'geo': {'@type': 'GeoCoordinates', 'latitude': '49.2827', 'longitude': '-123.1207'},
+                }},
+            ],
+        }
+        html = f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+        self.assertEqual(self.coordinates_of(html), (49.2827, -123.1207))
+
+        # Only the listing's own node counts, not the brokerage or similar listings
+        json_ld = [
+            {'@type': 'RealEstateAgent', 'geo': {'latitude': 49.1, 'longitude': -122.9}},
+            {'@type': ['Product', 'RealEstateListing'], 'name': '123 Main St',
+             'geo': {'latitude': 49.25, 'longitude': -123.1},
+             'offers': {'seller': {'@type': 'Organization', 'geo': {'latitude': 49.3, 'longitude': -123.2}}}},
+        ]
+        html = f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+        self.assertEqual(self.coordinates_of(html), (49.25, -123.1))
+        json_ld = {
+            '@type': 'RealEstateListing',
+            'relatedLink': [{'@type': 'House', 'geo': {'latitude': 49.3, 'longitude': -123.2}}],
+        }
+        html = f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+        self.assertIsNone(self.coordinates_of(html))
+
+        html = (
+            '<meta property="place:location:latitude" content="43.6532">'
+            '<meta property="place:location:longitude" content="-79.3832">'
+        )
+        self.assertEqual(self.coordinates_of(html), (43.6532, -79.3832))
+
+        # Placeholders and garbage are ignored
+        html = (
+            '<script type="application/ld+json">{"@type": "Place", "geo": {"latitude": 0, "longitude": 0}}</script>'
+            '<script type="application/ld+json">not json</script>'
+            '<meta property="og:latitude" content="91"><meta property="og:longitude" content="10">'
+        )
+        self.assertIsNone(self.coordinates_of(html))
+
+    def test_zealty_reads_the_rsc_payload(self):
+        payload = r'self.__next_f.push([1,"{\"address\":\"123 Main St\",\"price\":999000,\"lat\":49.25,\"lng\":-123.1}"])'
+        response = mock.Mock(text=f'<html><script>{payload}</script></html>', content=b'x')
+        session = mock.Mock(headers={}, get=mock.Mock(return_value=response))
+        scraped = self.viewset._scrape_zealty('https://www.zealty.ca/mls-R123/123-main-st/', session)
+        self.assertEqual((scraped['latitude'], scraped['longitude']), (49.25, -123.1))
+
+    def test_zealty_coordinates_come_from_the_listing(self):
+        rows = [
+            {'map': {'lat': 49.0, 'lng': -122.0, 'zoom': 12}},
+            {'listing': {'address': '123 Main St', 'lat': 49.25, 'location': {'lng': -124.0}}},
+            {'similar': [{'address': '9 Other St', 'lat': 49.3, 'lng': -123.2}]},
+        ]
+        payload = ''.join(f'{i}:{json.dumps(row)}\n' for i, row in enumerate(rows))
+        scripts = BeautifulSoup(
+            f'<script>self.__next_f.push({json.dumps([1, payload])})</script>', 'html.parser',
+        ).find_all('script')
+        listing = self.viewset._find_rsc_listing(self.viewset._rsc_rows(scripts))
+        self.assertEqual(listing['address'], '123 Main St')
+        # Its latitude and a nested longitude aren't a pair, and nothing is borrowed from other objects
+        self.assertIsNone(self.viewset._listing_coordinates(listing))
+
+        listing['location']['lat'] = 49.26
+        self.assertEqual(self.viewset._listing_coordinates(listing), (49.26, -124.0))
+
+    def test_scraped_coordinates_skip_geocoding(self):
+        with mock.patch('core.tasks.analyze_property_with_ai_async.delay'), \
+                mock.patch('core.tasks.geocode_property_async.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/properties/', {
+                'address': '123 Main St, Toronto ON M5V 1A1', 'latitude': 43.6451, 'longitude': -79.3952,
+            })
+        self.assertEqual(response.data['geocodeStatus'], 'ok')
+        self.assertEqual(response.data['latitude'], 43.6451)
+        delay.assert_not_called()
+
+
+class PropertyMapViewTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        positions = [
+            ('1 King St W, Toronto', 43.6487, -79.3817, 80),
+            ('2 Queen St W, Toronto', 43.6525, -79.3843, 60),
+            ('3 Bloor St W, Toronto', 43.6700, -79.3900, None),
+            ('4 Granville St, Vancouver', 49.2827, -123.1207, 90),
+        ]
+        for address, latitude, longitude, score in positions:
+            Property.objects.create(owner=self.user, address=address, latitude=latitude, longitude=longitude, score=score)
+        Property.objects.create(owner=self.user, address='5 Nowhere Rd')
+        other = User.objects.create_user(username='other', password='testpass')
+        Property.objects.create(owner=other, address='6 King St W, Toronto', latitude=43.65, longitude=-79.38)
+
+    def test_returns_markers_in_the_viewport(self):
+        response = self.client.get('/api/properties/map/', {'bbox': '-79.5,43.6,-79.3,43.7', 'zoom': 12})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['mode'], 'properties')
+        self.assertEqual(
+            [marker['address'] for marker in response.data['properties']],
+            ['1 King St W, Toronto', '2 Queen St W, Toronto', '3 Bloor St W, Toronto'],
+        )
+
+        response = self.client.get('/api/properties/map/', {'bbox': '-79.5,43.6,-79.3,43.7', 'zoom': 12, 'minScore': 70})
+        self.assertEqual(response.data['total'], 1)
+
+        # A viewport panned across the antimeridian, and one wider than the world
+        response = self.client.get('/api/properties/map/', {'bbox': '170,40,240,50', 'zoom': 2})
+        self.assertEqual(response.data['total'], 1)
+        response = self.client.get('/api/properties/map/', {'bbox': '-400,-90,400,90', 'zoom': 0})
+        self.assertEqual(response.data['total'], 4)
+
+    @mock.patch('core.services.map_view.MAP_MARKER_LIMIT', 2)
+    def test_clusters_when_zoomed_out(self):
+        response = self.client.get('/api/properties/map/', {'bbox': '-140,30,-50,60', 'zoom': 4})
+        self.assertEqual(response.data['mode'], 'clusters')
+        self.assertEqual(response.data['total'], 4)
+        clusters = sorted(response.data['clusters'], key=lambda cluster: cluster['count'])
+        self.assertEqual([cluster['count'] for cluster in clusters], [1, 3])
+        toronto = clusters[1]
+        self.assertAlmostEqual(toronto['latitude'], (43.6487 + 43.6525 + 43.6700) / 3)
+        self.assertEqual((toronto['minScore'], toronto['avgScore']), (60, 70.0))
+        self.assertEqual(toronto['bounds'], [[43.6487, -79.39], [43.67, -79.3817]])
+
+        # Zoomed in far enough, markers come back however many there are
+        response = self.client.get('/api/properties/map/', {'bbox': '-140,30,-50,60', 'zoom': 14})
+        self.assertEqual(response.data['mode'], 'properties')
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'zoom': 5}, {'bbox': '1,2,3', 'zoom': 5}, {'bbox': '0,50,10,40', 'zoom': 5},
+                       {'bbox': '0,40,10,nan', 'zoom': 5}, {'bbox': '0,40,10,50'}, {'bbox': '0,40,10,50', 'zoom': 30}):
+            response = self.client.get('/api/properties/map/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_unchanged_viewport_is_not_modified(self):
+        params = {'bbox': '-79.5,43.6,-79.3,43.7', 'zoom': 12}
+        etag = self.client.get('/api/properties/map/', params)['ETag']
+        response = self.client.get('/api/properties/map/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ProximitySearchTest(ScorecardAPITestCase):
+    # Downtown Toronto, a few km apart, plus one in Vancouver
+    POSITIONS = [
+        ('1 King St W, Toronto', 43.6487, -79.3817, 80),
+        ('2 Queen St W, Toronto', 43.6525, -79.3843, 60),
+        ('3 Bloor St W, Toronto', 43.6700, -79.3900, 70),
+        ('4 Granville St, Vancouver', 49.2827, -123.1207, 90),
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for address, latitude, longitude, score in self.POSITIONS:
+            Property.objects.create(owner=self.user, address=address, latitude=latitude, longitude=longitude, score=score)
+        Property.objects.create(owner=self.user, address='5 Nowhere Rd')
+        other = User.objects.create_user(username='other', password='testpass')
+        Property.objects.create(owner=other, address='6 King St W, Toronto', latitude=43.6487, longitude=-79.3817)
+
+    def test_haversine_and_bounding_box(self):
+        # Toronto to Vancouver is about 3,360 km
+        distance = haversine_km(43.6532, -79.3832, np.array([49.2827]), np.array([-123.1207]))[0]
+        self.assertAlmostEqual(distance, 3357, delta=10)
+
+        west, south, east, north = bounding_box(43.6532, -79.3832, 10)
+        self.assertLess(west, -79.3832 - 10 / 111.2 / math.cos(math.radians(43.6532)))
+        self.assertAlmostEqual(north - 43.6532, 10 / 111.195, places=3)
+        # Across the antimeridian, and over a pole
+        self.assertGreater(bounding_box(60, 179.99, 50)[0], bounding_box(60, 179.99, 50)[2])
+        self.assertIsNone(bounding_box(89.9, 0, 50)[0])
+
+    def test_properties_within_a_radius(self):
+        response = self.client.get('/api/properties/nearby/', {'lat': 43.6532, 'lng': -79.3832, 'radiusKm': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [p['address'] for p in response.data['results']],
+            ['2 Queen St W, Toronto', '1 King St W, Toronto'],
+        )
+        self.assertLess(response.data['results'][0]['distanceKm'], response.data['results'][1]['distanceKm'])
+
+        response = self.client.get('/api/properties/nearby/', {
+            'lat': 43.6532, 'lng': -79.3832, 'radiusKm': 5, 'limit': 1, 'minScore': 65, 'fields': 'address',
+        })
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'], [{'id': mock.ANY, 'address': '1 King St W, Toronto', 'distanceKm': mock.ANY}])
+
+    def test_k_nearest_widens_the_search(self):
+        response = self.client.get('/api/properties/nearby/', {'lat': 49.25, 'lng': -123.1, 'limit': 2})
+        self.assertEqual(
+            [p['address'] for p in response.data['results']],
+            ['4 Granville St, Vancouver', '3 Bloor St W, Toronto'],
+        )
+        # Asking for more than there are returns every located property
+        response = self.client.get('/api/properties/nearby/', {'lat': -33.87, 'lng': 151.21, 'limit': 10})
+        self.assertEqual(response.data['count'], 4)
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'lng': -79.38}, {'lat': 95, 'lng': 0}, {'lat': 43, 'lng': 'east'},
+                       {'lat': 43, 'lng': -79, 'radiusKm': -1}, {'lat': 43, 'lng': -79, 'limit': 0}):
+            response = self.client.get('/api/properties/nearby/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class PointOfInterestTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        # About 0.5 km and 4.1 km from Union Station
+        self.near = Property.objects.create(owner=self.user, address='1 King St W, Toronto', latitude=43.6487, longitude=-79.3817)
+        self.far = Property.objects.create(owner=self.user, address='3 Bloor St W, Toronto', latitude=43.6820, longitude=-79.3900)
+        self.unplaced = Property.objects.create(owner=self.user, address='5 Nowhere Rd')
+
+    def _create_work(self):
+        response = self.client.post('/api/points-of-interest/', {
+            'name': 'Office', 'kind': 'work', 'latitude': 43.6453, 'longitude': -79.3806,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_distance_rating_value(self):
+        criterion = Criterion(type='niceToHave', rating_type='stars', ideal_distance_km=1, max_distance_km=9)
+        self.assertEqual(distance_rating_value(criterion, 0.5), '5')
+        self.assertEqual(distance_rating_value(criterion, 5), '3')
+        self.assertEqual(distance_rating_value(criterion, 30), '1')
+        criterion.rating_type = 'yesNo'
+        self.assertEqual(distance_rating_value(criterion, 8), 'yes')
+        self.assertEqual(distance_rating_value(criterion, 10), 'no')
+
+    def test_creating_a_point_computes_distances(self):
+        point_id = self._create_work()
+        self.assertEqual(PropertyDistance.objects.count(), 2)
+
+        response = self.client.get('/api/properties/')
+        distances = {p['address']: p['distances'] for p in response.data}
+        self.assertAlmostEqual(distances['1 King St W, Toronto'][point_id], 0.39, delta=0.05)
+        self.assertAlmostEqual(distances['3 Bloor St W, Toronto'][point_id], 4.2, delta=0.2)
+        self.assertEqual(distances['5 Nowhere Rd'], {})
+
+    def test_point_address_is_geocoded_in_the_background(self):
+        # Nothing is known offline, so the request doesn't wait on the network
+        with mock.patch('core.services.geocoding.nominatim_search') as search, \
+                mock.patch('core.tasks.geocode_point_of_interest_async.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/points-of-interest/', {'name': 'School', 'address': '10 School Rd'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['geocodeStatus'], response.data['latitude']), ('pending', None))
+        search.assert_not_called()
+        delay.assert_called_once_with(response.data['id'])
+        self.assertFalse(PropertyDistance.objects.exists())
+
+        with mock.patch('core.services.geocoding.nominatim_search', return_value=(43.6453, -79.3806, 0.5)), \
+                mock.patch('core.services.geocoding.TokenBucket.acquire'):
+            point = geocode_point_of_interest(response.data['id'])
+        self.assertEqual((point.geocode_status, point.geocode_precision), ('ok', 'address'))
+        self.assertEqual(PropertyDistance.objects.filter(point_of_interest=point).count(), 2)
+
+        # A cached answer places it right away
+        GeocodeCache.objects.create(
+            address_key=address_key('20 Park Ave'), query='20 Park Ave', latitude=43.65, longitude=-79.38,
+            provider='nominatim', expires_at=timezone.now() + timedelta(days=1),
+        )
+        with mock.patch('core.tasks.geocode_point_of_interest_async.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/points-of-interest/', {'name': 'Park', 'address': '20 park ave'}, format='json')
+        self.assertEqual((response.data['geocodeStatus'], response.data['geocodePrecision']), ('ok', 'address'))
+        delay.assert_not_called()
+
+        response = self.client.post('/api/points-of-interest/', {'name': 'Nowhere'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('address', response.data)
+
+    def test_criterion_rated_by_distance(self):
+        point_id = self._create_work()
+        response = self.client.post('/api/criteria/', {
+            'text': 'Short commute', 'type': 'niceToHave', 'ratingType': 'stars',
+            'pointOfInterest': point_id, 'idealDistanceKm': 1, 'maxDistanceKm': 9,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        criterion = Criterion.objects.get(pk=response.data['id'])
+
+        ratings = dict(Rating.objects.filter(criterion=criterion).values_list('property_id', 'value'))
+        self.assertEqual(ratings, {self.near.pk: '5', self.far.pk: '3'})
+        self.near.refresh_from_db()
+        self.assertEqual(self.near.score, 100)
+
+        # Moving a property re-measures and re-rates it
+        self.near.latitude, self.near.longitude = 43.7000, -79.4000
+        self.near.save()
+        distance = PropertyDistance.objects.get(property=self.near)
+        self.assertGreater(distance.distance_km, 5)
+        self.assertEqual(Rating.objects.get(property=self.near, criterion=criterion).value, '2')
+        self.near.refresh_from_db()
+        self.assertEqual(self.near.score, 25)
+
+    def test_import_rates_and_rescores_only_its_rows(self):
+        point_id = self._create_work()
+        criterion = Criterion.objects.create(
+            owner=self.user, text='Short commute', type='niceToHave', point_of_interest_id=point_id,
+            ideal_distance_km=1, max_distance_km=9,
+        )
+        Property.objects.filter(pk=self.far.pk).update(score=12)
+
+        # Imported rows are placed from cached geocodes
+        for address, latitude, longitude in (('7 Front St W, Toronto', 43.6455, -79.3810),
+                                             ('8 Front St W, Toronto', 43.6460, -79.3820)):
+            GeocodeCache.objects.create(
+                address_key=address_key(address), query=address, latitude=latitude, longitude=longitude,
+                provider='nominatim', expires_at=timezone.now() + timedelta(days=1),
+            )
+        importer = PropertyImporter(self.user, lambda rows: [dict(row) for row in rows])
+        importer.run([(2, {'address': '7 Front St W, Toronto'}), (3, {'address': '8 Front St W, Toronto'})])
+        imported = Property.objects.filter(address__contains='Front St')
+        self.assertEqual(set(Rating.objects.filter(criterion=criterion, property__in=imported).values_list('value', flat=True)), {'5'})
+        self.assertEqual(set(imported.values_list('score', flat=True)), {100})
+        # Properties outside the chunk aren't rescored
+        self.assertEqual(Property.objects.get(pk=self.far.pk).score, 12)
+
+    def test_criterion_rejects_max_below_ideal(self):
+        response = self.client.post('/api/criteria/', {
+            'text': 'Short commute', 'type': 'niceToHave', 'idealDistanceKm': 5, 'maxDistanceKm': 2,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('maxDistanceKm', response.data)
+
+    def test_deleting_a_point_removes_its_distances(self):
+        point_id = self._create_work()
+        response = self.client.delete(f'/api/points-of-interest/{point_id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(PropertyDistance.objects.exists())
+        self.assertFalse(PointOfInterest.objects.exists())
+
+
+class PropertyQueryCountTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _create_rated_properties(self, property_count, criterion_count):
+        criteria = [
+            Criterion.objects.create(
+                owner=self.user,
+                text=f'Criterion {i}',
+                type='niceToHave',
+                rating_type='stars'
+            )
+            for i in range(criterion_count)
+        ]
+        for i in range(property_count):
+            property_obj = Property.objects.create(owner=self.user, address=f'{i} Query Count St')
+            Rating.objects.bulk_create(
+                Rating(property=property_obj, criterion=criterion, value='4')
+                for criterion in criteria
+            )
+        return criteria
+
+    def test_list_query_count_is_constant(self):
+        # properties + prefetched ratings + prefetched distances + owner's criteria
+        self._create_rated_properties(property_count=1, criterion_count=2)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/properties/')
+        self.assertEqual(len(response.data), 1)
+
+        self._create_rated_properties(property_count=20, criterion_count=15)
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/properties/')
+        self.assertEqual(len(response.data), 21)
+
+    def test_retrieve_query_count_is_constant(self):
+        criteria = self._create_rated_properties(property_count=1, criterion_count=30)
+        property_obj = Property.objects.get()
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/properties/{property_obj.id}/')
+        self.assertEqual(len(response.data['ratings']), 30)
+        self.assertEqual(response.data['ratings'][criteria[0].id], 4)
+
+    def test_ratings_exclude_other_users_criteria(self):
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        foreign_criterion = Criterion.objects.create(owner=other_user, text='Foreign', type='mustHave')
+        self._create_rated_properties(property_count=1, criterion_count=1)
+        property_obj = Property.objects.get()
+        Rating.objects.bulk_create([Rating(property=property_obj, criterion=foreign_criterion, value='yes')])
+
+        response = self.client.get('/api/properties/')
+        self.assertNotIn(foreign_criterion.id, response.data[0]['ratings'])
+        self.assertEqual(len(response.data[0]['ratings']), 1)
+
+
+class PropertyPaginationTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.properties = [
+            Property.objects.create(owner=self.user, address=f'{i} Page St', ai_analysis={'grade': 'A'})
+            for i in range(7)
+        ]
+
+    def _collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_unpaginated_without_params(self):
+        response = self.client.get('/api/properties/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_cursor_pages_follow_created_at_ordering(self):
+        response = self.client.get('/api/properties/?page_size=3')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+        ids = self._collect_pages('/api/properties/?page_size=3')
+        expected = list(Property.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_cursor_breaks_created_at_ties_on_id(self):
+        Property.objects.update(created_at=self.properties[0].created_at)
+        ids = self._collect_pages('/api/properties/?page_size=2')
+        self.assertEqual(ids, sorted((p.id for p in self.properties), reverse=True))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/properties/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_fields_param_limits_payload_and_defers_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/properties/?fields=address,price,latitude,longitude')
+        self.assertEqual(set(response.data[0]), {'id', 'address', 'price', 'latitude', 'longitude'})
+        # Only the property query runs: no ratings prefetch, no AI JSON columns
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"core_property"."ai_analysis",', queries[0]['sql'])
+
+    def test_omit_param(self):
+        response = self.client.get('/api/properties/?omit=aiAnalysis,statusHistory,imageUrls')
+        self.assertNotIn('aiAnalysis', response.data[0])
+        self.assertNotIn('statusHistory', response.data[0])
+        self.assertIn('ratings', response.data[0])
+        self.assertIn('aiOverallGrade', response.data[0])
+
+    def test_fields_param_on_retrieve(self):
+        property_obj = self.properties[0]
+        response = self.client.get(f'/api/properties/{property_obj.id}/?fields=aiAnalysis')
+        self.assertEqual(response.data, {'id': property_obj.id, 'aiAnalysis': {'grade': 'A'}})
+
+
+class PropertyFilterTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cheap = Property.objects.create(
+            owner=self.user, address='b Cheap St', price=Decimal('300000'), beds=2,
+            baths=Decimal('1.0'), sqft=900, score=40, status='viewed'
+        )
+        self.mid = Property.objects.create(
+            owner=self.user, address='A Mid St', price=Decimal('600000'), beds=3,
+            baths=Decimal('2.0'), sqft=1500, score=80, status='interested', notes='Near the park'
+        )
+        self.unpriced = Property.objects.create(owner=self.user, address='c Unknown St')
+
+    def _ids(self, query):
+        response = self.client.get(f'/api/properties/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [item['id'] for item in response.data]
+
+    def test_range_filters_exclude_missing_values(self):
+        self.assertEqual(self._ids('minPrice=400000'), [self.mid.id])
+        self.assertEqual(self._ids('maxPrice=400000'), [self.cheap.id])
+        self.assertEqual(self._ids('minBeds=2.5'), [self.mid.id])
+        self.assertEqual(self._ids('minScore=10&maxSqft=1000'), [self.cheap.id])
+        self.assertEqual(self._ids('minBaths=1.5'), [self.mid.id])
+
+    def test_search_and_statuses(self):
+        self.assertEqual(self._ids('search=park'), [self.mid.id])
+        self.assertEqual(self._ids('statuses=viewed,interested&sortBy=score_desc'), [self.mid.id, self.cheap.id])
+        self.assertEqual(self._ids('statuses=unset'), [self.unpriced.id])
+
+    def test_sorting_places_nulls_lowest(self):
+        self.assertEqual(self._ids('sortBy=score_desc'), [self.mid.id, self.cheap.id, self.unpriced.id])
+        self.assertEqual(self._ids('sortBy=price_asc'), [self.unpriced.id, self.cheap.id, self.mid.id])
+        self.assertEqual(self._ids('sortBy=address_asc'), [self.mid.id, self.cheap.id, self.unpriced.id])
+
+    def test_sorted_cursor_pages(self):
+        response = self.client.get('/api/properties/?sortBy=price_asc&page_size=1')
+        ids = []
+        while True:
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, [self.unpriced.id, self.cheap.id, self.mid.id])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/properties/?minPrice=abc').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/properties/?sortBy=bogus').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/properties/?statuses=bogus').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_criteria_flags(self):
+        must_have = self.client.post('/api/criteria/', {'text': 'Garage', 'type': 'mustHave'}).data
+        deal_breaker = self.client.post('/api/criteria/', {'text': 'Flood zone', 'type': 'dealBreaker'}).data
+        self.assertEqual(self._ids('mustHavesMet=true'), [])
+
+        Rating.objects.create(property=self.mid, criterion_id=must_have['id'], value='yes')
+        Rating.objects.create(property=self.cheap, criterion_id=deal_breaker['id'], value='yes')
+        self.assertEqual(self._ids('mustHavesMet=true'), [self.mid.id])
+        self.assertEqual(self._ids('dealBreakersPresent=false&sortBy=score_desc'), [self.mid.id, self.unpriced.id])
+
+        self.client.delete(f"/api/criteria/{must_have['id']}/")
+        self.assertEqual(len(self._ids('mustHavesMet=true')), 3)
+
+        new_property = Property.objects.create(owner=self.user, address='d New St')
+        self.assertTrue(new_property.must_haves_met)
+        self.assertFalse(new_property.deal_breakers_present)
+
+
+class CollectionETagTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.property = Property.objects.create(owner=self.user, address='1 ETag St')
+        self.criterion = Criterion.objects.create(owner=self.user, text='Yard', type='niceToHave')
+
+    def _assert_not_modified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def test_unchanged_collection_returns_304(self):
+        for url in ['/api/properties/', f'/api/properties/{self.property.id}/', '/api/criteria/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self._assert_not_modified(url, response['ETag'])
+
+    def test_etag_depends_on_query(self):
+        plain = self.client.get('/api/properties/')['ETag']
+        sparse = self.client.get('/api/properties/?fields=address')['ETag']
+        self.assertNotEqual(plain, sparse)
+
+    def test_writes_change_the_etag(self):
+        url = '/api/properties/'
+        etag = self.client.get(url)['ETag']
+
+        writes = [
+            lambda: Rating.objects.create(property=self.property, criterion=self.criterion, value='3'),
+            lambda: Rating.objects.get().delete(),
+            lambda: self.client.patch(f'/api/criteria/{self.criterion.id}/', {'weight': 9}),
+            lambda: self.client.patch(f'/api/properties/{self.property.id}/', {'notes': 'Updated'}),
+            lambda: Property.objects.create(owner=self.user, address='2 ETag St'),
+        ]
+        for write in writes:
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+    def test_other_users_writes_keep_etag(self):
+        url = '/api/properties/'
+        etag = self.client.get(url)['ETag']
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        with self.captureOnCommitCallbacks(execute=True):
+            Property.objects.create(owner=other_user, address='Elsewhere')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class PropertyChangesTest(ScorecardAPITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.stale = Property.objects.create(owner=self.user, address='1 Stale St')
+        self.fresh = Property.objects.create(owner=self.user, address='2 Fresh St')
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Property.objects.update(updated_at=an_hour_ago)
+        self.since = encode_sync_token(an_hour_ago + timedelta(minutes=30))
+
+    def _changes(self, since=None):
+        url = '/api/properties/changes/'
+        if since:
+            url += f'?since={since}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_full_snapshot_without_token(self):
+        data = self._changes()
+        self.assertTrue(data['reset'])
+        self.assertEqual({p['id'] for p in data['properties']}, {self.stale.id, self.fresh.id})
+        self.assertIsNotNone(decode_sync_token(data['token']))
+
+    def test_returns_only_changes_and_tombstones(self):
+        self.fresh.notes = 'Updated'
+        self.fresh.save()
+        created = Property.objects.create(owner=self.user, address='3 New St')
+        deleted_id = self.stale.id
+        self.client.delete(f'/api/properties/{deleted_id}/')
+
+        data = self._changes(self.since)
+        self.assertFalse(data['reset'])
+        self.assertEqual({p['id'] for p in data['properties']}, {self.fresh.id, created.id})
+        self.assertEqual(data['deleted'], [deleted_id])
+
+    def test_rating_changes_mark_property_updated(self):
+        criterion = Criterion.objects.create(owner=self.user, text='View', type='niceToHave')
+        Property.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        rating = Rating.objects.create(property=self.stale, criterion=criterion, value='4')
+        self.assertEqual([p['id'] for p in self._changes(self.since)['properties']], [self.stale.id])
+
+        Property.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        rating.delete()
+        self.assertEqual([p['id'] for p in self._changes(self.since)['properties']], [self.stale.id])
+
+    def test_invalid_and_expired_tokens(self):
+        response = self.client.get('/api/properties/changes/?since=garbage')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        expired = encode_sync_token(timezone.now() - timedelta(days=365))
+        data = self._changes(expired)
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['properties']), 2)
+
+    def test_owner_deletion_does_not_log_tombstones(self):
+        self.user.delete()
+        self.assertFalse(DeletedProperty.objects.exists())
+
+    def test_prune_command_drops_expired_tombstones(self):
+        self.client.delete(f'/api/properties/{self.stale.id}/')
+        self.client.delete(f'/api/properties/{self.fresh.id}/')
+        DeletedProperty.objects.filter(property_id=self.stale.id).update(
+            deleted_at=timezone.now() - timedelta(days=365),
+        )
+        out = io.StringIO()
+        call_command('prune_deleted_properties', stdout=out)
+        self.assertIn('Pruned 1 property tombstones', out.getvalue())
+        self.assertEqual(list(DeletedProperty.objects.values_list('property_id', flat=True)), [self.fresh.id])
+
+
+class CriterionAPITest(ScorecardAPITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.client = APIClient()
@@ -229,7 +1856,7 @@ class CriterionAPITest(APITestCase):
         self.assertEqual(len(response.data), 0)
 
 
-class RatingAPITest(APITestCase):
+class RatingAPITest(ScorecardAPITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.client = APIClient()
@@ -292,8 +1919,48 @@ class RatingAPITest(APITestCase):
         rating.refresh_from_db()
         self.assertEqual(rating.value, '5')
 
+    def test_bulk_upsert_ratings(self):
+        must_have = Criterion.objects.create(owner=self.user, text='Parking', type='mustHave')
+        existing = Rating.objects.create(property=self.property, criterion=self.criterion, value='2')
+        url = f'/api/properties/{self.property.id}/ratings/bulk/'
+        response = self.client.post(url, {str(self.criterion.id): 5, str(must_have.id): True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ratings'], {self.criterion.id: 5, must_have.id: True})
+        self.assertEqual(response.data['score'], 100)
+
+        self.assertEqual(Rating.objects.filter(property=self.property).count(), 2)
+        existing.refresh_from_db()
+        self.assertEqual(existing.value, '5')
+        self.property.refresh_from_db()
+        self.assertTrue(self.property.must_haves_met)
+        self.assertEqual(self.property.score_total_weight, 5)
+
+    def test_bulk_upsert_stores_whole_floats_as_integers(self):
+        url = f'/api/properties/{self.property.id}/ratings/bulk/'
+        response = self.client.post(url, {str(self.criterion.id): 4.0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ratings'], {self.criterion.id: 4})
+        self.assertEqual(Rating.objects.get(property=self.property).value, '4')
+
+        response = self.client.post(url, {str(self.criterion.id): 3.5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Rating.objects.get(property=self.property).value, '4')
+
+    def test_bulk_upsert_rejects_other_users_criteria(self):
+        other_user = User.objects.create_user(username='otheruser', password='testpass')
+        other_criterion = Criterion.objects.create(owner=other_user, text='Other', type='niceToHave')
+        url = f'/api/properties/{self.property.id}/ratings/bulk/'
+        response = self.client.post(
+            url, {str(self.criterion.id): '4', str(other_criterion.id): '4'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Rating.objects.count(), 0)
+
+        response = self.client.post(url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
-class IntegrationTest(APITestCase):
+class IntegrationTest(ScorecardAPITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass')
         self.client = APIClient()
@@ -1,12 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PropertyViewSet, CriterionViewSet, RatingViewSet, UserCreate, HealthCheckView, cors_test
+from .views import PropertyViewSet, CriterionViewSet, RatingViewSet, ImportJobViewSet, GeocodeJobViewSet, PointOfInterestViewSet, UserCreate, HealthCheckView, cors_test
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
 router.register(r'properties', PropertyViewSet, basename='property')
 router.register(r'criteria', CriterionViewSet, basename='criterion')
 router.register(r'ratings', RatingViewSet, basename='rating')
+router.register(r'import-jobs', ImportJobViewSet, basename='import-job')
+router.register(r'geocode-jobs', GeocodeJobViewSet, basename='geocode-job')
+router.register(r'points-of-interest', PointOfInterestViewSet, basename='point-of-interest')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
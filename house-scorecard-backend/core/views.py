@@ -2,9 +2,8 @@ from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db import transaction
+from django.db.models import Prefetch
 from django.contrib.auth.models import User
-import csv
-import io
 import re
 import json
 import requests
@@ -108,59 +107,39 @@ from urllib.parse import urljoin, urlparse
 import time
 import random
 import logging
-from decimal import Decimal, InvalidOperation
 from datetime import datetime
 from django.core.cache import cache
 from django.utils import timezone
-from .models import Property, Criterion, Rating
-from .serializers import PropertySerializer, CriterionSerializer, RatingSerializer, UserSerializer
+from .models import (
+    Property, Criterion, Rating, DeletedProperty, GeocodeJob, ImportJob, PointOfInterest, PropertyDistance,
+)
+from .serializers import (
+    PropertySerializer, CriterionSerializer, RatingSerializer, UserSerializer, GeocodeJobSerializer, ImportJobSerializer,
+    PointOfInterestSerializer,
+)
+from .pagination import KeysetPagination
+from .versioning import CollectionETagMixin
+from .sync import DELETION_LOG_RETENTION, decode_sync_token, next_sync_token
+from .filters import filter_properties, get_sort, sort_properties
+from .services.addresses import clean_address
+from .services.breakdown import get_score_breakdown
+from .services.distances import refresh_distance_ratings, refresh_distances
+from .services.geocoding import (
+    GEOCODE_JOB_STALE_AFTER, geocode, parse_coordinates, properties_to_geocode, start_geocode_job_thread,
+    start_point_geocoding_thread, start_property_geocoding_thread,
+)
+from .services.import_readers import get_import_reader
+from .services.map_view import get_map_view, parse_bbox, parse_zoom
+from .services.proximity import find_nearby, parse_nearby_params
+from .services.property_import import (
+    parse_canadian_price, parse_decimal, parse_integer, parse_sqft, spool_upload, start_import_job_thread,
+)
+from .services.rescoring import rescore_properties
+from .services.scoring import refresh_criteria_flags, refresh_typed_values, upsert_ratings
+from .services.simulation import get_simulation_data, simulate_scores
 from .health import get_health_status
 from .services.gemini_analyzer import get_ai_analyzer
 
-# Geocoding service using OpenStreetMap Nominatim API
-def geocode_address(address):
-    try:
-        # Clean up address format for better geocoding results
-        clean_address = address.strip()
-        
-        # Handle common Canadian address formats
-        if clean_address.startswith('#'):
-            # Convert "#18 3303 STREET" to "3303 STREET UNIT 18" 
-            parts = clean_address.split(' ', 2)
-            if len(parts) >= 3:
-                unit = parts[0][1:]  # Remove #
-                street_num = parts[1] 
-                rest = parts[2]
-                clean_address = f"{street_num} {rest}, Unit {unit}"
-        
-        logger.info(f"Geocoding address: '{address}' -> '{clean_address}'")
-        
-        # Use curl_cffi for geocoding as well to maintain consistency
-        response = cf_requests.get(
-            f'https://nominatim.openstreetmap.org/search',
-            params={
-                'format': 'json',
-                'q': clean_address,
-                'limit': 1,
-                'countrycodes': 'ca,us'
-            },
-            timeout=10,
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'},
-            impersonate="chrome120"
-        )
-        data = response.json()
-        
-        if data and len(data) > 0:
-            result = data[0]
-            return {
-                'latitude': float(result['lat']),
-                'longitude': float(result['lon'])
-            }
-        return None
-    except Exception as e:
-        logger.error(f'Geocoding failed for address "{address}": {str(e)}')
-        return None
-
 def _scrape_with_isolated_playwright(url):
     """
     Isolated Playwright scraping that creates a fresh browser instance for each request.
@@ -419,14 +398,68 @@ class UserCreate(generics.CreateAPIView):
     serializer_class = UserSerializer
     permission_classes = (permissions.AllowAny,)
 
-class PropertyViewSet(viewsets.ModelViewSet):
+class PropertyViewSet(CollectionETagMixin, viewsets.ModelViewSet):
     """API endpoint for properties."""
     serializer_class = PropertySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    # Large columns that are only loaded when a sparse fieldset asks for them
+    DEFERRABLE_FIELDS = (
+        'notes', 'image_urls', 'status_history', 'ai_analysis', 'ai_red_flags',
+        'ai_positive_indicators', 'ai_analysis_summary',
+    )
 
     def get_queryset(self):
         """Return only properties owned by the current user."""
-        return Property.objects.filter(owner=self.request.user).order_by('-created_at')
+        queryset = Property.objects.filter(owner=self.request.user).order_by('-created_at')
+        if self.action == 'list':
+            queryset = filter_properties(queryset, self.request.query_params)
+            queryset = sort_properties(queryset, self.get_keyset_ordering())
+
+        include_ratings = include_distances = True
+        if self.action in ('list', 'retrieve', 'changes', 'nearby') and self._has_sparse_fieldset():
+            field_names = PropertySerializer.get_sparse_field_names(self.request)
+            include_ratings = 'ratings' in field_names
+            include_distances = 'distances' in field_names
+            selected_columns = PropertySerializer.get_model_field_names(field_names)
+            deferred = [name for name in self.DEFERRABLE_FIELDS if name not in selected_columns]
+            if deferred:
+                queryset = queryset.defer(*deferred)
+
+        if include_ratings:
+            # Prefetch ratings in one query so serializing the list doesn't go N+1
+            ratings = Prefetch(
+                'ratings',
+                queryset=Rating.objects.only('id', 'property_id', 'criterion_id', 'value', 'bool_value'),
+            )
+            queryset = queryset.prefetch_related(ratings)
+        if include_distances:
+            distances = Prefetch(
+                'distances',
+                queryset=PropertyDistance.objects.only('id', 'property_id', 'point_of_interest_id', 'distance_km'),
+            )
+            queryset = queryset.prefetch_related(distances)
+        return queryset
+
+    @staticmethod
+    def _queue_geocoding(property_id):
+        try:
+            from .tasks import geocode_property_async
+            geocode_property_async.delay(property_id)
+            logger.info(f"Geocoding queued for new property {property_id}")
+        except Exception as e:
+            # A worker would retry; a thread doesn't, but "Add to map" picks up whatever stays pending
+            logger.error(f"Failed to queue geocoding for new property {property_id}, running it in a thread: {e}")
+            start_property_geocoding_thread(property_id)
+
+    def get_keyset_ordering(self):
+        """Ordering used by both the plain list and KeysetPagination (?sortBy=)."""
+        return get_sort(self.request.query_params)
+
+    def _has_sparse_fieldset(self):
+        params = self.request.query_params
+        return bool(params.get('fields') or params.get('omit'))
 
     def perform_create(self, serializer):
         """Set the owner to the current user when creating a property and geocode if needed."""
@@ -435,21 +468,22 @@ class PropertyViewSet(viewsets.ModelViewSet):
         logger.info(f"Property creation - validated_data: {property_data}")
         logger.info(f"Property creation - request.data: {self.request.data}")
         
-        # Try to geocode if no coordinates provided
+        # Without coordinates, use what is known offline: cached answers or the
+        # postal code gazetteer. Anything missing or approximate is geocoded
+        # in the background once the property is saved
         if not property_data.get('latitude') or not property_data.get('longitude'):
-            address = property_data.get('address')
-            if address:
-                logger.info(f"Attempting to geocode address: {address}")
-                coordinates = geocode_address(address)
-                if coordinates:
-                    logger.info(f"Successfully geocoded {address}: {coordinates}")
-                    property_data['latitude'] = coordinates['latitude']
-                    property_data['longitude'] = coordinates['longitude']
-                else:
-                    logger.warning(f"Failed to geocode address: {address}")
+            answer = geocode(property_data.get('address'), network=False)
+            if answer:
+                property_data['latitude'] = answer['latitude']
+                property_data['longitude'] = answer['longitude']
+                property_data['geocode_precision'] = answer['precision']
         
         # Save the property first
         property_instance = serializer.save(owner=self.request.user, **property_data)
+
+        if property_instance.geocode_status == 'pending' and property_instance.address:
+            property_id = property_instance.id
+            transaction.on_commit(lambda: self._queue_geocoding(property_id))
         
         # If no AI analysis provided but property has images, trigger analysis
         # Check both the property instance and if AI data was provided in the request
@@ -482,37 +516,233 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 logger.error(f"Failed to queue AI analysis for new property: {e}")
                 # Don't fail property creation if AI queueing fails
 
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync: properties created or updated since `?since=<token>`, plus the
+        IDs of deleted ones. Without `since` (or with an expired token) the full
+        collection is returned with `reset: true`. Every response carries the
+        token to send next time.
+        """
+        token = next_sync_token()
+        since = None
+        since_param = request.query_params.get('since')
+        if since_param:
+            since = decode_sync_token(since_param)
+            if since is None:
+                return Response(
+                    {'error': 'Invalid sync token'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if since < timezone.now() - DELETION_LOG_RETENTION:
+                # Tombstones this old may already be pruned
+                since = None
+
+        queryset = self.get_queryset()
+        deleted_ids = []
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+            deleted_ids = list(
+                DeletedProperty.objects.filter(owner=request.user, deleted_at__gte=since)
+                .values_list('property_id', flat=True)
+            )
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({
+            'properties': serializer.data,
+            'deleted': deleted_ids,
+            'reset': since is None,
+            'token': token,
+        })
+
+    @action(detail=False, methods=['get'], url_path='map')
+    def map_view(self, request):
+        """
+        Properties in a map viewport: `?bbox=west,south,east,north&zoom=`.
+        Zoomed out over many properties, they come back as grid clusters
+        with their count, centroid and min/avg score. The list filters
+        apply too.
+        """
+        return self.conditional_response(request, self._map_view)
+
+    def _map_view(self, request):
+        bbox = parse_bbox(request.query_params.get('bbox'))
+        zoom = parse_zoom(request.query_params.get('zoom'))
+        queryset = filter_properties(Property.objects.filter(owner=request.user), request.query_params)
+        return Response(get_map_view(queryset, bbox, zoom))
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Properties near `?lat=&lng=`, nearest first, each with its
+        `distanceKm`: those within `radiusKm=`, the `limit=` nearest (50 by
+        default), or both. `count` is how many are within the radius. The
+        list filters apply too.
+        """
+        return self.conditional_response(request, self._nearby)
+
+    def _nearby(self, request):
+        latitude, longitude, radius_km, limit = parse_nearby_params(request.query_params)
+        candidates = filter_properties(Property.objects.filter(owner=request.user), request.query_params)
+        ids, distances, count = find_nearby(candidates, latitude, longitude, radius_km, limit)
+
+        properties = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([properties[pk] for pk in ids], many=True)
+        results = [
+            {**data, 'distanceKm': round(distance, 3)}
+            for data, distance in zip(serializer.data, distances)
+        ]
+        return Response({'count': count if radius_km is not None else len(results), 'results': results})
+
+    @action(detail=True, methods=['post'], url_path='ratings/bulk')
+    def bulk_ratings(self, request, pk=None):
+        """
+        Upsert a {criterion_id: value} map of ratings in one transaction and
+        rescore the property once. Booleans are stored as 'yes'/'no' and
+        whole numbers as strings, like the single-rating endpoint receives
+        them, so 4.0 is stored as '4'.
+        """
+        property_instance = self.get_object()
+        if not isinstance(request.data, dict):
+            return Response(
+                {'error': 'Expected an object mapping criterion IDs to rating values'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        values = {}
+        for key, value in request.data.items():
+            try:
+                criterion_id = int(key)
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': f'Invalid criterion ID: {key}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if isinstance(value, bool):
+                value = 'yes' if value else 'no'
+            elif isinstance(value, float):
+                # Stars and scales are whole numbers; get_ratings reads back only digits as numbers
+                if not value.is_integer():
+                    return Response(
+                        {'error': f'Rating for criterion {key} must be a whole number'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                value = str(int(value))
+            elif isinstance(value, int):
+                value = str(value)
+            if value is not None and (not isinstance(value, str) or len(value) > 20):
+                return Response(
+                    {'error': f'Invalid rating value for criterion {key}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            values[criterion_id] = value
+
+        criteria = Criterion.objects.filter(owner=request.user).in_bulk(list(values))
+        unknown_ids = sorted(set(values) - set(criteria))
+        if unknown_ids:
+            return Response(
+                {'error': f'Unknown criteria: {", ".join(map(str, unknown_ids))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if values:
+            upsert_ratings(property_instance.pk, {
+                criteria[criterion_id]: value for criterion_id, value in values.items()
+            })
+        # Fetch again so the serialized ratings aren't the stale prefetch
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='score-breakdown')
+    def score_breakdown(self, request, pk=None):
+        """
+        Per-criterion explanation of the property's score, computed with the
+        same rules as the stored score. Cached until the user's ratings or
+        criteria change.
+        """
+        breakdown = get_score_breakdown(request.user.id, pk, self.get_object)
+        return Response(breakdown)
+
+    @action(detail=False, methods=['post'])
+    def simulate(self, request):
+        """
+        What-if scoring: re-rank the user's properties under hypothetical
+        criterion weights and types, e.g. {"criteria": {"12": {"weight": 9}}}.
+        Computed in memory from the cached ratings matrix; nothing is saved.
+        """
+        criteria = request.data.get('criteria') if isinstance(request.data, dict) else None
+        if not isinstance(criteria, dict):
+            return Response(
+                {'error': 'Expected "criteria" mapping criterion IDs to weight/type overrides'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        owned_ids = get_simulation_data(request.user.id)['criterion_ids']
+        valid_types = {choice for choice, _ in Criterion.TYPE_CHOICES}
+        overrides = {}
+        for key, override in criteria.items():
+            try:
+                criterion_id = int(key)
+            except (TypeError, ValueError):
+                criterion_id = None
+            if criterion_id not in owned_ids or not isinstance(override, dict):
+                return Response(
+                    {'error': f'Unknown criterion: {key}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            overrides[criterion_id] = {}
+            if 'weight' in override:
+                weight = override['weight']
+                if isinstance(weight, bool) or not isinstance(weight, int) or not 0 <= weight <= 10:
+                    return Response(
+                        {'error': f'Weight for criterion {key} must be an integer from 0 to 10'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                overrides[criterion_id]['weight'] = weight
+            if 'type' in override:
+                if override['type'] not in valid_types:
+                    return Response(
+                        {'error': f'Type for criterion {key} must be one of: {", ".join(sorted(valid_types))}'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                overrides[criterion_id]['type'] = override['type']
+
+        return Response({'properties': simulate_scores(request.user.id, overrides)})
+
     @action(detail=False, methods=['post'])
     def geocode_properties(self, request):
-        """Geocode properties that don't have coordinates."""
+        """
+        Geocode properties that don't have coordinates in a background job.
+        Returns the job, or the user's job already in progress; poll
+        /geocode-jobs/<id>/ for progress.
+        """
         try:
-            properties_without_coords = Property.objects.filter(
-                owner=self.request.user,
-                latitude__isnull=True
-            ) | Property.objects.filter(
-                owner=self.request.user,
-                longitude__isnull=True
+            job = GeocodeJob.objects.filter(
+                owner=request.user,
+                status__in=['pending', 'running'],
+                # A job that stopped making progress was lost with its worker
+                updated_at__gte=timezone.now() - GEOCODE_JOB_STALE_AFTER,
+            ).first()
+            if job is None:
+                total = properties_to_geocode(request.user.id).count()
+                if total == 0:
+                    job = GeocodeJob.objects.create(owner=request.user, status='completed', finished_at=timezone.now())
+                else:
+                    job = GeocodeJob.objects.create(owner=request.user, total_count=total)
+                    try:
+                        from .tasks import run_property_geocoding
+                        run_property_geocoding.delay(job.id)
+                        logger.info(f"Geocode job {job.id} queued for {total} properties")
+                    except Exception as e:
+                        # Not inline: at the geocoder's rate limit a job can take many minutes
+                        logger.error(f"Failed to queue geocode job {job.id}, running it in a thread: {e}")
+                        start_geocode_job_thread(job.id)
+
+            return Response(
+                {'success': True, **GeocodeJobSerializer(job).data},
+                status=status.HTTP_200_OK if job.status == 'completed' else status.HTTP_202_ACCEPTED,
             )
-            
-            geocoded_count = 0
-            for property_obj in properties_without_coords:
-                if property_obj.address:
-                    coordinates = geocode_address(property_obj.address)
-                    if coordinates:
-                        property_obj.latitude = coordinates['latitude']
-                        property_obj.longitude = coordinates['longitude']
-                        property_obj.save()
-                        geocoded_count += 1
-                        logger.info(f"Geocoded property {property_obj.id}: {property_obj.address}")
-                        # Add a small delay to be respectful to the API
-                        time.sleep(1)
-            
-            return Response({
-                'success': True,
-                'geocoded_count': geocoded_count,
-                'message': f'Successfully geocoded {geocoded_count} properties'
-            })
-            
+
         except Exception as e:
             logger.error(f"Geocoding error: {str(e)}")
             return Response(
@@ -523,8 +753,12 @@ class PropertyViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def bulk_import(self, request):
         """
-        Bulk import properties from CSV file.
+        Bulk import properties from a CSV, Excel, JSON Lines or Parquet file.
         Optimized for Canadian real estate platforms (Realtor.ca, MLS systems).
+
+        The upload is spooled to disk and imported by a background job; poll
+        /import-jobs/<id>/ for progress. Without a Celery worker the job runs
+        in a thread of this process.
         """
         try:
             csv_file = request.FILES.get('file')
@@ -533,65 +767,31 @@ class PropertyViewSet(viewsets.ModelViewSet):
             
             if not csv_file:
                 return Response(
-                    {'error': 'No CSV file provided'}, 
+                    {'error': 'No file provided'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
             # Validate file type
-            if not csv_file.name.endswith('.csv'):
-                return Response(
-                    {'error': 'File must be a CSV'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Read and process CSV
-            csv_data = csv_file.read().decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(csv_data))
-            
-            created_count = 0
-            updated_count = 0
-            errors = []
-            
-            with transaction.atomic():
-                for row_num, row in enumerate(csv_reader, start=2):
-                    try:
-                        property_data = self._map_csv_row(row, field_mapping)
-                        
-                        # Skip rows with no address
-                        if not property_data.get('address'):
-                            continue
-                        
-                        # Check if property exists (by address and owner)
-                        existing_property = Property.objects.filter(
-                            address__iexact=property_data['address'],
-                            owner=request.user
-                        ).first()
-                        
-                        if existing_property:
-                            # Update existing property
-                            for key, value in property_data.items():
-                                if value is not None:
-                                    setattr(existing_property, key, value)
-                            existing_property.save()
-                            updated_count += 1
-                        else:
-                            # Create new property
-                            Property.objects.create(owner=request.user, **property_data)
-                            created_count += 1
-                            
-                    except Exception as e:
-                        errors.append({
-                            'row': row_num,
-                            'error': str(e),
-                            'data': dict(row)
-                        })
-            
-            return Response({
-                'success': True,
-                'created': created_count,
-                'updated': updated_count,
-                'errors': errors
-            })
+            reader, error = self._get_import_reader(csv_file)
+            if error:
+                return error
+            
+            job = ImportJob.objects.create(
+                owner=request.user,
+                file_name=csv_file.name,
+                file_path=spool_upload(csv_file),
+                field_mapping=field_mapping,
+            )
+            try:
+                from .tasks import run_property_import
+                run_property_import.delay(job.id)
+                logger.info(f"Import job {job.id} queued for {csv_file.name}")
+            except Exception as e:
+                # Not inline: a large file would outlast the proxy's timeout
+                logger.error(f"Failed to queue import job {job.id}, running it in a thread: {e}")
+                start_import_job_thread(job.id)
+
+            return Response({'success': True, **ImportJobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
         
         except Exception as e:
             return Response(
@@ -601,34 +801,30 @@ class PropertyViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def preview_csv(self, request):
-        """Preview CSV file and suggest field mappings."""
+        """
+        Preview an import file and suggest field mappings.
+        Only the start of the file is read; for CSVs the encoding and
+        delimiter are detected and the row count is estimated from it.
+        """
         try:
             csv_file = request.FILES.get('file')
             
             if not csv_file:
                 return Response(
-                    {'error': 'No CSV file provided'}, 
+                    {'error': 'No file provided'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Read first few rows for preview
-            csv_data = csv_file.read().decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(csv_data))
-            
-            headers = csv_reader.fieldnames
-            preview_rows = []
-            
-            for i, row in enumerate(csv_reader):
-                if i >= 5:  # Only preview first 5 rows
-                    break
-                preview_rows.append(row)
+            reader, error = self._get_import_reader(csv_file)
+            if error:
+                return error
+            preview = {**reader.preview(csv_file), 'format': reader.label}
             
             # Generate suggested mappings
-            suggested_mapping = self._suggest_field_mappings(headers)
+            suggested_mapping = self._suggest_field_mappings(preview['headers'])
             
             return Response({
-                'headers': headers,
-                'preview_rows': preview_rows,
+                **preview,
                 'suggested_mapping': suggested_mapping
             })
         
@@ -638,6 +834,21 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _get_import_reader(self, uploaded_file):
+        """Return (reader, None) for a supported import file, else (None, error response)."""
+        reader = get_import_reader(uploaded_file.name)
+        if reader is None:
+            return None, Response(
+                {'error': 'File must be a CSV, Excel (.xlsx), JSON Lines or Parquet file'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not reader.available:
+            return None, Response(
+                {'error': f'{reader.label} import requires {reader.requirement} to be installed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return reader, None
+
     def _suggest_field_mappings(self, headers):
         """
         Suggest field mappings based on header names.
@@ -682,116 +893,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
         
         return suggested
 
-    def _map_csv_row(self, row, field_mapping):
-        """Map CSV row to Property model fields with Canadian formatting."""
-        mapped_data = {}
-        
-        for csv_field, our_field in field_mapping.items():
-            value = row.get(csv_field, '').strip()
-            
-            if not value or value.lower() in ['n/a', 'null', '--', '']:
-                continue
-            
-            try:
-                if our_field == 'address':
-                    mapped_data['address'] = value
-                
-                elif our_field == 'price':
-                    # Handle Canadian currency formatting
-                    price_value = self._parse_canadian_price(value)
-                    if price_value:
-                        mapped_data['price'] = price_value
-                
-                elif our_field == 'beds':
-                    # Parse bedrooms (0-50)
-                    numeric_value = self._parse_integer(value)
-                    if numeric_value is not None:
-                        mapped_data[our_field] = numeric_value
-                
-                elif our_field == 'sqft':
-                    # Parse square footage (different validation)
-                    sqft_value = self._parse_sqft(value)
-                    if sqft_value is not None:
-                        mapped_data[our_field] = sqft_value
-                
-                elif our_field == 'baths':
-                    # Parse decimal for bathrooms
-                    bath_value = self._parse_decimal(value)
-                    if bath_value is not None:
-                        mapped_data['baths'] = bath_value
-                
-                elif our_field == 'listing_url':
-                    if value.startswith(('http://', 'https://')):
-                        mapped_data['listing_url'] = value
-                
-                else:
-                    # Store as-is for other fields
-                    mapped_data[our_field] = value
-            
-            except Exception:
-                # Skip invalid values
-                continue
-        
-        return mapped_data
-
-    def _parse_canadian_price(self, value):
-        """Parse Canadian currency values."""
-        try:
-            # Remove currency symbols, CAD, commas, spaces
-            cleaned = re.sub(r'[CAD$,\s]', '', value.upper())
-            if not cleaned:
-                return None
-            price = Decimal(cleaned)
-            # Validate reasonable price range (Canadian real estate)
-            if price < 10000 or price > 50000000:  # $10K to $50M CAD
-                return None
-            return price
-        except (ValueError, InvalidOperation):
-            return None
-
-    def _parse_integer(self, value):
-        """Parse integer values."""
-        try:
-            # Remove non-digit characters except decimal point
-            cleaned = re.sub(r'[^\d.]', '', value)
-            if not cleaned:
-                return None
-            result = int(float(cleaned))
-            # Validate reasonable ranges
-            if result < 0 or result > 50:  # 0-50 bedrooms/baths, 0-50K sqft
-                return None
-            return result
-        except (ValueError, TypeError):
-            return None
-
-    def _parse_sqft(self, value):
-        """Parse square footage values."""
-        try:
-            # Remove non-digit characters except decimal point
-            cleaned = re.sub(r'[^\d.]', '', value)
-            if not cleaned:
-                return None
-            result = int(float(cleaned))
-            # Validate reasonable sqft range (100 to 50,000 sqft)
-            if result < 100 or result > 50000:
-                return None
-            return result
-        except (ValueError, TypeError):
-            return None
-
-    def _parse_decimal(self, value):
-        """Parse decimal values (for bathrooms)."""
-        try:
-            cleaned = re.sub(r'[^\d.]', '', value)
-            if not cleaned:
-                return None
-            result = Decimal(cleaned)
-            # Validate reasonable bathroom range (0.5 to 20 baths)
-            if result < Decimal('0.5') or result > Decimal('20'):
-                return None
-            return result
-        except (ValueError, InvalidOperation, TypeError):
-            return None
+    # The listing scrapers share the CSV import's value parsers
+    _parse_canadian_price = staticmethod(parse_canadian_price)
+    _parse_integer = staticmethod(parse_integer)
+    _parse_sqft = staticmethod(parse_sqft)
+    _parse_decimal = staticmethod(parse_decimal)
 
     def _extract_description(self, soup):
         """Extract property description from various selectors."""
@@ -1115,6 +1221,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 except Exception as e:
                     logger.error(f"Error extracting description: {e}")
                     result['description'] = None
+
+                try:
+                    result['latitude'], result['longitude'] = self._extract_coordinates(soup) or (None, None)
+                except Exception as e:
+                    logger.error(f"Error extracting coordinates: {e}")
                 
                 # Apply image optimization if we found images
                 if result.get('images') and len(result['images']) > 0:
@@ -1369,6 +1480,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
         except Exception as e:
             print(f"Error extracting description: {e}")
             scraped_data['description'] = None
+
+        try:
+            scraped_data['latitude'], scraped_data['longitude'] = self._extract_coordinates(soup) or (None, None)
+        except Exception as e:
+            print(f"Error extracting coordinates: {e}")
         
         # Remove None values
         scraped_data = {k: v for k, v in scraped_data.items() if v is not None}
@@ -1597,6 +1713,16 @@ class PropertyViewSet(viewsets.ModelViewSet):
                                 scraped_data['images'] = self._validate_and_optimize_images(unique_imgs)
                                 logger.info(f"RSC extracted {len(scraped_data['images'])} cloudfront images")
 
+            # Coordinates: JSON-LD geo or meta tags, else the listing object in the RSC payload
+            coordinates = self._extract_coordinates(soup)
+            if not coordinates:
+                listing = self._find_rsc_listing(self._rsc_rows(scripts))
+                coordinates = self._listing_coordinates(listing) if listing else None
+                if coordinates:
+                    logger.info(f"RSC extracted coordinates: {coordinates}")
+            if coordinates:
+                scraped_data['latitude'], scraped_data['longitude'] = coordinates
+
             # Method 3: Fallback to legacy gData format (for older pages)
             if not scraped_data.get('address'):
                 gdata_pattern = r'var gData = "([^"]+)"'
@@ -1877,6 +2003,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 if optimized_images:
                     scraped_data['images'] = optimized_images
                     logger.info(f"Extracted {len(unique_urls)} images, optimized {len(optimized_images)}")
+
+            # Extract coordinates, so the property needn't be geocoded
+            coordinates = self._extract_coordinates(soup)
+            if coordinates:
+                scraped_data['latitude'], scraped_data['longitude'] = coordinates
             
             logger.info(f"REW.ca parsing completed successfully with {len(scraped_data)} data fields")
             return scraped_data
@@ -2050,28 +2181,128 @@ class PropertyViewSet(viewsets.ModelViewSet):
                     return address
         return None
     
-    def _clean_address(self, address):
-        """Clean and format address string to fix common parsing issues"""
-        if not address:
-            return None
-            
-        import re
-        
-        # Remove multiple spaces
-        address = re.sub(r'\s+', ' ', address.strip())
-        
-        # Fix missing spaces before city names (common realtor.ca issue)
-        # Pattern: "AVENUESurrey" -> "AVENUE Surrey"
-        address = re.sub(r'([A-Z]{2,}|AVENUE|STREET|ROAD|DRIVE|LANE|WAY|COURT|PLACE)([A-Z][a-z]+)', r'\1 \2', address)
-        
-        # Fix missing spaces around common address components
-        address = re.sub(r'([A-Za-z])([A-Z][a-z])', r'\1 \2', address)
-        
-        # Clean up any double spaces created by the replacements
-        address = re.sub(r'\s+', ' ', address.strip())
-        
-        return address
+    _clean_address = staticmethod(clean_address)
+
+    def _extract_coordinates(self, soup):
+        """
+        Extract the listing's (latitude, longitude), so the property never
+        needs geocoding. Returns None if the page doesn't carry them.
+        """
+        # JSON-LD geo (Realtor.ca, Redfin, REW.ca, Zealty)
+        for script in soup.find_all('script', type='application/ld+json'):
+            try:
+                coordinates = self._find_json_ld_coordinates(json.loads(script.string or ''))
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if coordinates:
+                logger.info("Extracted coordinates from JSON-LD geo")
+                return coordinates
+
+        # Open Graph place:location meta tags
+        for prefix in ('place:location', 'og'):
+            latitude = soup.find('meta', attrs={'property': f'{prefix}:latitude'})
+            longitude = soup.find('meta', attrs={'property': f'{prefix}:longitude'})
+            if latitude and longitude:
+                coordinates = parse_coordinates(latitude.get('content'), longitude.get('content'))
+                if coordinates:
+                    logger.info(f"Extracted coordinates from {prefix} meta tags")
+                    return coordinates
+        return None
+
+    # JSON-LD types a listing's own node can have; brokerages and offices are
+    # RealEstateAgent/Organization and never match
+    JSON_LD_LISTING_TYPES = {
+        'RealEstateListing', 'Product', 'Place', 'Residence', 'Accommodation', 'House',
+        'SingleFamilyResidence', 'Apartment', 'ApartmentComplex',
+    }
+
+    def _json_ld_listing_nodes(self, data):
+        """
+        The listing/place nodes of a JSON-LD document: its top-level items
+        (including @graph members) of a listing type, and the mainEntity,
+        about or itemOffered subject of any top-level item.
+        """
+        items = data if isinstance(data, list) else [data]
+        top_level = []
+        for item in items:
+            if isinstance(item, dict):
+                graph = item.get('@graph')
+                top_level.extend(graph if isinstance(graph, list) else [item])
+        for node in top_level:
+            if not isinstance(node, dict):
+                continue
+            for candidate in (node, node.get('mainEntity'), node.get('about'), node.get('itemOffered')):
+                if not isinstance(candidate, dict):
+                    continue
+                types = candidate.get('@type')
+                types = set(types) if isinstance(types, list) else {types}
+                if types & self.JSON_LD_LISTING_TYPES:
+                    yield candidate
+
+    def _find_json_ld_coordinates(self, data):
+        """The listing's GeoCoordinates in a JSON-LD document, as (latitude, longitude)."""
+        for node in self._json_ld_listing_nodes(data):
+            geo = node.get('geo')
+            if isinstance(geo, dict):
+                coordinates = parse_coordinates(geo.get('latitude'), geo.get('longitude'))
+                if coordinates:
+                    return coordinates
+        return None
     
+    def _rsc_rows(self, scripts):
+        """The JSON rows of a Next.js RSC payload, spread over self.__next_f.push() scripts."""
+        decoder = json.JSONDecoder()
+        chunks = []
+        for script in scripts:
+            content = script.string or ''
+            for match in re.finditer(r'self\.__next_f\.push\(', content):
+                try:
+                    chunk, _ = decoder.raw_decode(content, match.end())
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(chunk, list) and len(chunk) > 1 and isinstance(chunk[1], str):
+                    chunks.append(chunk[1])
+        rows = []
+        for line in ''.join(chunks).split('\n'):
+            # Rows are "<id>:<json>"; text and module rows aren't JSON and are skipped
+            try:
+                rows.append(json.loads(re.sub(r'^[0-9a-f]+:', '', line)))
+            except ValueError:
+                continue
+        return rows
+
+    def _find_rsc_listing(self, data):
+        """The first object carrying an "address", which is the page's listing."""
+        if isinstance(data, list):
+            for item in data:
+                listing = self._find_rsc_listing(item)
+                if listing:
+                    return listing
+        elif isinstance(data, dict):
+            if isinstance(data.get('address'), str):
+                return data
+            for value in data.values():
+                if isinstance(value, (dict, list)):
+                    listing = self._find_rsc_listing(value)
+                    if listing:
+                        return listing
+        return None
+
+    def _listing_coordinates(self, listing):
+        """
+        A listing object's (latitude, longitude), from a pair of keys on the
+        object itself or on one of its nested objects (e.g. "location").
+        Other entities in the payload, like similar listings or the map's
+        default view, are never mixed in.
+        """
+        for candidate in [listing, *(v for v in listing.values() if isinstance(v, dict))]:
+            latitude = next((candidate[key] for key in ('latitude', 'lat') if key in candidate), None)
+            longitude = next((candidate[key] for key in ('longitude', 'lng', 'lon') if key in candidate), None)
+            coordinates = parse_coordinates(latitude, longitude)
+            if coordinates:
+                return coordinates
+        return None
+
     def _sanitize_scraped_data(self, data):
         """Sanitize scraped data to meet database constraints and prevent errors"""
         if not data:
@@ -2669,7 +2900,7 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class CriterionViewSet(viewsets.ModelViewSet):
+class CriterionViewSet(CollectionETagMixin, viewsets.ModelViewSet):
     """API endpoint for criteria."""
     serializer_class = CriterionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -2680,7 +2911,96 @@ class CriterionViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         """Set the owner to the current user when creating a criterion."""
-        serializer.save(owner=self.request.user)
+        criterion = serializer.save(owner=self.request.user)
+        if criterion.type in ('mustHave', 'dealBreaker'):
+            refresh_criteria_flags(self.request.user.id)
+        # Rated right away from the precomputed distances, when tied to a point of interest
+        refresh_distance_ratings([criterion])
+
+    def perform_update(self, serializer):
+        """Rescore the user's properties when a criterion's scoring inputs change."""
+        scoring_fields = ('type', 'weight', 'rating_type')
+        distance_fields = ('point_of_interest_id', 'ideal_distance_km', 'max_distance_km')
+        previous = [getattr(serializer.instance, field) for field in scoring_fields + distance_fields]
+        criterion = serializer.save()
+        if criterion.rating_type != previous[2]:
+            refresh_typed_values(criterion)
+        current = [getattr(criterion, field) for field in scoring_fields + distance_fields]
+        if current != previous:
+            refresh_distance_ratings([criterion])
+        if current[:len(scoring_fields)] != previous[:len(scoring_fields)]:
+            rescore_properties(self.request.user.id)
+
+    def perform_destroy(self, instance):
+        criterion_type = instance.type
+        # Deleting the ratings rescores and touches each property rated on it
+        instance.delete()
+        if criterion_type in ('mustHave', 'dealBreaker'):
+            refresh_criteria_flags(self.request.user.id)
+
+class PointOfInterestViewSet(CollectionETagMixin, viewsets.ModelViewSet):
+    """API endpoint for places the user measures properties against, like work or school."""
+    serializer_class = PointOfInterestSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Return only the current user's points of interest."""
+        return PointOfInterest.objects.filter(owner=self.request.user).order_by('name', 'pk')
+
+    @staticmethod
+    def _queue_geocoding(point_id):
+        try:
+            from .tasks import geocode_point_of_interest_async
+            geocode_point_of_interest_async.delay(point_id)
+            logger.info(f"Geocoding queued for point of interest {point_id}")
+        except Exception as e:
+            # Nothing else would ever place it, so don't leave it waiting for a worker
+            logger.error(f"Failed to queue geocoding for point of interest {point_id}, running it in a thread: {e}")
+            start_point_geocoding_thread(point_id)
+
+    def _geocode_if_pending(self, serializer, point):
+        # The serializer only sets a status when the address or coordinates changed
+        if serializer.validated_data.get('geocode_status') == 'pending':
+            transaction.on_commit(lambda: self._queue_geocoding(point.pk))
+
+    def perform_create(self, serializer):
+        point = serializer.save(owner=self.request.user)
+        refresh_distances(self.request.user.id, point_ids=[point.pk])
+        self._geocode_if_pending(serializer, point)
+
+    def perform_update(self, serializer):
+        previous = (serializer.instance.latitude, serializer.instance.longitude)
+        point = serializer.save()
+        if (point.latitude, point.longitude) != previous:
+            refresh_distances(self.request.user.id, point_ids=[point.pk])
+        self._geocode_if_pending(serializer, point)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # Their serialized distances lose an entry, so delta sync has to send them again
+            Property.objects.filter(distances__point_of_interest=instance).update(updated_at=timezone.now())
+            # Criteria tied to it keep their ratings but are no longer rated by distance
+            instance.delete()
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """API endpoint for bulk import progress."""
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Return only the current user's import jobs, newest first."""
+        return ImportJob.objects.filter(owner=self.request.user).order_by('-created_at')
+
+
+class GeocodeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """API endpoint for background geocoding progress."""
+    serializer_class = GeocodeJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Return only the current user's geocode jobs, newest first."""
+        return GeocodeJob.objects.filter(owner=self.request.user).order_by('-created_at')
+
 
 class RatingViewSet(viewsets.ModelViewSet):
     """API endpoint for ratings."""
@@ -2689,7 +3009,8 @@ class RatingViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return only ratings for properties owned by the current user."""
-        return Rating.objects.filter(property__owner=self.request.user)
+        # Writes need the criterion to rescore and the owner to bump the collection version
+        return Rating.objects.filter(property__owner=self.request.user).select_related('criterion', 'property')
 
 
 # Health Check Views
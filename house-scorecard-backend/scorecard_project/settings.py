@@ -162,6 +162,19 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# A shared Redis cache keeps per-user collection versions (ETags) consistent
+# across gunicorn workers; the local-memory default is fine for a single process.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -182,6 +195,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Bulk imports are spooled here before the background job reads them;
+# point this at storage the Celery workers share with the web process
+IMPORT_SPOOL_DIR = os.environ.get('IMPORT_SPOOL_DIR', os.path.join(BASE_DIR, 'import_spool'))
+
+# How long geocoder answers are reused; misses expire sooner, since a
+# geocoder may learn a new address
+GEOCODE_CACHE_TTL_DAYS = int(os.environ.get('GEOCODE_CACHE_TTL_DAYS', '180'))
+GEOCODE_NEGATIVE_CACHE_TTL_DAYS = int(os.environ.get('GEOCODE_NEGATIVE_CACHE_TTL_DAYS', '7'))
+# Nominatim's usage policy allows one request per second; the limit is
+# shared by every worker through the cache, so set REDIS_URL when running several
+NOMINATIM_REQUESTS_PER_SECOND = float(os.environ.get('NOMINATIM_REQUESTS_PER_SECOND', '1'))
+
+# Geocoders asked in order (see core/services/geocoding.py). The postal code
+# gazetteer answers offline from a file built by `manage.py build_postal_gazetteer`;
+# later network geocoders only refine its approximate positions
+GEOCODER_CHAIN = os.environ.get('GEOCODER_CHAIN', 'postal_code,nominatim').split(',')
+POSTAL_GAZETTEER_PATH = os.environ.get('POSTAL_GAZETTEER_PATH', os.path.join(BASE_DIR, 'data', 'postal_gazetteer.bin'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
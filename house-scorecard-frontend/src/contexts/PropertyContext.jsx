@@ -7,6 +7,31 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
 
 const getApiUrl = (path) => `${API_BASE_URL}${path}`;
 
+// Sync token (and the user it belongs to) for delta syncing the local property copy
+const SYNC_STATE_KEY = 'houseScorecard_propertiesSync';
+
+// Ensure all properties have required frontend fields with defaults
+const withPropertyDefaults = (property) => ({
+  ...property,
+  // Status fields (now supported by backend)
+  status: property.status !== undefined ? property.status : PROPERTY_STATUSES.UNSET,
+  statusHistory: Array.isArray(property.statusHistory) ? property.statusHistory : [],
+  // Ensure other frontend fields exist
+  ratings: property.ratings || {},
+  score: property.score !== undefined ? property.score : null,
+  imageUrls: Array.isArray(property.imageUrls) ? property.imageUrls : [],
+  // Ensure AI analysis fields are included
+  aiAnalysis: property.aiAnalysis || null,
+  aiOverallGrade: property.aiOverallGrade || null,
+  aiRedFlags: property.aiRedFlags || null,
+  aiPositiveIndicators: property.aiPositiveIndicators || null,
+  aiPriceAssessment: property.aiPriceAssessment || null,
+  aiBuyerRecommendation: property.aiBuyerRecommendation || null,
+  aiConfidenceScore: property.aiConfidenceScore || null,
+  aiAnalysisSummary: property.aiAnalysisSummary || null,
+  aiAnalysisDate: property.aiAnalysisDate || null
+});
+
 // 1. Create the Context
 const PropertyContext = createContext();
 
@@ -14,42 +39,44 @@ const PropertyContext = createContext();
 export function PropertyProvider({ children }) {
   // State holding the array of all property objects
   const [properties, setProperties] = useState([]);
-  const { authenticatedFetch, isAuthenticated } = useAuth();
+  const { authenticatedFetch, isAuthenticated, user } = useAuth();
 
     useEffect(() => {
       const fetchProperties = async () => {
         try {
-          const response = await authenticatedFetch(getApiUrl('/properties/'));
+          // Delta sync: with a local copy and a sync token for this user, only
+          // properties changed since the last sync (plus deletions) are downloaded
+          const savedProperties = localStorage.getItem('houseScorecard_properties');
+          const savedSync = JSON.parse(localStorage.getItem(SYNC_STATE_KEY) || 'null');
+          const canSync = savedProperties && savedSync && savedSync.username === user?.username;
+          const query = canSync ? `?since=${encodeURIComponent(savedSync.token)}` : '';
+
+          const response = await authenticatedFetch(getApiUrl(`/properties/changes/${query}`));
           if (!response.ok) {
             throw new Error('Network response was not ok');
           }
           const data = await response.json();
-          
-          // Ensure all properties have required frontend fields with defaults
-          const propertiesWithDefaults = data.map(property => ({
-            ...property,
-            // Status fields (now supported by backend)
-            status: property.status !== undefined ? property.status : PROPERTY_STATUSES.UNSET,
-            statusHistory: Array.isArray(property.statusHistory) ? property.statusHistory : [],
-            // Ensure other frontend fields exist
-            ratings: property.ratings || {},
-            score: property.score !== undefined ? property.score : null,  
-            imageUrls: Array.isArray(property.imageUrls) ? property.imageUrls : [],
-            // Ensure AI analysis fields are included
-            aiAnalysis: property.aiAnalysis || null,
-            aiOverallGrade: property.aiOverallGrade || null,
-            aiRedFlags: property.aiRedFlags || null,
-            aiPositiveIndicators: property.aiPositiveIndicators || null,
-            aiPriceAssessment: property.aiPriceAssessment || null,
-            aiBuyerRecommendation: property.aiBuyerRecommendation || null,
-            aiConfidenceScore: property.aiConfidenceScore || null,
-            aiAnalysisSummary: property.aiAnalysisSummary || null,
-            aiAnalysisDate: property.aiAnalysisDate || null
-          }));
-
-          setProperties(propertiesWithDefaults);
-          // Keep localStorage as backup
-          localStorage.setItem('houseScorecard_properties', JSON.stringify(propertiesWithDefaults));
+          const changedProperties = data.properties.map(withPropertyDefaults);
+
+          let syncedProperties;
+          if (data.reset || !canSync) {
+            syncedProperties = changedProperties;
+          } else {
+            const changedIds = new Set(changedProperties.map(property => property.id));
+            const deletedIds = new Set(data.deleted);
+            syncedProperties = JSON.parse(savedProperties)
+              .filter(property => !changedIds.has(property.id) && !deletedIds.has(property.id))
+              .concat(changedProperties)
+              // Newest first, matching the list endpoint
+              .sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+          }
+
+          setProperties(syncedProperties);
+          // Keep localStorage as backup, rewriting it only when something changed
+          if (data.reset || !canSync || changedProperties.length > 0 || data.deleted.length > 0) {
+            localStorage.setItem('houseScorecard_properties', JSON.stringify(syncedProperties));
+          }
+          localStorage.setItem(SYNC_STATE_KEY, JSON.stringify({ username: user?.username, token: data.token }));
         } catch (error) {
           // Fallback to localStorage if backend fails
           const savedProperties = localStorage.getItem('houseScorecard_properties');
@@ -66,7 +93,7 @@ export function PropertyProvider({ children }) {
       if (authenticatedFetch && isAuthenticated) {
         fetchProperties();
       }
-    }, [authenticatedFetch, isAuthenticated]);
+    }, [authenticatedFetch, isAuthenticated, user]);
 
   // --- Action Functions (Memoized using useCallback for stable references) ---
 
@@ -215,59 +242,14 @@ export function PropertyProvider({ children }) {
 
     // Sync with backend (attempt ratings and score sync with graceful fallback)
     try {
-      // First, save each rating via the Rating API (this should work)
-      for (const [criterionId, value] of Object.entries(newRatings)) {
-        try {
-          // Convert frontend value format to backend format
-          let backendValue = value;
-          if (typeof value === 'boolean') {
-            backendValue = value ? 'yes' : 'no';
-          } else if (typeof value === 'number') {
-            backendValue = value.toString();
-          }
-
-          // Check if rating already exists
-          const existingRatingResponse = await authenticatedFetch(getApiUrl(`/ratings/?property=${propertyId}&criterion=${criterionId}`));
-          
-          if (existingRatingResponse.ok) {
-            const existingRatings = await existingRatingResponse.json();
-            
-            // Find the specific rating for this property-criterion combination
-            const matchingRating = existingRatings.find(r => 
-              r.property === parseInt(propertyId, 10) && r.criterion === parseInt(criterionId, 10)
-            );
-            
-            if (matchingRating) {
-              // Update existing rating
-              await authenticatedFetch(getApiUrl(`/ratings/${matchingRating.id}/`), {
-                method: 'PUT',
-                headers: {
-                  'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                  property: parseInt(propertyId, 10),
-                  criterion: parseInt(criterionId, 10),
-                  value: backendValue
-                }),
-              });
-            } else {
-              // Create new rating
-              await authenticatedFetch(getApiUrl(`/ratings/`), {
-                method: 'POST',
-                headers: {
-                  'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                  property: parseInt(propertyId, 10),
-                  criterion: parseInt(criterionId, 10),
-                  value: backendValue
-                }),
-              });
-            }
-          }
-        } catch (ratingError) {
-        }
-      }
+      // First, upsert all ratings in one request (the backend rescores once)
+      await authenticatedFetch(getApiUrl(`/properties/${propertyId}/ratings/bulk/`), {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(newRatings),
+      });
 
       // Update the property score (fully supported by backend)
       const response = await authenticatedFetch(getApiUrl(`/properties/${propertyId}/`), {
@@ -629,50 +611,64 @@ export function PropertyProvider({ children }) {
     }
   }, [authenticatedFetch]);
 
-  /** Geocodes properties that don't have coordinates using backend */
-  const geocodeProperties = useCallback(async () => {
-    const propertiesWithoutCoords = properties.filter(p => 
-      !p.latitude || !p.longitude
-    );
-    
-    if (propertiesWithoutCoords.length === 0) {
-      return { geocoded_count: 0, message: 'All properties already have coordinates' };
+  /** Reloads every property from the backend, e.g. to pick up coordinates added by a background job */
+  const refreshProperties = useCallback(async () => {
+    const refreshResponse = await authenticatedFetch(getApiUrl('/properties/'));
+    if (refreshResponse.ok) {
+      const updatedProperties = await refreshResponse.json();
+      const propertiesWithDefaults = updatedProperties.map(property => ({
+        ...property,
+        status: property.status !== undefined ? property.status : PROPERTY_STATUSES.UNSET,
+        statusHistory: Array.isArray(property.statusHistory) ? property.statusHistory : [],
+        ratings: property.ratings || {},
+        score: property.score !== undefined ? property.score : null,
+        imageUrls: Array.isArray(property.imageUrls) ? property.imageUrls : []
+      }));
+      setProperties(propertiesWithDefaults);
     }
+  }, [authenticatedFetch]);
 
-    try {
-      const response = await authenticatedFetch(getApiUrl('/properties/geocode_properties/'), {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        }
-      });
-
-      if (!response.ok) {
-        throw new Error('Geocoding request failed');
+  /**
+   * Starts a backend job geocoding the properties that don't have coordinates.
+   * Returns the job; poll it with getGeocodeJob until it is no longer pending or running.
+   */
+  const geocodeProperties = useCallback(async () => {
+    const response = await authenticatedFetch(getApiUrl('/properties/geocode_properties/'), {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
       }
+    });
 
-      const result = await response.json();
-      
-      // Refresh properties to get the updated coordinates
-      const refreshResponse = await authenticatedFetch(getApiUrl('/properties/'));
-      if (refreshResponse.ok) {
-        const updatedProperties = await refreshResponse.json();
-        const propertiesWithDefaults = updatedProperties.map(property => ({
-          ...property,
-          status: property.status !== undefined ? property.status : PROPERTY_STATUSES.UNSET,
-          statusHistory: Array.isArray(property.statusHistory) ? property.statusHistory : [],
-          ratings: property.ratings || {},
-          score: property.score !== undefined ? property.score : null,
-          imageUrls: Array.isArray(property.imageUrls) ? property.imageUrls : []
-        }));
-        setProperties(propertiesWithDefaults);
-      }
+    if (!response.ok) {
+      throw new Error('Geocoding request failed');
+    }
 
-      return result;
-    } catch (error) {
-      throw error;
+    return response.json();
+  }, [authenticatedFetch]);
+
+  /** Fetches the progress of a geocoding job */
+  const getGeocodeJob = useCallback(async (jobId) => {
+    const response = await authenticatedFetch(getApiUrl(`/geocode-jobs/${jobId}/`));
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
     }
-  }, [properties, authenticatedFetch]);
+    return response.json();
+  }, [authenticatedFetch]);
+
+  /**
+   * Fetches what the map shows in a viewport: `bbox` is Leaflet's toBBoxString().
+   * Returns { mode: 'properties', properties } or, zoomed out over many
+   * properties, { mode: 'clusters', clusters }.
+   */
+  const getMapView = useCallback(async (bbox, zoom) => {
+    const query = new URLSearchParams({ bbox, zoom: String(zoom) });
+    const response = await authenticatedFetch(getApiUrl(`/properties/map/?${query}`));
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+  }, [authenticatedFetch]);
 
   // --- Memoize the context value object itself ---
   // Bundles all state and functions provided by the context
@@ -686,10 +682,13 @@ export function PropertyProvider({ children }) {
     updateProperty,                // Memoized function
     updatePropertyStatus,          // Memoized function
     geocodeProperties,             // Memoized function
+    getGeocodeJob,                 // Memoized function
+    getMapView,                    // Memoized function
+    refreshProperties,             // Memoized function
     analyzePropertyWithAI,         // Memoized function
   }), [
       properties, // Re-memoize value object if properties array changes
-      addProperty, getPropertyById, updatePropertyRatingsAndScore, updatePropertyImages, deleteProperty, updateProperty, updatePropertyStatus, geocodeProperties, analyzePropertyWithAI // Include stable functions
+      addProperty, getPropertyById, updatePropertyRatingsAndScore, updatePropertyImages, deleteProperty, updateProperty, updatePropertyStatus, geocodeProperties, getGeocodeJob, getMapView, refreshProperties, analyzePropertyWithAI // Include stable functions
   ]);
 
 
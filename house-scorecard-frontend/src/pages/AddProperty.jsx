@@ -40,6 +40,8 @@ function AddProperty() {
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [analysisStatus, setAnalysisStatus] = useState('');
   const [scrapedDescription, setScrapedDescription] = useState('');
+  // Coordinates from the scraped listing, kept with the address they belong to
+  const [scrapedLocation, setScrapedLocation] = useState(null);
 
   // --- Input Change Handlers ---
   // Simple handlers to update state based on input changes
@@ -96,6 +98,13 @@ function AddProperty() {
       if (data.address && !address.trim()) {
         setAddress(data.address);
       }
+      if (data.latitude != null && data.longitude != null) {
+        setScrapedLocation({
+          address: (address.trim() || data.address || '').trim(),
+          latitude: data.latitude,
+          longitude: data.longitude,
+        });
+      }
       if (data.price && !price.toString().trim()) {
         setPrice(data.price.toString());
       }
@@ -254,6 +263,9 @@ function AddProperty() {
     // No need to add scrapedDescription again as it's already in notes
     const combinedNotes = notes.trim();
 
+    // Listing coordinates save a geocoding lookup, unless the address was changed since
+    const location = scrapedLocation && scrapedLocation.address === address.trim() ? scrapedLocation : null;
+
     // Prepare the data object to pass to the context's addProperty function
     const newPropertyData = {
       address: address.trim(), // Use trimmed address
@@ -278,8 +290,7 @@ function AddProperty() {
         aiAnalysisSummary: aiAnalysisData.analysis_summary,
         aiAnalysisDate: new Date().toISOString()
       }),
-      // latitude: parseFloat(latitude) || null, // If adding lat/lon inputs
-      // longitude: parseFloat(longitude) || null,
+      ...(location && { latitude: location.latitude, longitude: location.longitude }),
     };
     
 
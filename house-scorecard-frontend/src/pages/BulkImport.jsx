@@ -5,6 +5,8 @@ import { useAuth } from '../contexts/AuthContext';
 import './BulkImport.css';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
+const IMPORT_POLL_INTERVAL_MS = 2000;
+const IMPORT_EXTENSIONS = ['.csv', '.xlsx', '.jsonl', '.ndjson', '.parquet'];
 
 function BulkImport() {
   const [step, setStep] = useState(1);
@@ -33,8 +35,9 @@ function BulkImport() {
   const handleFileSelect = (event) => {
     const selectedFile = event.target.files[0];
     if (selectedFile) {
-      if (!selectedFile.name.endsWith('.csv')) {
-        showToast('Please select a CSV file', 'error');
+      const fileName = selectedFile.name.toLowerCase();
+      if (!IMPORT_EXTENSIONS.some(extension => fileName.endsWith(extension))) {
+        showToast('Please select a CSV, Excel, JSON Lines or Parquet file', 'error');
         return;
       }
       setFile(selectedFile);
@@ -70,7 +73,7 @@ function BulkImport() {
       setStep(2);
 
     } catch (error) {
-      showToast('Failed to preview CSV file', 'error');
+      showToast('Failed to preview file', 'error');
     } finally {
       setIsUploading(false);
     }
@@ -100,11 +103,26 @@ function BulkImport() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const result = await response.json();
+      let result = await response.json();
+
+      // Large files are imported by a background job; poll until it finishes
+      while (result.status === 'pending' || result.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, IMPORT_POLL_INTERVAL_MS));
+        const progressResponse = await authenticatedFetch(`${API_BASE_URL}/import-jobs/${result.id}/`);
+        if (!progressResponse.ok) {
+          throw new Error(`HTTP error! status: ${progressResponse.status}`);
+        }
+        result = await progressResponse.json();
+      }
+
+      if (result.status === 'failed') {
+        throw new Error(result.error || 'Import failed');
+      }
+
       setImportResult(result);
       setStep(3);
 
-      if (result.success) {
+      if (result.status === 'completed') {
         showToast(
           `Import completed! Created ${result.created}, updated ${result.updated} properties`,
           'success'
@@ -162,14 +180,14 @@ function BulkImport() {
           <i className="fas fa-arrow-left"></i> Back to Properties
         </button>
         <h1>Bulk Import Properties</h1>
-        <p>Import multiple properties from a CSV file</p>
+        <p>Import multiple properties from a CSV, Excel, JSON Lines or Parquet file</p>
       </header>
 
       {/* Step Indicator */}
       <div className="steps-indicator">
         <div className={`step ${step >= 1 ? 'active' : ''} ${step > 1 ? 'completed' : ''}`}>
           <div className="step-number">1</div>
-          <span>Upload CSV</span>
+          <span>Upload File</span>
         </div>
         <div className={`step ${step >= 2 ? 'active' : ''} ${step > 2 ? 'completed' : ''}`}>
           <div className="step-number">2</div>
@@ -189,15 +207,15 @@ function BulkImport() {
               <input
                 ref={fileInputRef}
                 type="file"
-                accept=".csv"
+                accept={IMPORT_EXTENSIONS.join(',')}
                 onChange={handleFileSelect}
                 className="file-input"
                 id="csv-file"
               />
               <label htmlFor="csv-file" className="upload-label">
                 <i className="fas fa-cloud-upload-alt"></i>
-                <h3>Choose CSV File</h3>
-                <p>Select a CSV file exported from Canadian real estate platforms</p>
+                <h3>Choose File</h3>
+                <p>Select a CSV, Excel, JSON Lines or Parquet export from Canadian real estate platforms</p>
                 <button type="button" className="btn btn-primary" onClick={handleBrowseClick}>
                   Browse Files
                 </button>
@@ -207,7 +225,7 @@ function BulkImport() {
             {isUploading && (
               <div className="loading-indicator">
                 <i className="fas fa-spinner fa-spin"></i>
-                <span>Analyzing CSV file...</span>
+                <span>Analyzing file...</span>
               </div>
             )}
           </div>
@@ -249,6 +267,12 @@ function BulkImport() {
           <div className="mapping-section">
             <h3>Map CSV Fields to Properties</h3>
             <p>Match your CSV columns to property fields. We've suggested mappings based on your headers.</p>
+            {csvData.estimated_row_count > 0 && (
+              <p className="file-summary">
+                {csvData.row_count_is_estimate ? 'About ' : ''}
+                {csvData.estimated_row_count.toLocaleString()} rows ({csvData.encoding})
+              </p>
+            )}
 
             <div className="mapping-grid">
               <div className="mapping-header">
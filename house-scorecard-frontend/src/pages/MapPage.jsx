@@ -1,11 +1,13 @@
 // src/pages/MapPage.jsx
-import React, { useMemo, useState, useEffect } from 'react';
-import { MapContainer, TileLayer, Marker, Popup, useMap } from 'react-leaflet';
+import React, { useMemo, useState, useEffect, useRef } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, useMap, useMapEvents } from 'react-leaflet';
 import { useProperties } from '../contexts/PropertyContext';
 import { useToast } from '../contexts/ToastContext';
 import L from 'leaflet'; // Import Leaflet library itself for custom icons or bounds calculation
 import './MapPage.css'; // Create this CSS file next
 
+const GEOCODE_POLL_INTERVAL_MS = 2000;
+
 // Fix for default marker icon issue with bundlers like Vite/Webpack
 delete L.Icon.Default.prototype._getIconUrl;
 L.Icon.Default.mergeOptions({
@@ -44,10 +46,60 @@ function FitBounds({ properties }) {
 }
 
 
+// Reports the visible bounding box and zoom whenever the map stops moving
+function ViewportTracker({ onChange }) {
+  const map = useMapEvents({
+    moveend: () => onChange({ bbox: map.getBounds().toBBoxString(), zoom: map.getZoom() }),
+  });
+
+  useEffect(() => {
+    onChange({ bbox: map.getBounds().toBBoxString(), zoom: map.getZoom() });
+  }, [map, onChange]);
+
+  return null;
+}
+
+// A server-side cluster of properties; clicking zooms in to its members
+function ClusterMarker({ cluster }) {
+  const map = useMap();
+  const icon = useMemo(() => L.divIcon({
+    html: `<span>${cluster.count}</span>`,
+    className: 'map-cluster',
+    iconSize: [40, 40],
+  }), [cluster.count]);
+
+  return (
+    <Marker
+      position={[cluster.latitude, cluster.longitude]}
+      icon={icon}
+      title={`${cluster.count} properties · avg score ${cluster.avgScore ?? '--'}, min ${cluster.minScore ?? '--'}`}
+      eventHandlers={{ click: () => map.fitBounds(cluster.bounds, { padding: [50, 50] }) }}
+    />
+  );
+}
+
+
 function MapPage() {
-  const { properties, geocodeProperties } = useProperties();
-  const { showInfo, showSuccess } = useToast();
+  const { properties, geocodeProperties, getGeocodeJob, getMapView, refreshProperties } = useProperties();
+  const { showInfo, showSuccess, showError } = useToast();
   const [isGeocoding, setIsGeocoding] = useState(false);
+  const [geocodeJob, setGeocodeJob] = useState(null);
+  // Only what's in view is loaded, as markers or (zoomed out) clusters
+  const [viewport, setViewport] = useState(null);
+  const [mapView, setMapView] = useState({ mode: 'properties', properties: [] });
+  const latestRequest = useRef(0);
+
+  useEffect(() => {
+    if (!viewport) return;
+    const request = ++latestRequest.current;
+    getMapView(viewport.bbox, viewport.zoom)
+      .then(data => {
+        // Ignore answers for viewports the map has already moved away from
+        if (request === latestRequest.current) setMapView(data);
+      })
+      .catch(error => console.error('Failed to load map viewport:', error));
+    // Reload when properties change too, e.g. as geocoding adds them
+  }, [viewport, properties, getMapView]);
 
   // Filter properties that have valid coordinates
   const propertiesWithCoords = useMemo(() =>
@@ -61,6 +113,16 @@ function MapPage() {
     [properties]
   );
 
+  // New properties are geocoded in the background; 'failed' means the address couldn't be found
+  const pendingGeocodeCount = useMemo(() =>
+    propertiesWithoutCoords.filter(p => p.geocodeStatus === 'pending').length,
+    [propertiesWithoutCoords]
+  );
+  const failedGeocodeCount = useMemo(() =>
+    propertiesWithoutCoords.filter(p => p.geocodeStatus === 'failed').length,
+    [propertiesWithoutCoords]
+  );
+
   const defaultPosition = [43.6532, -79.3832]; // Default center (Toronto, Canada)
 
   const handleGeocodeProperties = async () => {
@@ -71,9 +133,26 @@ function MapPage() {
 
     setIsGeocoding(true);
     try {
-      const result = await geocodeProperties();
-      if (result.geocoded_count > 0) {
-        showSuccess(`🗺️ Successfully added ${result.geocoded_count} properties to the map!`);
+      let job = await geocodeProperties();
+
+      // Geocoding runs in a background job at the geocoder's rate limit; coordinates
+      // are saved as they resolve, so refresh the map whenever more come in
+      let geocodedSoFar = 0;
+      while (job.status === 'pending' || job.status === 'running') {
+        setGeocodeJob(job);
+        await new Promise(resolve => setTimeout(resolve, GEOCODE_POLL_INTERVAL_MS));
+        job = await getGeocodeJob(job.id);
+        if (job.geocoded > geocodedSoFar) {
+          geocodedSoFar = job.geocoded;
+          await refreshProperties();
+        }
+      }
+      await refreshProperties();
+
+      if (job.status === 'failed') {
+        showError(`Adding properties to the map stopped: ${job.error}`);
+      } else if (job.geocoded > 0) {
+        showSuccess(`🗺️ Successfully added ${job.geocoded} properties to the map!`);
       } else {
         showInfo('No additional properties could be geocoded.');
       }
@@ -81,6 +160,7 @@ function MapPage() {
       showError('Failed to add properties to map. Please try again.');
     } finally {
       setIsGeocoding(false);
+      setGeocodeJob(null);
     }
   };
 
@@ -99,6 +179,16 @@ function MapPage() {
               📍 {propertiesWithoutCoords.length} properties missing coordinates
             </span>
           )}
+          {pendingGeocodeCount > 0 && (
+            <span className="stat">
+              🌐 {pendingGeocodeCount} not yet geocoded
+            </span>
+          )}
+          {failedGeocodeCount > 0 && (
+            <span className="stat warning">
+              ⚠️ {failedGeocodeCount} addresses could not be located
+            </span>
+          )}
         </div>
         
         {propertiesWithoutCoords.length > 0 && (
@@ -107,7 +197,9 @@ function MapPage() {
             disabled={isGeocoding}
             className="btn btn-primary geocode-btn"
           >
-            {isGeocoding ? '🌐 Adding to map...' : `🗺️ Add ${propertiesWithoutCoords.length} properties to map`}
+            {isGeocoding
+              ? `🌐 Adding to map...${geocodeJob?.total ? ` ${geocodeJob.processed}/${geocodeJob.total}` : ''}`
+              : `🗺️ Add ${propertiesWithoutCoords.length} properties to map`}
           </button>
         )}
       </div>
@@ -118,7 +210,10 @@ function MapPage() {
           <h3>Properties not on map:</h3>
           <ul>
             {propertiesWithoutCoords.slice(0, 5).map(prop => (
-              <li key={prop.id}>{prop.address}</li>
+              <li key={prop.id}>
+                {prop.address}
+                {prop.geocodeStatus === 'failed' && ' (address not found)'}
+              </li>
             ))}
             {propertiesWithoutCoords.length > 5 && (
               <li>... and {propertiesWithoutCoords.length - 5} more</li>
@@ -135,13 +230,22 @@ function MapPage() {
           url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
         />
 
-        {/* Map over properties with coordinates and add a Marker for each */}
-        {propertiesWithCoords.map(prop => (
+        <ViewportTracker onChange={setViewport} />
+
+        {mapView.mode === 'clusters' && mapView.clusters.map(cluster => (
+          <ClusterMarker key={cluster.id} cluster={cluster} />
+        ))}
+
+        {/* Add a Marker for each property in view */}
+        {mapView.mode === 'properties' && mapView.properties.map(prop => (
           <Marker key={prop.id} position={[prop.latitude, prop.longitude]}>
             {/* Popup appears when the marker is clicked */}
             <Popup>
               <div className="property-popup">
                 <strong>{prop.address}</strong><br />
+                {(prop.geocodePrecision === 'fsa' || prop.geocodePrecision === 'postal_code') && (
+                  <em>Approximate location (postal code area)<br /></em>
+                )}
                 <div className="popup-details">
                   Price: {prop.price ? `$${prop.price.toLocaleString()}` : 'N/A'}<br />
                   Score: <span className={`score ${prop.score ? 'has-score' : ''}`}>{prop.score ?? '--'}</span><br />